@@ -0,0 +1,822 @@
+"""Performance benchmarks for Comic Cruncher
+
+Usage:
+    python benchmark.py cbr [--solid FILE] [--non-solid FILE] [--pages N]
+    python benchmark.py archives [FILE ...] [--pages N]
+    python benchmark.py remote [--workers N] [--processes N] [--pages N]
+    python benchmark.py pipeline [--pages N] [--disk-mbps MBPS]
+    python benchmark.py series [--files N] [--series N]
+    python benchmark.py threads [--pages N] [--processes N] [--library-threads 1,2,4]
+    python benchmark.py engines [--pages 8,24,48,96] [--size WxH]
+    python benchmark.py pdf [--files N] [--pages N] [--workers 1,2,4]
+    python benchmark.py targets [--pages N] [--sizes 1600,1000,300] [--size WxH]
+    python benchmark.py reader [--pages N] [--repeat N]
+    python benchmark.py qos [--pages N] [--caps 0,50,20,5]
+    python benchmark.py guards [--pages N] [--stall SECONDS] [--timeout SECONDS]
+    python benchmark.py trim [--pages N] [--margin PERCENT] [--target PX]
+    python benchmark.py flat [--pages N] [--colors N] [--target PX]
+
+Fixtures are generated when the needed tools are installed; otherwise pass
+existing archives on the command line.
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+import zipfile
+
+import numpy as np
+from PIL import Image, ImageDraw
+import rarfile
+
+import comic_core as cc
+
+
+def make_pages(directory, count=40, size=(1800, 2700)):
+    """Write synthetic JPEG pages with comic-like structure and return their paths"""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        # Low-frequency noise scaled up looks more like artwork than pure noise
+        small = (rng.random((size[1] // 16, size[0] // 16, 3)) * 255).astype('uint8')
+        img = Image.fromarray(small).resize(size, Image.Resampling.BICUBIC)
+        path = os.path.join(directory, f"page_{i:03d}.jpg")
+        img.save(path, 'JPEG', quality=90)
+        paths.append(path)
+    return paths
+
+
+def timed(func, *args, repeat=3):
+    """Best wall-clock time of func(*args) over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(label, seconds, total_bytes):
+    """Print one benchmark row"""
+    throughput = total_bytes / seconds / (1024 * 1024) if seconds else 0
+    print(f"  {label:<28} {seconds * 1000:9.1f} ms  {throughput:8.1f} MB/s")
+
+
+def build_rar_fixture(pages_dir, output_path, solid):
+    """Create a RAR fixture with the rar tool, returning None if it is not installed"""
+    if not shutil.which("rar"):
+        return None
+    switch = "-s" if solid else "-s-"
+    subprocess.run(["rar", "a", "-idq", "-ep1", switch, output_path, os.path.join(pages_dir, "*.jpg")],
+                   check=True)
+    return output_path
+
+
+def bench_cbr(args):
+    """Per-member rarfile.extract versus single-pass streaming extraction"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        fixtures = {'solid': args.solid, 'non-solid': args.non_solid}
+        if not all(fixtures.values()):
+            pages_dir = os.path.join(work_dir, "pages")
+            make_pages(pages_dir, args.pages)
+            for kind, solid in (('solid', True), ('non-solid', False)):
+                if not fixtures[kind]:
+                    fixtures[kind] = build_rar_fixture(pages_dir, os.path.join(work_dir, f"{kind}.cbr"), solid)
+
+        for kind, path in fixtures.items():
+            if not path:
+                print(f"{kind}: skipped (install 'rar' or pass --{kind} FILE)")
+                continue
+            total_bytes = sum(info.file_size for info in rarfile.RarFile(path).infolist())
+            print(f"{kind}: {path} ({cc.format_file_size(total_bytes)} uncompressed)")
+
+            def per_member():
+                dest = tempfile.mkdtemp(dir=work_dir)
+                with rarfile.RarFile(path) as cbr:
+                    for name in sorted(cbr.namelist()):
+                        if name.lower().endswith(cc.IMAGE_EXTENSIONS):
+                            cbr.extract(name, path=dest)
+                shutil.rmtree(dest)
+
+            def single_pass():
+                dest = tempfile.mkdtemp(dir=work_dir)
+                cc.list_archive_pages(path, dest).extract_all()
+                shutil.rmtree(dest)
+
+            report("per-member extract", timed(per_member, repeat=args.repeat), total_bytes)
+            report("single-pass stream", timed(single_pass, repeat=args.repeat), total_bytes)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def build_archive_fixtures(pages_dir, work_dir):
+    """Create one fixture per archive format that can be written on this host"""
+    pages = sorted(os.path.join(pages_dir, name) for name in os.listdir(pages_dir))
+    fixtures = []
+
+    zip_path = os.path.join(work_dir, "fixture.cbz")
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as archive:
+        for page in pages:
+            archive.write(page, os.path.basename(page))
+    fixtures.append(zip_path)
+
+    tar_path = os.path.join(work_dir, "fixture.cbt")
+    with tarfile.open(tar_path, 'w') as archive:
+        for page in pages:
+            archive.add(page, os.path.basename(page))
+    fixtures.append(tar_path)
+
+    rar_path = build_rar_fixture(pages_dir, os.path.join(work_dir, "fixture.cbr"), solid=True)
+    if rar_path:
+        fixtures.append(rar_path)
+
+    seven_zip = cc.SevenZipReader.tool()
+    if seven_zip:
+        cb7_path = os.path.join(work_dir, "fixture.cb7")
+        subprocess.run([seven_zip, 'a', '-bd', '-y', cb7_path] + pages, check=True, stdout=subprocess.DEVNULL)
+        fixtures.append(cb7_path)
+    return fixtures
+
+
+def bench_archives(args):
+    """Single-pass read throughput of every available backend for each archive format"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        fixtures = list(args.files)
+        if not fixtures:
+            pages_dir = os.path.join(work_dir, "pages")
+            make_pages(pages_dir, args.pages)
+            fixtures = build_archive_fixtures(pages_dir, work_dir)
+
+        print("available backends: " + ", ".join(
+            backend.name for backend in cc.ARCHIVE_BACKENDS if backend.available()))
+        for path in fixtures:
+            archive_format = cc.detect_archive_format(path)
+            backends = cc.archive_backends_for(archive_format)
+            print(f"{os.path.basename(path)} ({archive_format}):")
+            if not backends:
+                print("  no backend available")
+                continue
+            for backend in backends:
+                def read_all():
+                    with backend(path) as archive:
+                        for _ in archive.iter_members():
+                            pass
+                try:
+                    with backend(path) as archive:
+                        total_bytes = sum(member.size for member in archive.list_members())
+                    report(backend.name, timed(read_all, repeat=args.repeat), total_bytes)
+                except Exception as e:
+                    print(f"  {backend.name:<28} failed: {e}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_remote(args):
+    """Page throughput through 1..N localhost remote workers"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    servers = []
+    try:
+        pages = [open(path, 'rb').read() for path in make_pages(os.path.join(work_dir, "pages"), args.pages)]
+        for _ in range(args.workers):
+            server = cc.create_worker_server("127.0.0.1:0", args.processes)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            servers.append(server)
+        addresses = [f"127.0.0.1:{server.server_address[1]}" for server in servers]
+
+        baseline = None
+        for count in range(1, args.workers + 1):
+            pool = cc.RemoteWorkerPool(addresses[:count])
+            try:
+                # Warm up worker processes so start-up cost is not measured
+                with ThreadPoolExecutor(max_workers=pool.total_slots) as executor:
+                    list(executor.map(lambda data: pool.encode(data, "warmup.jpg"), pages[:pool.total_slots]))
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=pool.total_slots) as executor:
+                    encoded = list(executor.map(lambda data: pool.encode(data, "page.jpg"), pages))
+                elapsed = time.perf_counter() - start
+            finally:
+                pool.close()
+            rate = len(encoded) / elapsed
+            baseline = baseline or rate
+            print(f"  {count} worker(s) x {args.processes} processes: {rate:7.1f} pages/s "
+                  f"(x{rate / baseline:.2f}, {sum(1 for e in encoded if e)} pages ok)")
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+            server.executor.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def throttled(pages, mbps):
+    """Yield extracted pages, sleeping as if they were read from a disk doing mbps MB/s"""
+    for path in pages:
+        if mbps:
+            time.sleep(os.path.getsize(path) / (mbps * 1024 * 1024))
+        yield path
+
+
+def bench_pipeline(args):
+    """Strict extract/encode/write phases versus the overlapped page pipeline"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        pages_dir = os.path.join(work_dir, "pages")
+        make_pages(pages_dir, args.pages)
+        archive = build_archive_fixtures(pages_dir, work_dir)[0]
+        total_bytes = os.path.getsize(archive)
+        budget = cc.DEFAULT_SETTINGS['memory_budget_mb'] * 1024 * 1024
+        disk = f"{args.disk_mbps:g} MB/s simulated disk" if args.disk_mbps else "local disk"
+        print(f"{args.pages} pages, {cc.format_file_size(total_bytes)}, {args.processes} processes, {disk}")
+
+        with ProcessPoolExecutor(max_workers=args.processes) as executor:
+            list(executor.map(abs, range(args.processes)))  # start workers outside the timings
+
+            def phased():
+                dest = tempfile.mkdtemp(dir=work_dir)
+                pages = list(throttled(cc.list_archive_pages(archive, dest).extract(), args.disk_mbps))
+                encoded = list(executor.map(cc.ImageProcessor.process_image, [(page, dest) for page in pages]))
+                with zipfile.ZipFile(os.path.join(dest, "out.cbz"), 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as cbz:
+                    for path in sorted(p for p in encoded if p):
+                        cbz.write(path, os.path.basename(path))
+                shutil.rmtree(dest)
+
+            def pipelined():
+                dest = tempfile.mkdtemp(dir=work_dir)
+                pages = throttled(cc.list_archive_pages(archive, dest).extract(), args.disk_mbps)
+                pipeline = cc.PagePipeline(executor, budget)
+                tasks = ((page, dest) for page in pages)
+                for _ in pipeline.run(cc.ImageProcessor.process_image, tasks,
+                                      lambda task: cc.estimate_image_memory(task[0]), os.path.join(dest, "out.cbz")):
+                    pass
+                shutil.rmtree(dest)
+                pipelines.append(pipeline)
+
+            pipelines = []
+            report("phased", timed(phased, repeat=args.repeat), total_bytes)
+            report("pipelined", timed(pipelined, repeat=args.repeat), total_bytes)
+            best = min(pipelines, key=lambda pipeline: pipeline.elapsed)
+            print("  stage utilization: " + ", ".join(
+                f"{stage} {share:.0%}" for stage, share in best.utilization().items()))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_threads(args):
+    """Page throughput and context switching for different library thread budgets"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        pages_dir = os.path.join(work_dir, "pages")
+        make_pages(pages_dir, args.pages)
+        pages = sorted(os.path.join(pages_dir, name) for name in os.listdir(pages_dir))
+        print(f"{args.pages} pages, {args.processes} processes, {os.cpu_count()} CPUs")
+        for threads in [int(value) for value in args.library_threads.split(",")]:
+            budget = cc.ThreadBudget(args.processes, threads)
+            dest = tempfile.mkdtemp(dir=work_dir)
+            copies = [shutil.copy(page, dest) for page in pages]  # encoding replaces its input
+            with ProcessPoolExecutor(**budget.executor_args()) as executor:
+                list(executor.map(abs, range(args.processes)))  # start workers outside the timing
+                start = time.perf_counter()
+                list(executor.map(cc.ImageProcessor.process_image, [(page, dest) for page in copies]))
+                seconds = time.perf_counter() - start
+            shutil.rmtree(dest)
+            print(f"  {budget.describe():<64} {args.pages / seconds:7.1f} pages/s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_engines(args):
+    """End-to-end time of the thread and process engines by page count, to find the crossover"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    width, height = (int(value) for value in args.size.split("x"))
+    settings = cc.load_settings()
+    budget = settings['memory_budget_mb'] * 1024 * 1024
+    print(f"{os.cpu_count()} CPUs, {width}x{height} pages, "
+          f"auto picks threads up to {settings['thread_engine_pages']} pages / {settings['thread_engine_mb']} MB")
+    try:
+        pages = make_pages(os.path.join(work_dir, "pages"), max(int(n) for n in args.pages.split(",")), (width, height))
+        for count in [int(n) for n in args.pages.split(",")]:
+            archive = os.path.join(work_dir, f"fixture_{count}.cbz")
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as cbz:
+                for page in pages[:count]:
+                    cbz.write(page, os.path.basename(page))
+
+            def crunch(engine):
+                # Includes starting the pool, which is the overhead small comics pay
+                dest = tempfile.mkdtemp(dir=work_dir)
+                tasks, estimate = cc.archive_page_work(cc.list_archive_pages(archive, dest), dest, engine)
+                executor, func = cc.page_executor(None, None, settings, engine)
+                with executor:
+                    for _ in cc.PagePipeline(executor, budget).run(func, tasks, estimate, os.path.join(dest, "out.cbz")):
+                        pass
+                shutil.rmtree(dest)
+
+            times = {engine: timed(crunch, engine, repeat=args.repeat) for engine in ("threads", "processes")}
+            faster = min(times, key=times.get)
+            auto = cc.select_engine(settings, count, os.path.getsize(archive))
+            print(f"  {count:4d} pages {cc.format_file_size(os.path.getsize(archive)):>8}  "
+                  f"threads {times['threads']:7.2f}s  processes {times['processes']:7.2f}s  "
+                  f"faster: {faster:<9} auto: {auto}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_pdf(args):
+    """Batch PDF encoding: the old serial page loop versus the shared page pipeline by pool size"""
+    if not shutil.which("pdftoppm"):
+        print("pdftoppm not found: install poppler to render PDF fixtures")
+        return
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        pages = make_pages(os.path.join(work_dir, "pages"), args.pages)
+        pdfs = []
+        for i in range(args.files):
+            images = [Image.open(page) for page in pages]
+            pdf_path = os.path.join(work_dir, f"fixture_{i}.pdf")
+            images[0].save(pdf_path, save_all=True, append_images=images[1:], resolution=cc.PDF_RENDER_DPI)
+            pdfs.append(pdf_path)
+        settings = cc.load_settings()
+        budget = settings['memory_budget_mb'] * 1024 * 1024
+        page_numbers = list(range(1, args.pages + 1))
+        total_pages = args.files * args.pages
+        print(f"{args.files} PDFs x {args.pages} pages, {os.cpu_count()} CPUs")
+
+        def serial():
+            # What BatchProcessor did before: one page at a time on one core
+            for pdf_path in pdfs:
+                dest = tempfile.mkdtemp(dir=work_dir)
+                for i, page_number in enumerate(page_numbers):
+                    img = cc.ImageProcessor.process_image(cc.render_pdf_page(pdf_path, page_number))
+                    img.save(os.path.join(dest, f"page_{i:04d}.webp"), 'WEBP', quality=85, optimize=True)
+                shutil.rmtree(dest)
+
+        def pipelined(workers, engine):
+            for pdf_path in pdfs:
+                dest = tempfile.mkdtemp(dir=work_dir)
+                info = cc.pdf2image.pdfinfo_from_path(pdf_path)
+                bitmaps = cc.SharedBitmaps()
+                try:
+                    tasks, estimate = cc.pdf_page_work(pdf_path, page_numbers, dest, info, engine,
+                                                       bitmaps, max(1, workers // 2))
+                    executor, func = cc.pdf_executor(cc.ThreadBudget(workers), settings, engine)
+                    with executor:
+                        for _ in cc.PagePipeline(executor, budget).run(func, tasks, estimate,
+                                                                       os.path.join(dest, "out.cbz")):
+                            pass
+                finally:
+                    bitmaps.close()
+                shutil.rmtree(dest)
+
+        baseline = timed(serial, repeat=args.repeat)
+        print(f"  {'serial loop':<22} {baseline:8.2f}s  {total_pages / baseline:6.2f} pages/s")
+        for workers in [int(value) for value in args.workers.split(",")]:
+            for engine in ("threads", "processes"):
+                seconds = timed(pipelined, workers, engine, repeat=args.repeat)
+                label = f"{workers} {engine}" + (" (shm)" if engine == "processes" else "")
+                print(f"  {label:<22} {seconds:8.2f}s  {total_pages / seconds:6.2f} pages/s"
+                      f"  {baseline / seconds:5.2f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_targets(args):
+    """Multi-profile output: one pass per target size versus every target from one decode"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        width, height = (int(value) for value in args.size.split("x"))
+        pages = make_pages(os.path.join(work_dir, "pages"), args.pages, (width, height))
+        sizes = [int(size) for size in args.sizes.split(",")]
+        targets = tuple(cc.OutputTarget(size, 85, 'webp', '', False) for size in sizes)
+        total_bytes = sum(os.path.getsize(page) for page in pages)
+        print(f"{args.pages} {width}x{height} pages, primary 2500px plus targets {', '.join(map(str, sizes))}px")
+
+        def run_pass(target_size, targets=()):
+            dest = tempfile.mkdtemp(dir=work_dir)
+            for page in pages:
+                copy = shutil.copy(page, dest)
+                cc.ImageProcessor.process_image((copy, dest), target_size, targets=targets)
+            shutil.rmtree(dest)
+
+        def separate_passes():
+            for target_size in [2500] + sizes:
+                run_pass(target_size)
+
+        report(f"{len(sizes) + 1} separate passes", timed(separate_passes, repeat=args.repeat), total_bytes)
+        report("one decode, all targets", timed(run_pass, 2500, targets, repeat=args.repeat), total_bytes)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_reader(args):
+    """Reader open-to-first-page latency: deflated pages without an index versus the stored, indexed layout"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        pages_dir = os.path.join(work_dir, "pages")
+        encoded = []
+        for page in make_pages(pages_dir, args.pages):
+            encoded.append(cc.ImageProcessor.process_image((page, pages_dir)))
+        encoded.sort()
+
+        legacy = os.path.join(work_dir, "legacy.cbz")
+        with zipfile.ZipFile(legacy, 'w', zipfile.ZIP_DEFLATED) as cbz:
+            for path in encoded:
+                cbz.write(path, os.path.basename(path))
+
+        indexed = os.path.join(work_dir, "indexed.cbz")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pipeline = cc.PagePipeline(executor, cc.DEFAULT_SETTINGS['memory_budget_mb'] * 1024 * 1024)
+            tasks = ((path, work_dir) for path in encoded)
+            for _ in pipeline.run(lambda task: shutil.copy(*task), tasks, lambda task: 0, indexed):
+                pass
+        cc.append_comic_info(indexed, pipeline.page_index)
+        print(f"{args.pages} pages, legacy {cc.format_file_size(os.path.getsize(legacy))}, "
+              f"indexed {cc.format_file_size(os.path.getsize(indexed))}")
+
+        def open_legacy():
+            # Without an index a reader opens every page to learn its size before laying out the first spread
+            with zipfile.ZipFile(legacy) as cbz:
+                names = sorted(cbz.namelist())
+                for name in names:
+                    with cbz.open(name) as member, Image.open(member) as img:
+                        img.size
+                with cbz.open(names[0]) as member, Image.open(member) as img:
+                    img.load()
+
+        def open_indexed():
+            with zipfile.ZipFile(indexed) as cbz:
+                info = cc.ET.fromstring(cbz.read(cc.COMIC_INFO_NAME))
+                [(page.get('ImageWidth'), page.get('ImageHeight')) for page in info.iter('Page')]
+                with cbz.open(cbz.namelist()[0]) as member, Image.open(member) as img:
+                    img.load()
+
+        report("deflated, no index", timed(open_legacy, repeat=args.repeat), os.path.getsize(legacy))
+        report("stored, ComicInfo index", timed(open_indexed, repeat=args.repeat), os.path.getsize(indexed))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_qos(args):
+    """Archive extraction throughput achieved under each read/write cap"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        pages_dir = os.path.join(work_dir, "pages")
+        make_pages(pages_dir, args.pages)
+        archive = build_archive_fixtures(pages_dir, work_dir)[0]
+        total_bytes = os.path.getsize(archive)
+        print(f"{args.pages} pages, {cc.format_file_size(total_bytes)}, read from the archive and written to scratch")
+        for cap in (float(cap) for cap in args.caps.split(",")):
+            cc.IO_THROTTLE.configure(cc.load_settings({'io_read_mbps': cap, 'io_write_mbps': cap}))
+
+            def extract():
+                dest = tempfile.mkdtemp(dir=work_dir)
+                for _ in cc.list_archive_pages(archive, dest).extract():
+                    pass
+                shutil.rmtree(dest)
+
+            report(f"cap {cap:g} MB/s" if cap else "uncapped", timed(extract, repeat=1), total_bytes)
+            print(f"    {cc.IO_THROTTLE.describe() or 'no caps'}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def write_bomb_header(path, width=30000, height=30000):
+    """A tiny PNG whose header claims width x height, as a decompression bomb would"""
+    img = Image.new('RGB', (8, 8))
+    img.save(path, 'PNG')
+    with open(path, 'r+b') as f:
+        data = bytearray(f.read())
+        data[16:24] = struct.pack('>II', width, height)
+        data[29:33] = struct.pack('>I', zlib.crc32(bytes(data[12:29])))
+        f.seek(0)
+        f.write(data)
+
+
+def stall_or_encode(task, stall=60):
+    """Page function whose "stall" pages hang the worker, like a pathological decode"""
+    if "stall" in os.path.basename(task[0]):
+        time.sleep(stall)
+    return cc.ImageProcessor.process_image(task)
+
+
+def bench_guards(args):
+    """Comic wall time with one stalling page and one decompression bomb, without and with page guards"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        pages_dir = os.path.join(work_dir, "pages")
+        paths = make_pages(pages_dir, args.pages)
+        shutil.copy(paths[len(paths) // 2], os.path.join(pages_dir, "page_stall.jpg"))
+        write_bomb_header(os.path.join(pages_dir, "page_bomb.png"))
+        pages = sorted(os.listdir(pages_dir))
+        total_bytes = sum(os.path.getsize(os.path.join(pages_dir, page)) for page in pages)
+        budget = cc.DEFAULT_SETTINGS['memory_budget_mb'] * 1024 * 1024
+        print(f"{len(pages)} pages including one that stalls for {args.stall:g}s and a 900 megapixel header")
+        for label, guard in (("unguarded", None),
+                             (f"guarded, {args.timeout:g}s page timeout", cc.PageGuard(150_000_000, args.timeout))):
+            scratch = tempfile.mkdtemp(dir=work_dir)
+            for page in pages:
+                shutil.copy(os.path.join(pages_dir, page), scratch)
+            tasks = [(os.path.join(scratch, page), scratch) for page in pages]
+            start = time.perf_counter()
+            with cc.RestartablePool(max_workers=args.processes) as executor:
+                pipeline = cc.PagePipeline(executor, budget, guard=guard)
+                for _ in pipeline.run(partial(stall_or_encode, stall=args.stall), tasks,
+                                      lambda task: cc.estimate_image_memory(task[0]),
+                                      os.path.join(work_dir, "out.cbz")):
+                    pass
+            report(label, time.perf_counter() - start, total_bytes)
+            print(f"    {pipeline.pages_written} pages written, quarantined: "
+                  f"{', '.join(f'{name} ({reason})' for name, reason in pipeline.quarantined) or 'none'}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def make_scans(directory, count=20, size=(2000, 3000), margin=0.08):
+    """Write synthetic scans: artwork inside noisy white (or, every other page, black) scanner borders"""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(0)
+    width, height = size
+    left, top = int(width * margin), int(height * margin)
+    paths = []
+    for i in range(count):
+        paper = 250 if i % 2 == 0 else 6
+        page = np.clip(paper + rng.integers(-8, 9, (height, width, 3)), 0, 255).astype('uint8')
+        small = (rng.random(((height - 2 * top) // 16, (width - 2 * left) // 16, 3)) * 255).astype('uint8')
+        page[top:height - top, left:width - left] = np.asarray(
+            Image.fromarray(small).resize((width - 2 * left, height - 2 * top), Image.Resampling.BICUBIC))
+        path = os.path.join(directory, f"scan_{i:03d}.jpg")
+        Image.fromarray(page).save(path, 'JPEG', quality=90)
+        paths.append(path)
+    return paths
+
+
+def bench_trim(args):
+    """Page encode time and output size with and without margin trimming, plus the cost of detection alone"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        pages = make_scans(os.path.join(work_dir, "pages"), args.pages, margin=args.margin / 100)
+        total_bytes = sum(os.path.getsize(page) for page in pages)
+        print(f"{args.pages} 2000x3000 scans with {args.margin:g}% borders, resized to {args.target}px")
+
+        def detect():
+            seconds = 0.0
+            for page in pages:
+                with Image.open(page) as img:
+                    img.load()
+                    start = time.perf_counter()
+                    cc.find_margins(img)
+                    seconds += time.perf_counter() - start
+            return seconds
+
+        def encode(trim):
+            dest = tempfile.mkdtemp(dir=work_dir)
+            trimmed = 0
+            for page in pages:
+                result = cc.ImageProcessor.process_image((shutil.copy(page, dest), dest), args.target, trim=trim)
+                if isinstance(result, cc.PageOutputs):
+                    result, trimmed = result.primary, trimmed + result.trimmed_pixels
+            size = sum(os.path.getsize(os.path.join(dest, name)) for name in os.listdir(dest))
+            shutil.rmtree(dest)
+            return size, trimmed
+
+        for label, trim in (("untrimmed", False), ("trimmed", True)):
+            start = time.perf_counter()
+            size, trimmed = encode(trim)
+            report(label, time.perf_counter() - start, total_bytes)
+            print(f"    output {cc.format_file_size(size)}" + (f", {cc.describe_trim(trimmed)}" if trimmed else ""))
+        report("border detection alone", detect(), total_bytes)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def make_cel_pages(directory, count=20, size=(2000, 3000)):
+    """Write digital-native pages: flat colour panels and fills with black ink lines, as PNG"""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(0)
+    width, height = size
+    paths = []
+    for i in range(count):
+        page = Image.new('RGB', size, 'white')
+        draw = ImageDraw.Draw(page)
+        palette = [tuple(rng.randint(0, 255) for _ in range(3)) for _ in range(8)]
+        for _ in range(30):
+            left, top = rng.randint(0, width - 300), rng.randint(0, height - 300)
+            draw.rectangle((left, top, left + rng.randint(100, 600), top + rng.randint(100, 600)),
+                           fill=rng.choice(palette), outline='black', width=6)
+        for _ in range(40):
+            draw.line([(rng.randint(0, width), rng.randint(0, height)) for _ in range(2)], fill='black',
+                      width=rng.randint(2, 6))
+        path = os.path.join(directory, f"cel_{i:03d}.png")
+        page.save(path)
+        paths.append(path)
+    return paths
+
+
+def bench_flat(args):
+    """Encode time, output size and routing with and without flat page detection, on cel pages and scans"""
+    work_dir = tempfile.mkdtemp(prefix="cc_bench_")
+    try:
+        kinds = (("cel pages", make_cel_pages(os.path.join(work_dir, "cel"), args.pages)),
+                 ("scans", make_scans(os.path.join(work_dir, "scans"), args.pages, margin=0)))
+        print(f"{args.pages} 2000x3000 pages of each kind, resized to {args.target}px")
+        for label, pages in kinds:
+            total_bytes = sum(os.path.getsize(page) for page in pages)
+            print(label)
+
+            def classify():
+                seconds, flat = 0.0, 0
+                for page in pages:
+                    with Image.open(page) as img:
+                        img.load()
+                        start = time.perf_counter()
+                        flat += cc.is_flat_page(img, args.colors)
+                        seconds += time.perf_counter() - start
+                return seconds, flat
+
+            def encode(flat_colors):
+                dest = tempfile.mkdtemp(dir=work_dir)
+                encodings = {}
+                for page in pages:
+                    result = cc.ImageProcessor.process_image((shutil.copy(page, dest), dest), args.target,
+                                                             flat_colors=flat_colors)
+                    encoding = result.encoding if isinstance(result, cc.PageOutputs) else 'lossy'
+                    encodings[encoding] = encodings.get(encoding, 0) + 1
+                size = sum(os.path.getsize(os.path.join(dest, name)) for name in os.listdir(dest))
+                shutil.rmtree(dest)
+                return size, encodings
+
+            for name, flat_colors in (("lossy only", 0), (f"flat pages at {args.colors} colours", args.colors)):
+                start = time.perf_counter()
+                size, encodings = encode(flat_colors)
+                seconds = time.perf_counter() - start
+                report(name, seconds, total_bytes)
+                print(f"    {len(pages) / seconds:.2f} pages/s, output {cc.format_file_size(size)}, "
+                      f"{cc.describe_encodings(encodings)}")
+            seconds, flat = classify()
+            report("classifier alone", seconds, total_bytes)
+            print(f"    {seconds / len(pages) * 1000:.2f} ms/page, {flat} of {len(pages)} pages flat")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def synthetic_library(count, series_count, seed=0):
+    """Filenames in the mix of styles found in real libraries"""
+    rng = random.Random(seed)
+    words = ["Amazing", "Dark", "Night", "Star", "Iron", "Lost", "Saga", "Legion", "Spider", "Knight",
+             "Doom", "Patrol", "Squad", "Cosmic", "Tales", "Wonder", "Black", "Silver", "Age", "Hunters"]
+    series = [" ".join(rng.sample(words, rng.randint(1, 3))) + (f" ({rng.randint(1970, 2024)})" if rng.random() < 0.3 else "")
+              for _ in range(series_count)]
+    styles = ["{s} {i:03d}.cbz", "{s} #{i}.cbr", "{s} Issue {i}.cbz", "{s} {i:03d} ({y}) (Digital).cbz",
+              "{s} #{i}.1.cbz", "{s} Annual {i:02d} ({y}).cbz", "{s}_{i:03d}.cbz"]
+    return [f"/library/{rng.choice(styles).format(s=rng.choice(series), i=rng.randint(1, 300), y=rng.randint(1970, 2024))}"
+            for _ in range(count)]
+
+
+def legacy_detect(file_paths):
+    """The previous detection: four uncompiled regexes per file, most common series only"""
+    comics = []
+    for file_path in file_paths:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        for pattern in [r'(.+?)\s+(\d{3})(?:\s|$)', r'(.+?)\s+Issue\s+(\d+)', r'(.+?)\s+#(\d+)', r'(.+?)\s+(\d+)(?:\s|$)']:
+            match = re.search(pattern, name, re.IGNORECASE)
+            if match:
+                comics.append((match.group(1).strip(), int(match.group(2)), file_path))
+                break
+    counts = {}
+    for series, _, _ in comics:
+        counts[series] = counts.get(series, 0) + 1
+    main_series = max(counts, key=counts.get)
+    return sorted(c for c in comics if c[0] == main_series)
+
+
+def bench_series(args):
+    """Grouping time of the series parser over a large synthetic library"""
+    files = synthetic_library(args.files, args.series)
+    print(f"{len(files)} filenames, ~{args.series} series")
+
+    def grouped():
+        bench_series.result = cc.plan_combines(files)
+
+    legacy = timed(legacy_detect, files, repeat=args.repeat)
+    current = timed(grouped, repeat=args.repeat)
+    plans, unmatched, conflicts = bench_series.result
+    print(f"  {'legacy (one series)':<28} {legacy * 1000:9.1f} ms  {len(files) / legacy:10.0f} files/s")
+    print(f"  {'plan_combines (all series)':<28} {current * 1000:9.1f} ms  {len(files) / current:10.0f} files/s")
+    print(f"  {len({plan.series for plan in plans})} series, {len(plans)} volumes, {len(unmatched)} unmatched, "
+          f"{len(conflicts)} duplicate issues left out of {len({series for series, _, _ in conflicts})} series")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comic Cruncher benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    cbr = subparsers.add_parser("cbr", help="CBR extraction: per-member vs single pass")
+    cbr.add_argument("--solid", help="existing solid CBR fixture")
+    cbr.add_argument("--non-solid", help="existing non-solid CBR fixture")
+    cbr.add_argument("--pages", type=int, default=100, help="pages in generated fixtures")
+    cbr.add_argument("--repeat", type=int, default=3)
+    cbr.set_defaults(func=bench_cbr)
+
+    archives = subparsers.add_parser("archives", help="archive backend read throughput")
+    archives.add_argument("files", nargs="*", help="archives to read (default: generated fixtures)")
+    archives.add_argument("--pages", type=int, default=100, help="pages in generated fixtures")
+    archives.add_argument("--repeat", type=int, default=3)
+    archives.set_defaults(func=bench_archives)
+
+    remote = subparsers.add_parser("remote", help="remote worker scaling on localhost")
+    remote.add_argument("--workers", type=int, default=3, help="worker servers to start")
+    remote.add_argument("--processes", type=int, default=1, help="encode processes per worker")
+    remote.add_argument("--pages", type=int, default=48)
+    remote.set_defaults(func=bench_remote)
+
+    pipeline = subparsers.add_parser("pipeline", help="phased vs overlapped read/encode/write")
+    pipeline.add_argument("--pages", type=int, default=48)
+    pipeline.add_argument("--processes", type=int, default=os.cpu_count())
+    pipeline.add_argument("--disk-mbps", type=float, default=0,
+                          help="simulate a slow disk by throttling page reads to this speed")
+    pipeline.add_argument("--repeat", type=int, default=3)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    series = subparsers.add_parser("series", help="combiner series grouping over a synthetic library")
+    series.add_argument("--files", type=int, default=100000)
+    series.add_argument("--series", type=int, default=2000)
+    series.add_argument("--repeat", type=int, default=3)
+    series.set_defaults(func=bench_series)
+
+    threads = subparsers.add_parser("threads", help="library threads per pool worker vs throughput")
+    threads.add_argument("--pages", type=int, default=48)
+    threads.add_argument("--processes", type=int, default=os.cpu_count())
+    threads.add_argument("--library-threads", default=f"1,2,{os.cpu_count()}",
+                         help="comma separated library thread counts to compare (0 = auto)")
+    threads.set_defaults(func=bench_threads)
+
+    engines = subparsers.add_parser("engines", help="thread vs process engine crossover by page count")
+    engines.add_argument("--pages", default="8,24,48,96", help="comma separated page counts")
+    engines.add_argument("--size", default="1800x2700", help="page size WxH")
+    engines.add_argument("--repeat", type=int, default=1)
+    engines.set_defaults(func=bench_engines)
+
+    pdf = subparsers.add_parser("pdf", help="batch PDF encoding: serial loop vs thread and shared-memory process pools")
+    pdf.add_argument("--files", type=int, default=4)
+    pdf.add_argument("--pages", type=int, default=12)
+    pdf.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, 4, os.cpu_count()})),
+                     help="comma separated pool sizes")
+    pdf.add_argument("--repeat", type=int, default=1)
+    pdf.set_defaults(func=bench_pdf)
+
+    targets = subparsers.add_parser("targets", help="multi-profile output: separate passes vs one decode")
+    targets.add_argument("--pages", type=int, default=12)
+    targets.add_argument("--sizes", default="1600,1000,300", help="comma separated extra target sizes")
+    targets.add_argument("--size", default="3300x5100", help="source page size WxH (scans are often 600 dpi)")
+    targets.add_argument("--repeat", type=int, default=1)
+    targets.set_defaults(func=bench_targets)
+
+    reader = subparsers.add_parser("reader", help="reader open-to-first-page latency by archive layout")
+    reader.add_argument("--pages", type=int, default=60)
+    reader.add_argument("--repeat", type=int, default=5)
+    reader.set_defaults(func=bench_reader)
+
+    qos = subparsers.add_parser("qos", help="archive I/O throughput achieved against read/write caps")
+    qos.add_argument("--pages", type=int, default=40)
+    qos.add_argument("--caps", default="0,50,20,5", help="comma separated caps in MB/s (0 = uncapped)")
+    qos.set_defaults(func=bench_qos)
+
+    guards = subparsers.add_parser("guards", help="batch throughput past stalling and oversized pages")
+    guards.add_argument("--pages", type=int, default=20)
+    guards.add_argument("--processes", type=int, default=os.cpu_count())
+    guards.add_argument("--stall", type=float, default=30, help="seconds the stalling page hangs its worker")
+    guards.add_argument("--timeout", type=float, default=5, help="page timeout in seconds")
+    guards.set_defaults(func=bench_guards)
+
+    trim = subparsers.add_parser("trim", help="encode time and size with and without margin trimming")
+    trim.add_argument("--pages", type=int, default=20)
+    trim.add_argument("--margin", type=float, default=8, help="border on each side, percent of the page")
+    trim.add_argument("--target", type=int, default=2500, help="max dimension pages are resized to")
+    trim.set_defaults(func=bench_trim)
+
+    flat = subparsers.add_parser("flat", help="lossless and palette encoding of flat pages: size, speed and routing")
+    flat.add_argument("--pages", type=int, default=12)
+    flat.add_argument("--colors", type=int, default=cc.DEFAULT_SETTINGS['flat_page_colors'],
+                      help="colours covering most of a page for it to be flat")
+    flat.add_argument("--target", type=int, default=2500, help="max dimension pages are resized to")
+    flat.set_defaults(func=bench_flat)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
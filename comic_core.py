@@ -0,0 +1,4445 @@
+"""Comic Cruncher processing core: archives, page encoding, processors, watch mode and the
+async library API. Nothing here imports Qt; comic_cruncher.py is the GUI on top of it."""
+import sys
+import os
+import argparse
+import asyncio
+import zipfile
+import rarfile
+import tempfile
+import shutil
+import signal
+import subprocess
+import tarfile
+import socket
+import socketserver
+import sqlite3
+import hmac
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import struct
+import json
+import queue
+import threading
+import time
+import errno
+import random
+import platform
+from datetime import datetime
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageChops, ImageStat
+import numpy as np
+import pdf2image
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+import concurrent.futures
+import multiprocessing
+from multiprocessing import shared_memory
+from functools import partial, lru_cache
+from contextlib import contextmanager
+from collections import deque, namedtuple
+import re
+import io
+import math
+import xml.etree.ElementTree as ET
+
+# GPU acceleration imports
+try:
+    import cv2
+    GPU_AVAILABLE = True
+except ImportError:
+    GPU_AVAILABLE = False
+
+# Optional libarchive backend for RAR5/CB7/CBT (pip install libarchive-c)
+try:
+    import libarchive
+    LIBARCHIVE_AVAILABLE = True
+except (ImportError, OSError):
+    LIBARCHIVE_AVAILABLE = False
+
+# Optional inotify support for watch mode (pip install inotify_simple)
+try:
+    import inotify_simple
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INOTIFY_AVAILABLE = False
+
+def format_file_size(size_bytes):
+    """Convert bytes to human readable format"""
+    if size_bytes == 0:
+        return "0B"
+    size_names = ["B", "KB", "MB", "GB"]
+    i = 0
+    while size_bytes >= 1024 and i < len(size_names) - 1:
+        size_bytes /= 1024.0
+        i += 1
+    return f"{size_bytes:.1f}{size_names[i]}"
+
+# Per-user state (library index, ...)
+CONFIG_DIR = Path(os.environ.get("COMIC_CRUNCHER_HOME", Path.home() / ".comic_cruncher"))
+
+# Default processing settings. Any key can be overridden with a
+# COMIC_CRUNCHER_<KEY> environment variable, e.g. COMIC_CRUNCHER_MEMORY_BUDGET_MB=1024
+DEFAULT_SETTINGS = {
+    'memory_budget_mb': 2048,  # decoded page pixels allowed in flight at once
+    'archive_backends': '',  # preferred archive backends, e.g. "libarchive,7z"
+    'library_index': '',  # watch mode index of handled files (default: ~/.comic_cruncher/library_index.json)
+    'remote_workers': '',  # encode on remote workers, e.g. "nas-helper:7878,unix:/tmp/cc.sock"
+    'worker_token': '',  # shared secret workers and coordinators must both have (required off loopback)
+    'scratch_dir': '',  # where pages are extracted and new CBZs are built (default: system temp dir)
+    'scratch_budget_mb': 0,  # scratch space all jobs may use at once (0 = limited by free space only)
+    'min_savings_percent': 0,  # skip archives projected to shrink less than this (0 = crunch everything)
+    'estimate_sample_pages': 3,  # pages encoded per file by the savings estimator
+    'savings_log': '',  # projected vs actual savings (default: ~/.comic_cruncher/savings_estimates.jsonl)
+    'library_threads': 0,  # OpenCV/OpenMP threads per pool worker (0 = CPU count / workers)
+    'workers': 0,  # encode processes (0 = CPU count)
+    'image_backend': '',  # "opencv" or "pillow" (default: OpenCV when installed)
+    'resize_filter': 'lanczos',  # lanczos, bicubic, bilinear or area
+    'trim_margins': False,  # crop uniform white or black scanner borders before resizing
+    'flat_page_colors': 32,  # pages this few colours mostly cover are also tried as lossless or palette WebP (0 = off)
+    'engine': '',  # "threads" or "processes" for archive pages (default: picked per file)
+    'thread_engine_pages': 40,  # archives with at most this many pages...
+    'thread_engine_mb': 100,  # ...and at most this size use the in-process thread engine
+    'output_targets': '',  # extra renditions as a JSON list, e.g. [{"size": 1600, "destination": "{dir}/tablet/{stem}.cbz"}]
+    'io_read_mbps': 0.0,  # cap on archive and scratch reads in MB/s (0 = unlimited)
+    'io_write_mbps': 0.0,  # cap on extraction, backup and CBZ writes in MB/s (0 = unlimited)
+    'io_ops_per_second': 0,  # cap on archive I/O operations per second (0 = unlimited)
+    'low_priority': False,  # run encode workers at nice 10 and low best-effort I/O priority
+    'max_page_megapixels': 150,  # pages whose header is over this are not decoded (0 = no limit)
+    'page_timeout': 300,  # seconds a page may encode before its worker is killed (0 = no limit)
+    'file_timeout': 0,  # seconds a file may take before it is abandoned and left untouched (0 = no limit)
+    'quarantine': 'passthrough',  # oversized, stuck or crashing pages: "passthrough" unmodified or "skip"
+    'quarantine_log': '',  # quarantined pages and files (default: ~/.comic_cruncher/quarantine.jsonl)
+    'job_queue': '',  # job service database (default: ~/.comic_cruncher/jobs.sqlite3)
+    'service_token': '',  # bearer token job service clients must send (default: none)
+}
+
+# Written by `comic_cruncher.py calibrate`; its settings sit between the defaults and the environment
+PROFILE_PATH = Path(os.environ.get("COMIC_CRUNCHER_PROFILE", CONFIG_DIR / "profile.json"))
+PROFILE_SETTINGS = ('image_backend', 'workers', 'library_threads', 'resize_filter')
+
+# Resize filters by name: Pillow resampling filter and OpenCV interpolation flag
+RESIZE_FILTERS = {
+    'lanczos': (Image.Resampling.LANCZOS, 'INTER_LANCZOS4'),
+    'bicubic': (Image.Resampling.BICUBIC, 'INTER_CUBIC'),
+    'bilinear': (Image.Resampling.BILINEAR, 'INTER_LINEAR'),
+    'area': (Image.Resampling.BOX, 'INTER_AREA'),
+}
+
+PDF_RENDER_DPI = 300
+PIPELINE_QUEUE_SIZE = 8  # pages waiting between pipeline stages
+PIPELINE_REORDER_WINDOW = 32  # pages allowed to finish ahead of the next page to write
+SCRATCH_WAIT_SECONDS = 300  # how long a job waits for scratch space before spilling
+TPB_BATCH_SIZE = 12  # issues per combined volume
+CANCEL_TIMEOUT_SECONDS = 5  # in-flight workers get this long to exit after a cancel before being killed
+WATCHDOG_INTERVAL_SECONDS = 1  # how often page and file time limits are checked
+IO_BURST_SECONDS = 0.25  # I/O a capped stream may do at once after being idle
+IO_WINDOW_SECONDS = 10  # achieved throughput is reported over this window
+LOW_PRIORITY_NICE = 10
+TRIM_SAMPLE_SIZE = 400  # long side of the reduced copy borders are detected on
+TRIM_TOLERANCE = 24  # grey levels a border pixel may stray from the border colour (paper, JPEG noise)
+TRIM_NOISE_FRACTION = 0.01  # share of stray pixels (dust, specks) a border row or column may hold
+TRIM_MIN_KEEP = 0.6  # never trim a page below this share of its width or height
+FLAT_SAMPLE_SIZE = 256  # long side of the reduced copy colours are counted on
+FLAT_COVERAGE = 0.95  # share of a flat page's pixels its few colours cover (the rest is anti-aliasing)
+FLAT_EXACT_COLORS = 128  # flat pages with at most this many colours are encoded exactly, others through a palette
+FLAT_LOSSLESS_EFFORT = 25  # lossless WebP effort; higher is much slower for a few percent smaller
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+ARCHIVE_EXTENSIONS = ('.cbz', '.cbr', '.cb7', '.cbt')
+COMIC_EXTENSIONS = ('.pdf',) + ARCHIVE_EXTENSIONS
+
+def load_profile(path=None):
+    """Settings recorded by the last calibration of this machine, or {} if there is none"""
+    path = Path(path or PROFILE_PATH)
+    try:
+        with open(path, encoding='utf-8') as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning: Ignoring calibration profile {path}: {e}")
+        return {}
+    settings = {key: value for key, value in profile.get('settings', {}).items()
+                if key in PROFILE_SETTINGS and isinstance(value, type(DEFAULT_SETTINGS[key]))}
+    if profile.get('cpu_count') != multiprocessing.cpu_count():
+        # Worker counts tuned for another machine would over- or under-subscribe this one
+        print(f"Warning: {path} was calibrated on a {profile.get('cpu_count')}-CPU machine; "
+              f"run `comic_cruncher.py calibrate` again")
+        settings.pop('workers', None)
+        settings.pop('library_threads', None)
+    return settings
+
+def load_settings(overrides=None):
+    """Return processing settings: defaults, then calibration profile, then environment, then overrides"""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(load_profile())
+    for key, default in DEFAULT_SETTINGS.items():
+        value = os.environ.get(f"COMIC_CRUNCHER_{key.upper()}")
+        if value is None:
+            continue
+        try:
+            if isinstance(default, bool):
+                settings[key] = value.strip().lower() in ('1', 'true', 'yes', 'on')
+            else:
+                settings[key] = type(default)(value)
+        except ValueError:
+            print(f"Warning: Ignoring invalid value for {key}: {value}")
+    if overrides:
+        settings.update(overrides)
+    return settings
+
+def peak_process_memory():
+    """Peak resident memory of this process and its finished workers in bytes, or None if unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale
+
+def involuntary_context_switches():
+    """Involuntary context switches of this process and its finished workers, or None if unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_nivcsw +
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_nivcsw)
+
+# Thread pools started by native libraries inside each pool worker
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                   'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+def limit_library_threads(threads, low_priority=False):
+    """Pool initializer: cap the threads OpenCV and OpenMP/BLAS start inside one worker process
+
+    The limits are process-wide, so they are only for worker processes; anywhere else,
+    put the returned previous limits back with restore_library_threads().
+    """
+    previous = ({name: os.environ.get(name) for name in THREAD_ENV_VARS},
+                cv2.getNumThreads() if GPU_AVAILABLE else None)
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    if GPU_AVAILABLE:
+        cv2.setNumThreads(threads)
+    if low_priority:
+        set_low_priority(True)  # before the library threads start, so they inherit it
+    return previous
+
+def restore_library_threads(previous):
+    """Undo limit_library_threads() in this process"""
+    environment, opencv_threads = previous
+    for name, value in environment.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    if opencv_threads is not None:
+        cv2.setNumThreads(opencv_threads)
+
+def process_thread_ids(pid):
+    """Native ids of every thread of a process (Linux), else just the pid"""
+    try:
+        return [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        return [pid]
+
+def set_low_priority(low=True, pid=None):
+    """Lower (or restore) the CPU and I/O priority of the calling thread, or of every thread of pid"""
+    # On Linux both are per thread: new threads inherit them, existing ones need setting one by one
+    tids = process_thread_ids(pid) if pid else [threading.get_native_id()]
+    if hasattr(os, 'setpriority'):
+        for tid in tids:
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, LOW_PRIORITY_NICE if low else 0)
+            except PermissionError:
+                print("Warning: Restoring normal CPU priority needs privileges; restart the workers instead")
+                break
+            except OSError:
+                pass  # the thread exited
+    ionice = shutil.which('ionice')
+    if ionice:
+        for tid in tids:
+            subprocess.run([ionice, '-c', '2', '-n', '7' if low else '4', '-p', str(tid)], capture_output=True)
+
+class ThreadBudget:
+    """Splits the CPU between pool workers and the library threads inside each of them"""
+
+    def __init__(self, workers, library_threads=0, low_priority=False):
+        self.workers = workers
+        self.library_threads = library_threads or max(1, multiprocessing.cpu_count() // workers)
+        self.low_priority = low_priority
+        self.start_switches = involuntary_context_switches()
+
+    @classmethod
+    def for_settings(cls, settings):
+        """Budget for the configured worker and library thread counts"""
+        return cls(settings['workers'] or multiprocessing.cpu_count(), settings['library_threads'],
+                   settings['low_priority'])
+
+    def executor_args(self):
+        """Keyword arguments that apply the budget to a new process pool"""
+        return {'max_workers': self.workers, 'initializer': limit_library_threads,
+                'initargs': (self.library_threads, self.low_priority)}
+
+    def thread_executor_args(self):
+        """Keyword arguments for a thread pool in this process: library thread limits are
+        process-wide and would outlive the pool, so only the per-thread priority is applied"""
+        if self.low_priority:
+            return {'max_workers': self.workers, 'initializer': set_low_priority, 'initargs': (True,)}
+        return {'max_workers': self.workers}
+
+    def describe(self):
+        """Human readable budget and the context switches seen since it was created"""
+        summary = f"{self.workers} workers x {self.library_threads} library threads"
+        if self.low_priority:
+            summary += " at low priority"
+        switches = involuntary_context_switches()
+        if switches is not None:
+            summary += f", {switches - self.start_switches} involuntary context switches"
+        return summary
+
+class IoThrottle:
+    """Token buckets capping archive read/write bandwidth and operations per second for
+    every job in this process; callers sleep off the I/O they are about to do"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.caps = {'read': 0.0, 'write': 0.0, 'ops': 0.0}  # bytes or operations per second
+        self.buckets = {}  # kind -> [tokens, last refill]
+        self.window = deque()  # (time, kind, amount) within IO_WINDOW_SECONDS
+        self.waited = 0.0
+
+    def configure(self, settings):
+        """Apply the io_* settings; jobs already running pick them up on their next read or write"""
+        caps = {'read': settings['io_read_mbps'] * 1024 * 1024, 'write': settings['io_write_mbps'] * 1024 * 1024,
+                'ops': float(settings['io_ops_per_second'])}
+        with self.lock:
+            if caps != self.caps:
+                self.caps = caps
+                self.buckets = {}
+                self.window.clear()  # measure against the new caps only
+
+    def take(self, kind, amount, now):
+        """Reserve amount from a bucket (under the lock) and return how long to wait for it"""
+        rate = self.caps[kind]
+        if rate <= 0:
+            return 0.0
+        tokens, last = self.buckets.get(kind, (rate * IO_BURST_SECONDS, now))
+        tokens = min(rate * IO_BURST_SECONDS, tokens + (now - last) * rate) - amount
+        self.buckets[kind] = [tokens, now]
+        return max(0.0, -tokens / rate)
+
+    def account(self, kind, amount):
+        """Wait until amount bytes of kind ("read" or "write"), plus one operation, fit the caps"""
+        with self.lock:
+            now = time.monotonic()
+            delay = max(self.take(kind, amount, now), self.take('ops', 1, now))
+            self.window.append((now + delay, kind, amount))
+            self.waited += delay
+        if delay:
+            time.sleep(delay)
+
+    def read(self, amount):
+        self.account('read', amount)
+
+    def write(self, amount):
+        self.account('write', amount)
+
+    def snapshot(self):
+        """Caps next to the throughput achieved over the last IO_WINDOW_SECONDS"""
+        with self.lock:
+            now = time.monotonic()
+            while self.window and self.window[0][0] < now - IO_WINDOW_SECONDS:
+                self.window.popleft()
+            done = {'read': 0, 'write': 0}
+            for _, kind, amount in self.window:
+                done[kind] += amount
+            # Averaged over the window, or since the oldest I/O in it when that is more recent
+            span = max(1.0, min(IO_WINDOW_SECONDS, now - self.window[0][0])) if self.window else IO_WINDOW_SECONDS
+            caps, ops, waited = dict(self.caps), len(self.window), self.waited
+        return {
+            'read_mbps': done['read'] / span / (1024 * 1024),
+            'read_mbps_cap': caps['read'] / (1024 * 1024),
+            'write_mbps': done['write'] / span / (1024 * 1024),
+            'write_mbps_cap': caps['write'] / (1024 * 1024),
+            'iops': ops / span,
+            'iops_cap': caps['ops'],
+            'throttled_s': waited,
+        }
+
+    def describe(self):
+        """Achieved I/O against each cap that is set, or '' when nothing is capped"""
+        io = self.snapshot()
+        parts = [f"{kind} {io[f'{kind}_mbps']:.1f} of {io[f'{kind}_mbps_cap']:g} MB/s"
+                 for kind in ('read', 'write') if io[f'{kind}_mbps_cap']]
+        if io['iops_cap']:
+            parts.append(f"{io['iops']:.0f} of {io['iops_cap']:g} IOPS")
+        if not parts:
+            return ""
+        return f"I/O {', '.join(parts)} (last {IO_WINDOW_SECONDS}s), throttled {io['throttled_s']:.1f}s"
+
+# Shared by every job in the process so concurrent jobs stay under one cap together
+IO_THROTTLE = IoThrottle()
+
+def throttled_copy(source, dest, chunk_size=1024 * 1024):
+    """Copy a file (contents and metadata) through the I/O caps"""
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        while chunk := src.read(chunk_size):
+            IO_THROTTLE.read(len(chunk))
+            IO_THROTTLE.write(len(chunk))
+            dst.write(chunk)
+    shutil.copystat(source, dest)
+
+def estimate_image_memory(image_path):
+    """Estimate memory needed to process an image (a path or its bytes) from its header (w x h x channels)"""
+    in_memory = isinstance(image_path, bytes)
+    try:
+        with Image.open(io.BytesIO(image_path) if in_memory else image_path) as img:
+            width, height = img.size
+            channels = max(len(img.getbands()), 3)  # palette/grey pages get converted to RGB
+    except Exception:
+        # Unreadable header - assume a typical compression ratio
+        if in_memory:
+            return len(image_path) * 10
+        return os.path.getsize(image_path) * 10 if os.path.exists(image_path) else 0
+    # Decoded bitmap plus the working copy made while converting/resizing
+    return width * height * channels * 2
+
+def estimate_pdf_page_memory(pdf_info, dpi=PDF_RENDER_DPI):
+    """Estimate memory needed to render and process one PDF page from pdfinfo output"""
+    # e.g. "612 x 792 pts (letter)"
+    match = re.match(r'\s*([\d.]+)\s*x\s*([\d.]+)', str(pdf_info.get("Page size", "")))
+    if match:
+        width_pts, height_pts = float(match.group(1)), float(match.group(2))
+    else:
+        width_pts, height_pts = 612.0, 792.0  # assume US letter
+    width = int(width_pts / 72 * dpi)
+    height = int(height_pts / 72 * dpi)
+    return width * height * 3 * 2
+
+def render_pdf_page(pdf_path, page_number, dpi=PDF_RENDER_DPI, timeout=None):
+    """Render a single PDF page (1-based) to a PIL image, killing pdftoppm after timeout seconds"""
+    return pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number,
+                                       timeout=timeout)[0]
+
+def safe_member_path(dest_dir, member_name):
+    """Destination path for an archive member that cannot escape dest_dir"""
+    parts = [part for part in re.split(r'[\\/]+', member_name) if part not in ('', '.', '..')]
+    return os.path.join(dest_dir, *parts)
+
+ArchiveMember = namedtuple('ArchiveMember', ['name', 'size'])
+
+ARCHIVE_FORMATS_BY_EXTENSION = {
+    '.cbz': 'zip', '.zip': 'zip',
+    '.cbr': 'rar', '.rar': 'rar',
+    '.cb7': '7z', '.7z': '7z',
+    '.cbt': 'tar', '.tar': 'tar',
+}
+
+def detect_archive_format(path):
+    """Detect an archive's format from its magic bytes, falling back to the extension"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(512)
+    except OSError:
+        head = b''
+    # Mislabelled files are common (e.g. ZIPs named .cbr), so trust the content first
+    if head.startswith((b'PK\x03\x04', b'PK\x05\x06')):
+        return 'zip'
+    if head.startswith(b'Rar!\x1a\x07'):
+        return 'rar'
+    if head.startswith(b'7z\xbc\xaf\x27\x1c'):
+        return '7z'
+    if head[257:262] == b'ustar':
+        return 'tar'
+    return ARCHIVE_FORMATS_BY_EXTENSION.get(Path(path).suffix.lower())
+
+def split_member_stream(stream, members, error_class=OSError):
+    """Split a concatenated archive-order stream into (name, data) pairs"""
+    for member in members:
+        data = stream.read(member.size)
+        if len(data) != member.size:
+            raise error_class(f"Archive stream ended early at {member.name}")
+        yield member.name, data
+
+class ArchiveReader:
+    """Read-only access to the members of a comic archive"""
+
+    name = None
+    formats = ()  # archive formats this backend can read
+
+    @classmethod
+    def available(cls):
+        """Whether this backend can run on this host"""
+        return True
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def list_members(self):
+        """File members as ArchiveMember(name, size), in archive order"""
+        raise NotImplementedError
+
+    def open_member(self, name):
+        """Binary stream of a single member"""
+        raise NotImplementedError
+
+    def read_member(self, name):
+        with self.open_member(name) as f:
+            return f.read()
+
+    def iter_members(self):
+        """Yield (name, data) for every file member in one pass, in archive order"""
+        for member in self.list_members():
+            yield member.name, self.read_member(member.name)
+
+class ZipArchiveReader(ArchiveReader):
+    """Standard library zipfile backend"""
+
+    name = 'zipfile'
+    formats = ('zip',)
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.archive = zipfile.ZipFile(self.path, 'r')
+
+    def close(self):
+        self.archive.close()
+
+    def list_members(self):
+        return [ArchiveMember(info.filename, info.file_size)
+                for info in self.archive.infolist() if not info.is_dir()]
+
+    def open_member(self, name):
+        return self.archive.open(name)
+
+class RarArchiveReader(ArchiveReader):
+    """rarfile backend driving unrar (or whichever tool rarfile finds)"""
+
+    name = 'rarfile'
+    formats = ('rar',)
+
+    @classmethod
+    def available(cls):
+        try:
+            rarfile.tool_setup()
+            return True
+        except rarfile.RarCannotExec:
+            return False
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.archive = rarfile.RarFile(self.path, 'r')
+
+    def close(self):
+        self.archive.close()
+
+    def list_members(self):
+        return [ArchiveMember(info.filename, info.file_size)
+                for info in self.archive.infolist() if info.is_file()]
+
+    def open_member(self, name):
+        return self.archive.open(name)
+
+    def iter_members(self):
+        # Without a member argument the extraction tool streams every file to stdout
+        # in archive order, so solid archives are decompressed exactly once
+        members = self.list_members()
+        cmdline = rarfile.tool_setup().get_cmdline("open_cmd", None, nodash=True)
+        cmdline.append(os.path.abspath(self.path))  # absolute, so it can never look like a switch
+        proc = subprocess.Popen(cmdline, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            yield from split_member_stream(proc.stdout, members, rarfile.BadRarFile)
+            proc.stdout.close()
+            if proc.wait() != 0:
+                raise rarfile.BadRarFile(f"Extraction tool failed with exit code {proc.returncode}")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+class TarArchiveReader(ArchiveReader):
+    """Standard library tarfile backend for CBT"""
+
+    name = 'tarfile'
+    formats = ('tar',)
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.archive = tarfile.open(self.path, 'r')
+
+    def close(self):
+        self.archive.close()
+
+    def list_members(self):
+        return [ArchiveMember(info.name, info.size) for info in self.archive.getmembers() if info.isfile()]
+
+    def open_member(self, name):
+        return self.archive.extractfile(name)
+
+    def iter_members(self):
+        for info in self.archive:
+            if info.isfile():
+                yield info.name, self.archive.extractfile(info).read()
+
+class LibarchiveReader(ArchiveReader):
+    """libarchive backend (pip install libarchive-c); reads RAR5, 7z, ZIP and tar in-process"""
+
+    name = 'libarchive'
+    formats = ('zip', 'rar', '7z', 'tar')
+
+    @classmethod
+    def available(cls):
+        return LIBARCHIVE_AVAILABLE
+
+    def list_members(self):
+        with libarchive.file_reader(str(self.path)) as archive:
+            return [ArchiveMember(entry.pathname, entry.size) for entry in archive if entry.isfile]
+
+    def open_member(self, name):
+        # libarchive has no random access, so scan forward to the member
+        for member_name, data in self.iter_members():
+            if member_name == name:
+                return io.BytesIO(data)
+        raise KeyError(name)
+
+    def iter_members(self):
+        with libarchive.file_reader(str(self.path)) as archive:
+            for entry in archive:
+                if entry.isfile:
+                    yield entry.pathname, b''.join(entry.get_blocks())
+
+class SevenZipReader(ArchiveReader):
+    """7-Zip command line backend (7zz, 7z or 7za on PATH)"""
+
+    name = '7z'
+    formats = ('zip', 'rar', '7z', 'tar')
+
+    @classmethod
+    def tool(cls):
+        for candidate in ('7zz', '7z', '7za'):
+            path = shutil.which(candidate)
+            if path:
+                return path
+        return None
+
+    @classmethod
+    def available(cls):
+        return cls.tool() is not None
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.members = None
+
+    def list_members(self):
+        if self.members is None:
+            result = subprocess.run([self.tool(), 'l', '-slt', '--', os.path.abspath(self.path)],
+                                    capture_output=True, text=True, errors='replace', check=True)
+            # Entries are "Key = value" blocks after the "----------" separator
+            members = []
+            listing = result.stdout.split('----------', 1)[-1]
+            for block in listing.strip().split('\n\n'):
+                fields = dict(line.split(' = ', 1) for line in block.splitlines() if ' = ' in line)
+                if 'Path' not in fields or fields.get('Folder') == '+':
+                    continue
+                if fields.get('Attributes', '').startswith('D'):
+                    continue
+                members.append(ArchiveMember(fields['Path'], int(fields.get('Size') or 0)))
+            self.members = members
+        return self.members
+
+    def open_member(self, name):
+        # -spd: treat the name literally rather than as a wildcard
+        result = subprocess.run([self.tool(), 'e', '-so', '-spd', '--', os.path.abspath(self.path), name],
+                                capture_output=True, check=True)
+        return io.BytesIO(result.stdout)
+
+    def iter_members(self):
+        # "e -so" without a filter streams every file in archive order
+        members = self.list_members()
+        proc = subprocess.Popen([self.tool(), 'e', '-so', '--', os.path.abspath(self.path)],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            yield from split_member_stream(proc.stdout, members)
+            proc.stdout.close()
+            if proc.wait() != 0:
+                raise OSError(f"7-Zip failed with exit code {proc.returncode}")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+# Default preference order: in-process readers first, then external tools
+ARCHIVE_BACKENDS = [ZipArchiveReader, RarArchiveReader, TarArchiveReader, LibarchiveReader, SevenZipReader]
+
+def archive_backends_for(archive_format, preference=None):
+    """Available backends that can read archive_format, best first"""
+    if isinstance(preference, str):
+        preference = [name.strip() for name in preference.split(',') if name.strip()]
+    order = {name: rank for rank, name in enumerate(preference or [])}
+    backends = [backend for backend in ARCHIVE_BACKENDS
+                if archive_format in backend.formats and backend.available()]
+    # Preferred backends first, otherwise keep the default order (sort is stable)
+    return sorted(backends, key=lambda backend: order.get(backend.name, len(order)))
+
+def open_archive(path, preference=None):
+    """Open an archive with the best available backend for its format"""
+    archive_format = detect_archive_format(path)
+    if archive_format is None:
+        raise ValueError(f"Unsupported archive format: {Path(path).name}")
+
+    backends = archive_backends_for(archive_format, preference)
+    if not backends:
+        raise ValueError(f"No archive backend available for {archive_format} files "
+                         f"(install unrar, 7-Zip or libarchive-c)")
+
+    last_error = None
+    for backend in backends:
+        try:
+            return backend(path)
+        except Exception as e:
+            last_error = e
+    raise last_error
+
+def is_already_crunched(file_path, preference=None):
+    """Check if an archive already contains mostly WebP images"""
+    file_path = Path(file_path)
+    if file_path.suffix.lower() == '.pdf':
+        # PDFs are never pre-crunched
+        return False
+    try:
+        with open_archive(file_path, preference) as archive:
+            image_files = [member.name for member in archive.list_members()
+                           if member.name.lower().endswith(IMAGE_EXTENSIONS)]
+    except Exception as e:
+        print(f"Error checking if file is crunched: {e}")
+        return False
+    if not image_files:
+        return False
+    # If more than 80% are WebP, consider it already crunched
+    webp_count = sum(1 for f in image_files if f.lower().endswith('.webp'))
+    return (webp_count / len(image_files)) > 0.8
+
+class ArchivePages(list):
+    """Destination paths of an archive's image pages, written in one pass by extract()"""
+
+    def __init__(self, archive_path, members, backend=None, comic_info_name=None):
+        # members: (member name, destination path) pairs, listed in name order
+        super().__init__(dest for _, dest in members)
+        self.archive_path = Path(archive_path)
+        self.members = dict(members)
+        self.backend = backend
+        self.comic_info_name = comic_info_name
+        self.comic_info = None  # the source's ComicInfo.xml, picked up during the same pass
+
+    def read(self):
+        """Read pages in archive order, yielding (page path, bytes) without writing them to disk"""
+        reader = self.backend(self.archive_path) if self.backend else open_archive(self.archive_path)
+        stream = reader.iter_members()
+        remaining = len(self.members) + (1 if self.comic_info_name else 0)
+        try:
+            for name, data in stream:
+                if name == self.comic_info_name:
+                    self.comic_info = data
+                    remaining -= 1
+                    if remaining == 0:
+                        break
+                    continue
+                dest = self.members.get(name)
+                if dest is None:
+                    continue  # not a page (thumbnails db, ...)
+                IO_THROTTLE.read(len(data))
+                yield dest, data
+                remaining -= 1
+                if remaining == 0:
+                    break
+        finally:
+            stream.close()
+            reader.close()
+
+    def extract(self):
+        """Write pages in archive order, yielding each path as soon as it is on disk"""
+        pages = self.read()
+        try:
+            for dest, data in pages:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                IO_THROTTLE.write(len(data))
+                with open(dest, 'wb') as f:
+                    f.write(data)
+                yield dest
+        finally:
+            pages.close()
+
+    def extract_all(self):
+        """Write every page to disk and return the paths"""
+        for _ in self.extract():
+            pass
+        return self
+
+def list_archive_pages(archive_path, dest_dir, rename=None, preference=None):
+    """Plan single-pass extraction of an archive's images into dest_dir"""
+    with open_archive(archive_path, preference) as archive:
+        names = [member.name for member in archive.list_members()]
+        backend = type(archive)
+
+    members = []
+    comic_info_name = None
+    for name in sorted(names):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            dest = os.path.join(dest_dir, rename(name)) if rename else safe_member_path(dest_dir, name)
+            members.append((name, dest))
+        elif os.path.basename(name).lower() == COMIC_INFO_NAME.lower():
+            comic_info_name = name
+    return ArchivePages(archive_path, members, backend, comic_info_name)
+
+# Reader metadata; its <Pages> index lets readers paginate without opening every page
+COMIC_INFO_NAME = 'ComicInfo.xml'
+
+def page_index_entry(page):
+    """(image size, width, height) of an encoded page (path or EncodedPage) read from its header, not decoded"""
+    if isinstance(page, EncodedPage):
+        size, source = len(page.data), io.BytesIO(page.data)
+    else:
+        size, source = os.path.getsize(page), page
+    try:
+        with Image.open(source) as img:
+            width, height = img.size
+    except Exception as e:
+        print(f"Warning: No dimensions for the page index: {e}")
+        return size, None, None
+    return size, width, height
+
+# ComicInfo.xsd (v2.1) declares its elements as a sequence, so validating readers reject them out of order
+COMIC_INFO_ORDER = (
+    'Title', 'Series', 'Number', 'Count', 'Volume', 'AlternateSeries', 'AlternateNumber', 'AlternateCount',
+    'Summary', 'Notes', 'Year', 'Month', 'Day', 'Writer', 'Penciller', 'Inker', 'Colorist', 'Letterer',
+    'CoverArtist', 'Editor', 'Translator', 'Publisher', 'Imprint', 'Genre', 'Tags', 'Web', 'PageCount',
+    'LanguageISO', 'Format', 'BlackAndWhite', 'Manga', 'Characters', 'Teams', 'Locations', 'ScanInformation',
+    'StoryArc', 'StoryArcNumber', 'SeriesGroup', 'AgeRating', 'Pages', 'CommunityRating',
+    'MainCharacterOrTeam', 'Review', 'GTIN')
+
+def comic_info_element(root, name):
+    """root's name element, inserted at its schema position when it is missing"""
+    element = root.find(name)
+    if element is not None:
+        return element
+    element = ET.Element(name)
+    position = COMIC_INFO_ORDER.index(name)
+    for i, child in enumerate(root):
+        if child.tag in COMIC_INFO_ORDER and COMIC_INFO_ORDER.index(child.tag) > position:
+            root.insert(i, element)
+            return element
+    root.append(element)
+    return element
+
+def comic_info_xml(pages, existing=None, fields=None):
+    """ComicInfo.xml bytes with a <Pages> index of (image size, width, height) entries in reading order
+
+    Metadata from an existing ComicInfo.xml is kept; its page index and count are replaced.
+    """
+    root = None
+    if existing:
+        try:
+            root = ET.fromstring(existing)
+        except ET.ParseError as e:
+            print(f"Warning: Replacing unreadable {COMIC_INFO_NAME}: {e}")
+    if root is None:
+        root = ET.Element('ComicInfo')
+    for key, value in (fields or {}).items():
+        comic_info_element(root, key).text = str(value)
+    for name in ('PageCount', 'Pages'):
+        for element in root.findall(name):
+            root.remove(element)
+    comic_info_element(root, 'PageCount').text = str(len(pages))
+    index = comic_info_element(root, 'Pages')
+    for i, (size, width, height) in enumerate(pages):
+        attributes = {'Image': str(i), 'ImageSize': str(size)}
+        if width:
+            attributes.update(ImageWidth=str(width), ImageHeight=str(height))
+        if i == 0:
+            attributes['Type'] = 'FrontCover'
+        ET.SubElement(index, 'Page', attributes)
+    ET.indent(root)
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
+def append_comic_info(cbz_path, pages, existing=None, fields=None):
+    """Add ComicInfo.xml after the pages of a finished CBZ (only the central directory is rewritten)"""
+    with zipfile.ZipFile(cbz_path, 'a', zipfile.ZIP_DEFLATED) as cbz:
+        cbz.writestr(COMIC_INFO_NAME, comic_info_xml(pages, existing, fields))
+
+class MemoryBudgetScheduler:
+    """Submits tasks to an executor only while their estimated memory fits the budget"""
+
+    def __init__(self, executor, budget_bytes):
+        self.executor = executor
+        self.budget_bytes = budget_bytes
+        self.in_flight_bytes = 0
+        self.peak_bytes = 0
+        self.abandoned = 0  # thread tasks given up on that are still running
+        self.restarts = 0  # pool restarts seen by the watchdog
+
+    def submit(self, func, task, cost, in_flight, breaks=0):
+        future = self.executor.submit(func, task)
+        in_flight[future] = [cost, task, None, breaks]  # cost, task, first seen running, pool breaks survived
+        self.in_flight_bytes += cost
+        self.peak_bytes = max(self.peak_bytes, self.in_flight_bytes)
+
+    def imap(self, func, tasks, estimate, can_admit=None, guard=None, reject=None, quarantine=None):
+        """Run func over tasks under the memory budget, yielding results as they complete
+
+        can_admit(task) may hold back a task until earlier ones finish (it is still
+        admitted when nothing else is in flight).
+
+        With a PageGuard, tasks for which reject(task) gives a reason are never started,
+        tasks running past its page timeout are given up on (worker processes are killed
+        and replaced), tasks lost with a crashed worker are retried once, and
+        ProcessingTimedOut is raised past its file timeout. Tasks given up on are yielded
+        as quarantine(task, reason).
+        """
+        tasks = iter(tasks)
+        in_flight = {}
+        next_task = None
+        exhausted = False
+        deadline = time.monotonic() + guard.file_timeout if guard and guard.file_timeout else None
+        watch = bool(guard and (guard.page_timeout or deadline))
+        try:
+            while True:
+                # Admit work while it fits; always admit one task so an oversized page still runs
+                while not exhausted:
+                    if next_task is None:
+                        try:
+                            next_task = next(tasks)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        next_cost = estimate(next_task)
+                    if in_flight and self.in_flight_bytes + next_cost > self.budget_bytes:
+                        break
+                    if in_flight and can_admit and not can_admit(next_task):
+                        break
+                    reason = reject(next_task) if reject else None
+                    if reason:
+                        yield quarantine(next_task, reason)
+                    else:
+                        self.submit(func, next_task, next_cost, in_flight)
+                    next_task = None
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, timeout=WATCHDOG_INTERVAL_SECONDS if watch else None,
+                               return_when=FIRST_COMPLETED)
+                # Pages cancelled when a restart shut the old pool down are never reported done by wait()
+                done |= {future for future in in_flight if future.cancelled()}
+                for future in done:
+                    cost, task, started, breaks = in_flight.pop(future)
+                    self.in_flight_bytes -= cost
+                    try:
+                        result = future.result()
+                    except (BrokenProcessPool, CancelledError):
+                        # A worker died (killed by the watchdog or crashed on a page) and took the pool's
+                        # pages with it, running or queued; they get one more try on fresh workers
+                        replace_broken = getattr(self.executor, 'replace_broken', None)
+                        if not guard or not replace_broken or not replace_broken():
+                            raise
+                        if breaks and started:
+                            yield quarantine(task, "worker crashed on it")
+                        else:
+                            self.submit(func, task, cost, in_flight, breaks + bool(started))
+                        continue
+                    yield result
+                if watch:
+                    yield from self.watchdog(in_flight, guard, deadline, quarantine)
+        finally:
+            # Stopped early - drop anything that has not started yet
+            for future in in_flight:
+                future.cancel()
+            self.in_flight_bytes = 0
+
+    def watchdog(self, in_flight, guard, deadline, quarantine):
+        """Give up on tasks running past the page timeout, and on the file past its deadline"""
+        now = time.monotonic()
+        restart = getattr(self.executor, 'restart', None)
+        restarts = getattr(self.executor, 'restarts', 0)
+        if restarts != self.restarts:
+            # Everything running was killed and is being retried; clocks start again
+            self.restarts = restarts
+            for entry in in_flight.values():
+                entry[2] = None
+        if deadline and now > deadline:
+            if restart:
+                restart()  # free the workers still busy with this file
+            else:
+                self.abandoned += len(in_flight)
+            raise ProcessingTimedOut(f"took longer than {guard.file_timeout:g}s")
+        stuck = []
+        for future, entry in in_flight.items():
+            if entry[2] is None:
+                if future.running():
+                    entry[2] = now
+            elif guard.page_timeout and now - entry[2] > guard.page_timeout:
+                stuck.append(future)
+        if stuck and restart:
+            # A process pool counts the page queued behind a stuck one as running too; only the
+            # oldest is given up on, the rest are killed with it and retried
+            stuck = stuck[:1]
+        for future in stuck:
+            cost, task, _, _ = in_flight.pop(future)
+            self.in_flight_bytes -= cost
+            future.cancel()
+            yield quarantine(task, f"still running after {guard.page_timeout:g}s")
+        if stuck and restart:
+            restart()
+        elif stuck:
+            # Threads cannot be killed; they finish in the background (the next file gets fresh threads)
+            self.abandoned += len(stuck)
+
+    def describe(self):
+        """Human readable summary of memory use against the budget"""
+        summary = f"page memory peak {format_file_size(self.peak_bytes)} of {format_file_size(self.budget_bytes)} budget"
+        process_peak = peak_process_memory()
+        if process_peak:
+            summary += f" (process peak {format_file_size(process_peak)})"
+        return summary
+
+def sequenced_call(func, item):
+    """Run func on a (sequence, task) item and return (sequence, result, seconds)
+
+    The sequence number lets results be put back in page order, and the timing lets
+    pool workers report their busy time.
+    """
+    sequence, task = item
+    start = time.perf_counter()
+    result = func(task)
+    return sequence, result, time.perf_counter() - start
+
+# A page encoded in memory by the thread engine, written straight into the CBZ
+EncodedPage = namedtuple('EncodedPage', ['name', 'data'])
+
+# A page's primary output (path or EncodedPage) plus its (target index, bytes) renditions,
+# the border pixels trimmed from it and how it was encoded (see ImageProcessor.save_webp)
+PageOutputs = namedtuple('PageOutputs', ['primary', 'renditions', 'trimmed_pixels', 'encoding'])
+
+# A page the guard gave up on: its original (path or EncodedPage) to pass through, or None to leave it out
+QuarantinedPage = namedtuple('QuarantinedPage', ['name', 'page', 'reason'])
+
+class PageGuard:
+    """Limits that keep one pathological page from stalling a batch: a pixel budget checked
+    from the image header before anything is decoded, plus page and file time limits
+    enforced by the MemoryBudgetScheduler watchdog"""
+
+    def __init__(self, max_pixels=0, page_timeout=0, file_timeout=0, keep_original=True):
+        self.max_pixels = max_pixels
+        self.page_timeout = page_timeout
+        self.file_timeout = file_timeout
+        self.keep_original = keep_original
+
+    @classmethod
+    def for_settings(cls, settings):
+        return cls(int(settings['max_page_megapixels'] * 1_000_000), settings['page_timeout'],
+                   settings['file_timeout'], settings['quarantine'] != 'skip')
+
+    def check(self, task):
+        """Reason to quarantine a page task without decoding it, or None"""
+        if not self.max_pixels:
+            return None
+        try:
+            if isinstance(task[0], SharedBitmap):
+                width, height = task[0].size
+            elif len(task) == 2:
+                source = io.BytesIO(task[1]) if isinstance(task[1], bytes) else task[0]
+                with Image.open(source) as img:
+                    width, height = img.size
+            else:
+                return None  # a PDF page is only sized once rendered; its render timeout applies
+        except Image.DecompressionBombError:
+            return "over Pillow's decompression bomb limit"
+        except Exception:
+            return None  # unreadable headers are the encoder's problem
+        if width * height > self.max_pixels:
+            return f"{width}x{height} is over the {self.max_pixels / 1_000_000:g} megapixel limit"
+        return None
+
+    def passthrough(self, task):
+        """The page as it was in the archive, or None when it is left out (or there is no original)"""
+        if not self.keep_original or len(task) != 2:
+            return None
+        if isinstance(task[1], bytes):
+            return EncodedPage(os.path.basename(task[0]), task[1])
+        return task[0] if os.path.exists(task[0]) else None
+
+    @staticmethod
+    def page_name(task):
+        if isinstance(task[0], SharedBitmap):
+            return f"page {task[2] + 1}"
+        if len(task) == 3:
+            return f"page {task[1]}"
+        return os.path.basename(task[0])
+
+# An extra rendition of every page (or just the cover) written alongside the crunched comic
+OutputTarget = namedtuple('OutputTarget', ['size', 'quality', 'format', 'destination', 'cover_only'])
+TARGET_FORMATS = {'webp': ('WEBP', '.webp'), 'jpeg': ('JPEG', '.jpg'), 'png': ('PNG', '.png')}
+
+def parse_output_targets(spec):
+    """Output targets from the output_targets setting: a JSON list (or a file holding one) of
+    {"size", "quality", "format", "destination", "pages": "all" | "cover"} objects"""
+    if not spec:
+        return ()
+    try:
+        if os.path.isfile(spec):
+            with open(spec, encoding='utf-8') as f:
+                spec = f.read()
+        targets = []
+        for entry in json.loads(spec):
+            image_format = entry.get('format', 'webp').lower().replace('jpg', 'jpeg')
+            if image_format not in TARGET_FORMATS:
+                raise ValueError(f"unknown format {image_format}")
+            cover_only = entry.get('pages', 'all') == 'cover'
+            if not cover_only and entry['destination'].lower().endswith(IMAGE_EXTENSIONS):
+                raise ValueError(f"{entry['destination']} is a single image; use it with \"pages\": \"cover\"")
+            targets.append(OutputTarget(int(entry['size']), int(entry.get('quality', 85)), image_format,
+                                        entry['destination'], cover_only))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Warning: Ignoring invalid output_targets: {e}")
+        return ()
+    return tuple(targets)
+
+def page_targets(settings):
+    """Targets rendered by the page workers (cover-only targets are made once per comic)"""
+    return tuple(target for target in parse_output_targets(settings['output_targets']) if not target.cover_only)
+
+def save_rendition(image, output, target):
+    """Save an image to a path or file object in a target's format"""
+    image_format = TARGET_FORMATS[target.format][0]
+    if image_format == 'PNG':
+        image.save(output, image_format, optimize=True)
+    else:
+        image.save(output, image_format, quality=target.quality, optimize=True)
+
+class TargetOutputs:
+    """Collects one comic's renditions and publishes them to each target once the comic is done
+
+    Archives, folders and cover files are built under a .part name and moved into place
+    by commit(), so a failed or cancelled comic leaves no partial renditions behind.
+    """
+
+    @classmethod
+    def for_settings(cls, settings, file_path):
+        """Outputs for the configured targets, or None when there are none"""
+        targets = parse_output_targets(settings['output_targets'])
+        return cls(targets, file_path, settings['resize_filter']) if targets else None
+
+    def __init__(self, targets, file_path, resize_filter='lanczos'):
+        file_path = Path(file_path).absolute()  # relative destinations are relative to the comic
+        self.targets = targets
+        self.resize_filter = resize_filter
+        # Workers render only the page targets and number their renditions within them
+        self.page_indexes = [i for i, target in enumerate(targets) if not target.cover_only]
+        self.cover_indexes = [i for i, target in enumerate(targets) if target.cover_only]
+        self.destinations = []
+        for target in targets:
+            destination = os.path.expanduser(target.destination.format(stem=file_path.stem, dir=file_path.parent))
+            self.destinations.append(os.path.join(file_path.parent, destination))
+        self.archives = {}
+        self.archive_pages = {}  # target index -> page index for its ComicInfo.xml
+        self.written = set()
+        self.cover_done = False
+        self.committed = False
+
+    def kind(self, index):
+        destination = self.destinations[index].lower()
+        if destination.endswith('.cbz'):
+            return "archive"
+        return "file" if destination.endswith(IMAGE_EXTENSIONS) else "folder"
+
+    def store(self, index, name, data):
+        part = self.destinations[index] + '.part'
+        kind = self.kind(index)
+        if kind == "archive":
+            if index not in self.archives:
+                os.makedirs(os.path.dirname(part), exist_ok=True)
+                self.archives[index] = zipfile.ZipFile(part, 'w', zipfile.ZIP_STORED)
+                self.archive_pages[index] = []
+            IO_THROTTLE.write(len(data))
+            self.archives[index].writestr(name, data)
+            self.archive_pages[index].append(page_index_entry(EncodedPage(name, data)))
+        else:
+            path = part if kind == "file" else os.path.join(part, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            IO_THROTTLE.write(len(data))
+            with open(path, 'wb') as f:
+                f.write(data)
+        self.written.add(index)
+
+    def add(self, name, primary, renditions):
+        """Store a page's renditions; the first page also makes the cover targets from its primary output"""
+        stem = os.path.splitext(name)[0]
+        for index, data in renditions:
+            index = self.page_indexes[index]
+            self.store(index, stem + TARGET_FORMATS[self.targets[index].format][1], data)
+        if self.cover_done or not self.cover_indexes:
+            return
+        self.cover_done = True
+        with Image.open(io.BytesIO(primary) if isinstance(primary, bytes) else primary) as img:
+            img.load()
+            covers = [self.targets[i] for i in self.cover_indexes]
+            for index, data in ImageProcessor.target_renditions(img, covers, self.resize_filter):
+                index = self.cover_indexes[index]
+                self.store(index, "cover" + TARGET_FORMATS[self.targets[index].format][1], data)
+
+    def commit(self):
+        """Move every finished rendition into place and return their destinations"""
+        for index, archive in self.archives.items():
+            archive.writestr(COMIC_INFO_NAME, comic_info_xml(self.archive_pages[index]),
+                             compress_type=zipfile.ZIP_DEFLATED)
+            archive.close()
+        self.archives = {}
+        for index in sorted(self.written):
+            destination = self.destinations[index]
+            if self.kind(index) == "folder" and os.path.isdir(destination):
+                shutil.rmtree(destination)
+            os.replace(destination + '.part', destination)
+        self.committed = True
+        return [self.destinations[index] for index in sorted(self.written)]
+
+    def close(self):
+        """Discard renditions that were never committed"""
+        for archive in self.archives.values():
+            archive.close()
+        self.archives = {}
+        if self.committed:
+            return
+        for index in self.written:
+            part = self.destinations[index] + '.part'
+            if os.path.isdir(part):
+                shutil.rmtree(part, ignore_errors=True)
+            elif os.path.exists(part):
+                os.remove(part)
+            try:
+                os.rmdir(os.path.dirname(part))  # only if this comic was its first rendition
+            except OSError:
+                pass
+
+class PipelineStopped(Exception):
+    """Raised inside pipeline stages once the pipeline is shutting down"""
+
+class PagePipeline:
+    """Overlaps page reading, encoding and archive writing with bounded queues between stages
+
+    A reader thread pulls tasks from the source (e.g. pages streaming out of the input
+    archive), the executor encodes them under the memory budget and a writer thread
+    appends finished pages to the output CBZ, so disk and CPU are busy at the same time.
+    Pages are written in source order: ones that finish early wait in a reorder buffer,
+    and no page more than reorder_window ahead of the oldest unfinished one is started,
+    so a slow page cannot make the buffer grow without bound.
+    """
+
+    def __init__(self, executor, budget_bytes, queue_size=PIPELINE_QUEUE_SIZE,
+                 reorder_window=PIPELINE_REORDER_WINDOW, guard=None):
+        self.executor = executor
+        self.guard = guard
+        self.scheduler = MemoryBudgetScheduler(executor, budget_bytes)
+        self.workers = getattr(executor, '_max_workers', 1)  # encode utilization is per worker
+        self.queue_size = queue_size
+        self.reorder_window = reorder_window
+        self.oldest_unfinished = 0
+        self.peak_reorder = 0
+        self.stop_event = threading.Event()
+        self.busy = {'read': 0.0, 'encode': 0.0, 'write': 0.0}
+        self.errors = []
+        self.elapsed = 0.0
+        self.pages_written = 0
+        self.page_index = []  # (image size, width, height) of each written page, for ComicInfo.xml
+        self.quarantined = []  # (page name, reason) of pages the guard gave up on
+        self.trimmed_pixels = 0  # border pixels cropped before resizing
+        self.encodings = {}  # pages written per encoding ("lossy", "lossless", ...)
+        self.targets = None
+
+    def put(self, stage_queue, item):
+        while not self.stop_event.is_set():
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def get(self, stage_queue):
+        while not self.stop_event.is_set():
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise PipelineStopped()
+
+    def read_stage(self, tasks, read_queue):
+        numbered = enumerate(tasks)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(numbered)
+                except StopIteration:
+                    break
+                finally:
+                    self.busy['read'] += time.perf_counter() - start
+                self.put(read_queue, item)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            close = getattr(tasks, 'close', None)
+            if close:
+                close()  # release the archive stream
+            try:
+                self.put(read_queue, None)
+            except PipelineStopped:
+                pass
+
+    def write_stage(self, cbz, write_queue):
+        reorder = {}  # sequence -> page path or EncodedPage (None for pages that failed)
+        next_sequence = 0
+        try:
+            while True:
+                item = self.get(write_queue)
+                if item is None:
+                    return
+                sequence, page_path = item
+                reorder[sequence] = page_path
+                self.peak_reorder = max(self.peak_reorder, len(reorder))
+                while next_sequence in reorder:
+                    page_path = reorder.pop(next_sequence)
+                    next_sequence += 1
+                    if isinstance(page_path, QuarantinedPage):
+                        self.quarantined.append((page_path.name, page_path.reason))
+                        page_path = page_path.page  # the page as it was, or None to leave it out
+                    if page_path is None:
+                        continue
+                    renditions, encoding = (), 'lossy'
+                    if isinstance(page_path, PageOutputs):
+                        page_path, renditions, trimmed_pixels, encoding = page_path
+                        self.trimmed_pixels += trimmed_pixels
+                    self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+                    start = time.perf_counter()
+                    # Pages are stored uncompressed (WebP doesn't deflate) so readers can seek straight to them
+                    self.page_index.append(page_index_entry(page_path))
+                    IO_THROTTLE.write(len(page_path.data) if isinstance(page_path, EncodedPage) else
+                                      os.path.getsize(page_path))
+                    if isinstance(page_path, EncodedPage):
+                        cbz.writestr(page_path.name, page_path.data, compress_type=zipfile.ZIP_STORED)
+                        if self.targets:
+                            self.targets.add(page_path.name, page_path.data, renditions)
+                    else:
+                        cbz.write(page_path, os.path.basename(page_path), compress_type=zipfile.ZIP_STORED)
+                        if self.targets:
+                            self.targets.add(os.path.basename(page_path), page_path, renditions)
+                        os.remove(page_path)
+                    self.pages_written += 1
+                    self.busy['write'] += time.perf_counter() - start
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            self.errors.append(e)
+            self.stop_event.set()
+
+    def queued_tasks(self, read_queue):
+        while True:
+            item = self.get(read_queue)
+            if item is None:
+                return
+            yield item
+
+    def within_window(self, item):
+        return item[0] < self.oldest_unfinished + self.reorder_window
+
+    def quarantine(self, item, reason):
+        sequence, task = item
+        return sequence, QuarantinedPage(self.guard.page_name(task), self.guard.passthrough(task), reason), 0.0
+
+    def run(self, func, tasks, estimate, output_path, should_stop=None, targets=None):
+        """Encode tasks into the CBZ at output_path in order, yielding each page result as it completes
+
+        Renditions returned with each page are handed to targets (a TargetOutputs) in page order.
+        """
+        self.targets = targets
+        start = time.perf_counter()
+        read_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        finished = set()
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_STORED) as cbz:
+            reader = threading.Thread(target=self.read_stage, args=(tasks, read_queue), daemon=True)
+            writer = threading.Thread(target=self.write_stage, args=(cbz, write_queue), daemon=True)
+            reader.start()
+            writer.start()
+            try:
+                results = self.scheduler.imap(partial(sequenced_call, func), self.queued_tasks(read_queue),
+                                              lambda item: estimate(item[1]), self.within_window, self.guard,
+                                              self.guard and (lambda item: self.guard.check(item[1])),
+                                              self.quarantine)
+                for sequence, result, seconds in results:
+                    self.busy['encode'] += seconds
+                    finished.add(sequence)
+                    while self.oldest_unfinished in finished:
+                        finished.remove(self.oldest_unfinished)
+                        self.oldest_unfinished += 1
+                    self.put(write_queue, (sequence, result))
+                    yield result
+                    if should_stop and should_stop():
+                        self.stop_event.set()
+                        return
+                self.put(write_queue, None)
+                writer.join()
+            except PipelineStopped:
+                pass
+            finally:
+                self.stop_event.set()
+                reader.join()
+                writer.join()
+                self.elapsed = time.perf_counter() - start
+        if self.errors:
+            raise self.errors[0]
+
+    def utilization(self):
+        """Fraction of wall-clock time each stage spent working (encode is per worker)"""
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            'read': self.busy['read'] / elapsed,
+            'encode': self.busy['encode'] / (elapsed * self.workers),
+            'write': self.busy['write'] / elapsed,
+        }
+
+    def describe(self):
+        """Human readable summary of stage utilization and memory use"""
+        usage = ", ".join(f"{stage} {share:.0%}" for stage, share in self.utilization().items())
+        summary = (f"{self.pages_written} pages in {self.elapsed:.1f}s, stage utilization {usage}, "
+                   f"reorder buffer peak {self.peak_reorder} of {self.reorder_window}; {self.scheduler.describe()}")
+        if self.trimmed_pixels:
+            summary += f"; {describe_trim(self.trimmed_pixels)}"
+        if set(self.encodings) - {'lossy'}:
+            summary += f"; {describe_encodings(self.encodings)}"
+        return summary
+
+def estimate_scratch_bytes(file_path, preference=None):
+    """Preflight estimate of the scratch space crunching a file needs: its pages plus the new CBZ"""
+    file_size = os.path.getsize(file_path)
+    if str(file_path).lower().endswith('.pdf'):
+        return file_size * 2  # pages are rendered in memory; encoded pages plus the new CBZ
+    try:
+        with open_archive(file_path, preference) as archive:
+            page_bytes = sum(member.size for member in archive.list_members()
+                             if member.name.lower().endswith(IMAGE_EXTENSIONS))
+    except Exception:
+        page_bytes = file_size * 2
+    # Pages are deleted as they are encoded and written, so this is an upper bound
+    return page_bytes + file_size
+
+def make_backup(file_path):
+    """Keep the original next to itself as .backup, hard linked when possible so nothing is copied"""
+    backup_path = file_path.with_suffix(file_path.suffix + '.backup')
+    if backup_path.exists():
+        os.remove(backup_path)
+    try:
+        IO_THROTTLE.write(0)
+        os.link(file_path, backup_path)
+    except OSError:
+        throttled_copy(file_path, backup_path)
+    return backup_path
+
+def replace_file(source, dest):
+    """Move source over dest, staging a copy next to dest when they are on different filesystems"""
+    try:
+        os.replace(source, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        staging = dest.parent / f"temp_{dest.name}"
+        throttled_copy(source, staging)
+        os.replace(staging, dest)
+        os.remove(source)
+
+def restore_original(file_path, backup_path):
+    """Roll back a cancelled or failed crunch: keep (or put back) the original and drop the backup"""
+    if not backup_path or not backup_path.exists():
+        return
+    if file_path.exists():
+        os.remove(backup_path)  # the original was never touched
+    else:
+        os.replace(backup_path, file_path)
+
+def shutdown_executor(executor, timeout=CANCEL_TIMEOUT_SECONDS):
+    """Cancel queued work and stop in-flight workers, killing processes that outlive timeout"""
+    # Threads cannot be interrupted and finish their current page; worker processes can
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    deadline = time.time() + timeout
+    for process in processes:
+        process.join(max(0, deadline - time.time()))
+        if process.is_alive():
+            process.kill()
+
+class RestartablePool:
+    """Process pool whose workers can be killed and replaced (e.g. by the page watchdog) while
+    the job goes on; pages in flight on the old workers fail with BrokenProcessPool"""
+
+    def __init__(self, **executor_args):
+        self.executor_args = executor_args
+        self._max_workers = executor_args['max_workers']  # read by PagePipeline for utilization
+        self.lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(**executor_args)
+        self.closed = False
+        self.restarts = 0
+
+    @property
+    def _processes(self):
+        return self.executor._processes  # shutdown_executor() kills these
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def submit(self, func, *args, **kwargs):
+        self.replace_broken()
+        return self.executor.submit(func, *args, **kwargs)
+
+    def replace_broken(self):
+        """Start fresh workers if a worker died and broke the pool; False once shut down"""
+        with self.lock:
+            if self.closed:
+                return False
+            if self.executor._broken:
+                self.executor = ProcessPoolExecutor(**self.executor_args)
+                self.restarts += 1
+            return True
+
+    def restart(self):
+        """Kill every worker, e.g. one stuck on a page, and start fresh ones"""
+        with self.lock:
+            if self.closed:
+                return
+            old = self.executor
+            self.executor = ProcessPoolExecutor(**self.executor_args)
+            self.restarts += 1
+        shutdown_executor(old)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self.lock:
+            self.closed = True
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+class BorrowedExecutor:
+    """One job's share of a SharedProcessPool: shutting it down cancels only this job's pages"""
+
+    def __init__(self, executor):
+        self.executor = executor  # the shared RestartablePool
+        self._max_workers = executor._max_workers  # read by PagePipeline for utilization
+        self.futures = set()
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def submit(self, func, *args, **kwargs):
+        if self.closed:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        future = self.executor.submit(func, *args, **kwargs)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self.discard)
+        return future
+
+    def discard(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        # The processes belong to the pool; pages already running finish and are dropped
+        self.closed = True
+        with self.lock:
+            futures = list(self.futures)
+        if cancel_futures:
+            for future in futures:
+                future.cancel()
+        if wait:
+            concurrent.futures.wait(futures)
+
+    def replace_broken(self):
+        return not self.closed and self.executor.replace_broken()
+
+    def restart(self):
+        # Other jobs' pages in flight fail too; their schedulers retry them
+        self.executor.restart()
+
+    @property
+    def restarts(self):
+        return self.executor.restarts
+
+class SharedProcessPool:
+    """Worker processes shared by every job in this process instead of a pool per file"""
+
+    def __init__(self, settings=None):
+        self.thread_budget = ThreadBudget.for_settings(settings or load_settings())
+        self.lock = threading.Lock()
+        # A crashed worker breaks the whole pool; the next page submitted starts fresh workers
+        self.executor = RestartablePool(**self.thread_budget.executor_args())
+
+    def borrow(self):
+        """Executor for one job's pages"""
+        return BorrowedExecutor(self.executor)
+
+    def set_low_priority(self, low):
+        """Change the priority of the running workers and of any started later"""
+        with self.lock:
+            self.thread_budget.low_priority = low
+            self.executor.executor_args = self.thread_budget.executor_args()
+            processes = list((self.executor._processes or {}).values())
+        for process in processes:
+            set_low_priority(low, process.pid)
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+class ProcessingCancelled(Exception):
+    """Raised inside a processor once stop() has been called"""
+
+class ProcessingTimedOut(Exception):
+    """Raised when a file runs past the file_timeout setting; the original is left untouched"""
+
+class ScratchSpace:
+    """Scratch directory (tmpfs, local SSD, ...) with a byte budget shared by every job in the process"""
+
+    shared = {}
+    shared_lock = threading.Lock()
+
+    @classmethod
+    def for_settings(cls, settings):
+        """The shared scratch space for the configured directory and budget"""
+        key = (settings['scratch_dir'] or tempfile.gettempdir(), settings['scratch_budget_mb'])
+        with cls.shared_lock:
+            if key not in cls.shared:
+                cls.shared[key] = cls(key[0], key[1] * 1024 * 1024)
+            return cls.shared[key]
+
+    def __init__(self, path, budget_bytes=0):
+        self.path = path
+        self.budget_bytes = budget_bytes
+        self.reserved = 0
+        self.condition = threading.Condition()
+        os.makedirs(self.path, exist_ok=True)
+
+    def available(self):
+        free = shutil.disk_usage(self.path).free - self.reserved
+        if self.budget_bytes:
+            free = min(free, self.budget_bytes - self.reserved)
+        return free
+
+    def reserve(self, size, timeout=SCRATCH_WAIT_SECONDS, notify=None):
+        """Wait until size bytes are free and reserve them; False if they never become free"""
+        deadline = time.time() + timeout
+        with self.condition:
+            if self.available() < size and self.reserved and notify:
+                notify(f"Waiting for {format_file_size(size)} of scratch space in {self.path}")
+            while self.available() < size:
+                remaining = deadline - time.time()
+                # Only running jobs can free space - if there are none, waiting will not help
+                if not self.reserved or remaining <= 0:
+                    return False
+                self.condition.wait(min(remaining, 1.0))
+            self.reserved += size
+            return True
+
+    def release(self, size):
+        with self.condition:
+            self.reserved -= size
+            self.condition.notify_all()
+
+    @contextmanager
+    def job(self, file_path, size, notify=None):
+        """Reserve scratch space for one file and yield a private work directory
+
+        When the budget stays too tight the job spills to a work directory next to
+        the file instead of failing halfway; that volume is checked up front too.
+        """
+        reserved = self.reserve(size, notify=notify)
+        base = self.path
+        if not reserved:
+            base = str(Path(file_path).parent)
+            free = shutil.disk_usage(base).free
+            if free < size:
+                raise OSError(f"Not enough disk space: {format_file_size(size)} needed, "
+                              f"{format_file_size(free)} free")
+            if notify:
+                notify(f"Warning: Scratch space is full, working next to {Path(file_path).name}")
+        work_dir = tempfile.mkdtemp(prefix="comic_cruncher_", dir=base)
+        try:
+            yield work_dir
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if reserved:
+                self.release(size)
+
+# sampled: member name -> encode_bytes result of each sampled page, so the crunch can reuse it
+SavingsEstimate = namedtuple('SavingsEstimate', ['original_size', 'projected_size', 'projected_seconds',
+                                                 'pages', 'sample_pages', 'sampled'])
+
+# Encoded sample pages a batch keeps for its crunch; past this, later estimates drop theirs
+SAMPLE_REUSE_BYTES = 256 * 1024 * 1024
+
+def estimate_savings(file_path, settings=None):
+    """Project a file's crunched size and time by encoding a few evenly spaced pages
+
+    Pages are encoded with the same settings as the crunch, so their results can be reused
+    for it. Returns a SavingsEstimate, or None when the file cannot be sampled (PDFs,
+    unreadable archives).
+    """
+    settings = settings or load_settings()
+    file_path = Path(file_path)
+    if file_path.suffix.lower() not in ARCHIVE_EXTENSIONS:
+        return None  # PDF pages would have to be rendered first, which is most of the work
+    encode = partial(ImageProcessor.encode_bytes, backend=settings['image_backend'],
+                     resize_filter=settings['resize_filter'], targets=page_targets(settings),
+                     trim=settings['trim_margins'], flat_colors=settings['flat_page_colors'])
+    try:
+        with open_archive(file_path, settings['archive_backends']) as archive:
+            pages = sorted((member for member in archive.list_members()
+                            if member.name.lower().endswith(IMAGE_EXTENSIONS)), key=lambda member: member.name)
+            if not pages:
+                return None
+            count = min(settings['estimate_sample_pages'], len(pages))
+            samples = [pages[int((i + 0.5) * len(pages) / count)] for i in range(count)]
+            sample_bytes = encoded_bytes = 0
+            sampled = {}
+            start = time.perf_counter()
+            for member in samples:
+                encoded = encode(archive.read_member(member.name))
+                if encoded is None:
+                    return None
+                sampled[member.name] = encoded
+                sample_bytes += member.size
+                encoded_bytes += len(encoded.primary if isinstance(encoded, PageOutputs) else encoded)
+            seconds_per_page = (time.perf_counter() - start) / count
+    except Exception as e:
+        print(f"Warning: Could not estimate savings for {file_path.name}: {e}")
+        return None
+
+    original_size = file_path.stat().st_size
+    ratio = encoded_bytes / sample_bytes if sample_bytes else 1.0
+    workers = ThreadBudget.for_settings(settings).workers
+    return SavingsEstimate(original_size, int(original_size * ratio),
+                           seconds_per_page * len(pages) / workers, len(pages), count, sampled)
+
+def sampled_bytes(estimate):
+    """Memory held by an estimate's encoded sample pages"""
+    total = 0
+    for encoded in (estimate.sampled or {}).values():
+        if isinstance(encoded, PageOutputs):
+            total += len(encoded.primary) + sum(len(data) for _, data in encoded.renditions)
+        else:
+            total += len(encoded)
+    return total
+
+def savings_percent(original_size, new_size):
+    return (original_size - new_size) / original_size * 100 if original_size else 0.0
+
+def record_savings_estimate(log_path, file_path, estimate, new_size, seconds):
+    """Append projected vs actual savings to the estimator log so its accuracy can be tracked"""
+    log_path = Path(log_path) if log_path else CONFIG_DIR / "savings_estimates.jsonl"
+    entry = {
+        'file': str(file_path),
+        'time': time.time(),
+        'pages': estimate.pages,
+        'sample_pages': estimate.sample_pages,
+        'original_size': estimate.original_size,
+        'projected_size': estimate.projected_size,
+        'actual_size': new_size,
+        'projected_savings_percent': round(savings_percent(estimate.original_size, estimate.projected_size), 2),
+        'actual_savings_percent': round(savings_percent(estimate.original_size, new_size), 2),
+        'projected_seconds': round(estimate.projected_seconds, 2),
+        'actual_seconds': round(seconds, 2),
+    }
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"Warning: Could not write savings log {log_path}: {e}")
+    return entry
+
+def record_quarantine(log_path, file_path, pages, action):
+    """Append pages (name, reason) the guard gave up on, or a whole file with name None, to the quarantine log"""
+    log_path = Path(log_path) if log_path else CONFIG_DIR / "quarantine.jsonl"
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            for name, reason in pages:
+                f.write(json.dumps({'file': str(file_path), 'time': time.time(), 'page': name,
+                                    'reason': reason, 'action': action}) + "\n")
+    except OSError as e:
+        print(f"Warning: Could not write quarantine log {log_path}: {e}")
+
+def describe_quarantine(pages):
+    return f"Quarantined {len(pages)} page(s): " + "; ".join(f"{name} ({reason})" for name, reason in pages)
+
+# Filename parsing for the combiner. Trailing "(2016)", "(Digital)", "[group]" tags are
+# peeled off first; the issue is then the last number in what remains, so names like
+# "Spider-Man 2099 001" keep the number that belongs to the series.
+TRAILING_TAG_PATTERN = re.compile(r'\s*[\(\[]([^\(\)\[\]]*)[\)\]]\s*$')
+ISSUE_PATTERN = re.compile(
+    r'(?:[\s_-]+|(?=#))'
+    r'(?:(?P<annual>annual)[\s_-]*)?'
+    r'(?:(?:issue|no\.?)\s*|#)?'
+    r'(?P<issue>\d+(?:\.\d+)?)$',
+    re.IGNORECASE)
+YEAR_PATTERN = re.compile(r'^(?:19|20)\d{2}$')
+SERIES_KEY_PATTERN = re.compile(r'[\W_]+')
+
+ComicName = namedtuple('ComicName', ['path', 'series', 'key', 'issue', 'annual', 'year'])
+CombinePlan = namedtuple('CombinePlan', ['series', 'volume', 'issues', 'files', 'name'])
+
+def parse_comic_name(file_path):
+    """Parse series, issue ("12", "12.1"), annual flag and year from a comic filename, or None"""
+    name = os.path.splitext(os.path.basename(file_path))[0].replace('_', ' ')
+    year = None
+    while True:
+        tag = TRAILING_TAG_PATTERN.search(name)
+        if not tag:
+            break
+        text = tag.group(1).strip()
+        if text.lower().startswith('issues '):
+            return None  # a volume we combined earlier
+        if YEAR_PATTERN.match(text):
+            year = int(text)
+        name = name[:tag.start()]
+
+    name = name.strip()
+    match = ISSUE_PATTERN.search(name)
+    series = name[:match.start()].strip(' -#') if match else None
+    # "Batman (2016) 012" names the same run as "Batman 012 (2016)"
+    tag = TRAILING_TAG_PATTERN.search(series) if series else None
+    if tag and YEAR_PATTERN.match(tag.group(1).strip()):
+        year = year or int(tag.group(1))
+        series = series[:tag.start()].strip(' -#')
+    if not series:
+        return None
+    annual = bool(match.group('annual'))
+    issue = match.group('issue')
+    whole, _, fraction = issue.partition('.')
+    issue = str(int(whole)) + ('.' + fraction if fraction else '')
+    return ComicName(file_path, series, series_key(series, annual), issue, annual, year)
+
+@lru_cache(maxsize=65536)
+def series_key(series, annual):
+    """Grouping key: case, punctuation and spacing differences do not split a series"""
+    # The year is left out: it is usually each issue's cover date, which changes along a run
+    return SERIES_KEY_PATTERN.sub(' ', series).strip().lower(), annual
+
+def split_runs(comics):
+    """Split one series' issues into runs, by year, where their issue numbers start over
+
+    Years only split a series when an issue number comes back under a different year
+    ("Batman 001 (1940)" and "Batman 001 (2016)"); issues sharing a year stay together.
+    """
+    issues = [comic.issue for comic in comics]
+    if len(set(issues)) == len(issues):
+        return [comics]
+    runs = []
+    for comic in sorted(comics, key=lambda comic: (comic.year or 0, issue_sort_key(comic.issue), str(comic.path))):
+        if (not runs or comic.year and comic.year != runs[-1][-1].year and
+                any(other.issue == comic.issue for other in runs[-1])):
+            runs.append([comic])
+        else:
+            runs[-1].append(comic)
+    return [sorted(run, key=lambda comic: (issue_sort_key(comic.issue), str(comic.path))) for run in runs]
+
+def issue_sort_key(issue):
+    whole, _, fraction = issue.partition('.')
+    return int(whole), int(fraction or -1)
+
+def format_issue_range(issues):
+    """Format issue numbers into a readable range string ("1-6, 8, 12.1")"""
+    ranges = []
+    start = end = None
+    for issue in issues:
+        issue = str(issue)
+        if end is not None and '.' not in issue and '.' not in end and int(issue) == int(end) + 1:
+            end = issue
+            continue
+        if start is not None:
+            ranges.append(start if start == end else f"{start}-{end}")
+        start = end = issue
+    if start is not None:
+        ranges.append(start if start == end else f"{start}-{end}")
+    return ", ".join(ranges)
+
+def group_series(file_paths):
+    """Group files into every series they contain in one pass: ({key: [ComicName]}, unmatched paths)"""
+    series = {}
+    unmatched = []
+    for file_path in file_paths:
+        comic = parse_comic_name(file_path)
+        if comic is None:
+            unmatched.append(file_path)
+        else:
+            series.setdefault(comic.key, []).append(comic)
+    return series, unmatched
+
+def plan_combines(file_paths, batch_size=TPB_BATCH_SIZE):
+    """Plan TPB volumes for every series in file_paths: ([CombinePlan], unmatched paths, conflicts)
+
+    A series whose issue numbers start over under a new year is planned as one run per
+    year it restarts in, and titles carry the first year of their run. An issue found
+    twice in a run is left out of it (the originals are deleted once their volume is
+    written, and there is no telling which copy to keep); it comes back as a conflict:
+    (series, issue, paths). Runs left with a single issue have nothing to combine and are
+    returned as unmatched.
+    """
+    series, unmatched = group_series(file_paths)
+    plans = []
+    conflicts = []
+    runs = []
+    for key in sorted(series):
+        runs.extend(split_runs(sorted(series[key], key=lambda comic: (issue_sort_key(comic.issue),
+                                                                       str(comic.path)))))
+    for comics in runs:
+        title = comics[0].series + (" Annual" if comics[0].annual else "")
+        years = [comic.year for comic in comics if comic.year]
+        if years:
+            title += f" ({min(years)})"
+        by_issue = {}
+        for comic in comics:
+            by_issue.setdefault(comic.issue, []).append(comic.path)
+        duplicates = [(title, issue, paths) for issue, paths in by_issue.items() if len(paths) > 1]
+        if duplicates:
+            conflicts.extend(duplicates)
+            comics = [comic for comic in comics if len(by_issue[comic.issue]) == 1]
+        if len(comics) < 2:
+            unmatched.extend(comic.path for comic in comics)
+            continue
+        for index in range(0, len(comics), batch_size):
+            batch = comics[index:index + batch_size]
+            volume = index // batch_size + 1
+            issues = [comic.issue for comic in batch]
+            name = f"{title} Vol {volume} (Issues {format_issue_range(issues)}).cbz"
+            plans.append(CombinePlan(title, volume, issues, [comic.path for comic in batch], name))
+    return plans, unmatched, conflicts
+
+class Signal:
+    """Qt-free progress signal: run() calls emit() on the processing thread, and every
+    connected callback is called there (the GUI re-emits them as Qt signals)"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def emit(self, *args):
+        for callback in list(self.callbacks):
+            callback(*args)
+
+class ComicCombiner:
+    """Combines comic issues into TPB collections; run() blocks, so callers give it a thread"""
+    
+    def __init__(self, file_paths, settings=None):
+        self.progress_update = Signal()  # stage, percentage
+        self.file_info_update = Signal()  # current file info
+        self.finished = Signal()  # success, message
+        self.file_paths = file_paths
+        self.settings = settings or load_settings()
+        self.should_stop = False
+        self.cancel_started = None
+    
+    def run(self):
+        IO_THROTTLE.configure(self.settings)
+        try:
+            if len(self.file_paths) < 2:
+                self.finished.emit(False, "Need at least 2 files to combine")
+                return
+            
+            self.progress_update.emit("SCANNING", 10)
+            
+            # Group every series in the drop and split each into volumes
+            plans, unmatched, conflicts = plan_combines(self.file_paths, TPB_BATCH_SIZE)
+            for file_path in unmatched:
+                reason = ("no series/issue in name" if parse_comic_name(file_path) is None
+                          else "no other issues to combine with")
+                self.file_info_update.emit(f"Skipped: {Path(file_path).name} ({reason})")
+            for series, issue, paths in conflicts:
+                names = ", ".join(Path(path).name for path in paths)
+                self.file_info_update.emit(f"Skipped {series} issue {issue}: appears more than once ({names})")
+            if not plans:
+                self.finished.emit(False, "Duplicate issue numbers: nothing was combined" if conflicts
+                                   else "Could not detect comic series pattern")
+                return
+            
+            issue_count = sum(len(plan.files) for plan in plans)
+            series_count = len({plan.series for plan in plans})
+            self.file_info_update.emit(f"Found {issue_count} issues in {series_count} series, "
+                                       f"creating {len(plans)} TPB volumes")
+            
+            total_created = 0
+            
+            # Process each volume
+            for batch_idx, plan in enumerate(plans):
+                if self.should_stop:
+                    raise ProcessingCancelled()
+                
+                batch_files = plan.files
+                volume_num = plan.volume
+                tpb_name = plan.name
+                output_path = Path(batch_files[0]).parent / tpb_name
+                
+                # Update progress for this batch
+                batch_progress = 20 + int((batch_idx / len(plans)) * 60)
+                self.progress_update.emit("COMBINING", batch_progress)
+                self.file_info_update.emit(f"Creating {plan.series} Volume {volume_num}: {len(batch_files)} issues")
+                
+                # Combine all images from this batch
+                scratch = ScratchSpace.for_settings(self.settings)
+                needed = sum(estimate_scratch_bytes(f, self.settings['archive_backends']) for f in batch_files)
+                with scratch.job(batch_files[0], needed, self.file_info_update.emit) as temp_dir:
+                    all_images = []
+                    
+                    for i, file_path in enumerate(batch_files):
+                        if self.should_stop:
+                            raise ProcessingCancelled()
+                        
+                        file_name = Path(file_path).name
+                        self.file_info_update.emit(f"Processing: {file_name}")
+                        
+                        # Extract images from this issue
+                        images = self.extract_images_from_comic(file_path, temp_dir, i)
+                        all_images.extend(images)
+                    
+                    if not all_images:
+                        self.file_info_update.emit(f"Warning: No images found in Volume {volume_num}")
+                        continue
+                    
+                    # Create combined CBZ for this batch: stored pages, cover first, then the page index
+                    page_index = []
+                    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as tpb:
+                        for img_path in sorted(all_images):
+                            if os.path.exists(img_path):
+                                IO_THROTTLE.write(os.path.getsize(img_path))
+                                tpb.write(img_path, os.path.basename(img_path), compress_type=zipfile.ZIP_STORED)
+                                page_index.append(page_index_entry(img_path))
+                        tpb.writestr(COMIC_INFO_NAME, comic_info_xml(
+                            page_index, fields={'Series': plan.series, 'Volume': volume_num}))
+                    
+                    # Remove original files from this batch
+                    for file_path in batch_files:
+                        try:
+                            os.remove(file_path)
+                        except Exception as e:
+                            print(f"Warning: Could not remove {file_path}: {e}")
+                    
+                    total_created += 1
+                    self.file_info_update.emit(f"Completed: {tpb_name}")
+            
+            self.progress_update.emit("FINALIZING", 100)
+            
+            if total_created > 1:
+                message = f"Created {total_created} TPB volumes from {issue_count} issues"
+            else:
+                message = f"Created 1 TPB volume from {issue_count} issues"
+            if series_count > 1:
+                message += f" across {series_count} series"
+            
+            self.finished.emit(True, message)
+                
+        except ProcessingCancelled:
+            # Volumes already written are complete; the one in progress never reached the library
+            self.finished.emit(False, f"Cancelled: stopped in {time.perf_counter() - self.cancel_started:.1f}s, "
+                                      f"{total_created} volumes created")
+        except MemoryError as e:
+            self.finished.emit(False, f"Memory Error: Not enough memory to combine files. Try fewer files at once.")
+        except PermissionError as e:
+            self.finished.emit(False, f"Permission Error: Cannot access files. Check file permissions.")
+        except Exception as e:
+            self.finished.emit(False, f"Combination error: {str(e)}")
+    
+    def format_issue_range(self, issues):
+        """Format issue numbers into a readable range string"""
+        return format_issue_range(issues)
+    
+    def extract_images_from_comic(self, file_path, temp_dir, issue_index):
+        """Extract images from a comic file"""
+        images = []
+        try:
+            file_path = Path(file_path)
+            
+            if file_path.suffix.lower() in ARCHIVE_EXTENSIONS:
+                def unique_name(filename):
+                    # Prefix with the issue index so pages from different issues never collide
+                    name, ext = os.path.splitext(os.path.basename(filename))
+                    return f"issue_{issue_index:03d}_{name}{ext}"
+                
+                pages = list_archive_pages(file_path, temp_dir, rename=unique_name,
+                                           preference=self.settings['archive_backends'])
+                for path in pages.extract():
+                    images.append(path)
+        
+        except Exception as e:
+            print(f"Error extracting from {file_path}: {e}")
+        
+        return sorted(images)
+    
+    def stop(self):
+        if not self.should_stop:
+            self.cancel_started = time.perf_counter()
+        self.should_stop = True
+
+def find_margins(image):
+    """Crop box (left, top, right, bottom) without a page's uniform white or black borders, or None
+
+    Borders are found on a small greyscale sample: rows and columns from each edge belong
+    to the border while nearly all their pixels are within TRIM_TOLERANCE of the colour
+    in the corners.
+    """
+    width, height = image.size
+    scale = max(1, max(width, height) // TRIM_SAMPLE_SIZE)
+    try:
+        # Nearest-neighbour sampling is far cheaper than averaging; stray specks are tolerated below
+        sample = image.resize((max(1, width // scale), max(1, height // scale)), Image.Resampling.NEAREST)
+        pixels = np.asarray(sample.convert('L'), dtype=np.int16)
+    except (ValueError, OSError):
+        return None
+    background = int(np.median(pixels[[0, 0, -1, -1], [0, -1, 0, -1]]))
+    if TRIM_TOLERANCE < background < 255 - TRIM_TOLERANCE:
+        return None  # only scanner white or black, not art that happens to fill the corners
+    stray = np.abs(pixels - background) > TRIM_TOLERANCE
+    rows = stray.mean(axis=1) > TRIM_NOISE_FRACTION
+    columns = stray.mean(axis=0) > TRIM_NOISE_FRACTION
+    if not rows.any() or not columns.any():
+        return None  # a blank page
+    top, bottom = int(rows.argmax()), len(rows) - int(rows[::-1].argmax())
+    left, right = int(columns.argmax()), len(columns) - int(columns[::-1].argmax())
+    # A sampled pixel can straddle the edge of the art, so one is left on each side
+    x_scale, y_scale = width / len(columns), height / len(rows)
+    box = (max(0, int((left - 1) * x_scale)), max(0, int((top - 1) * y_scale)),
+           min(width, math.ceil((right + 1) * x_scale)), min(height, math.ceil((bottom + 1) * y_scale)))
+    if box == (0, 0, width, height):
+        return None
+    if box[2] - box[0] < width * TRIM_MIN_KEEP or box[3] - box[1] < height * TRIM_MIN_KEEP:
+        return None  # mostly blank pages keep their layout
+    return box
+
+def is_flat_page(image, max_colors):
+    """Whether at most max_colors colours cover FLAT_COVERAGE of a page: flat colour or line art
+
+    Exact colours are counted on a small sample, so scans, whose paper and print grain
+    spread every fill over many colours, are not flat.
+    """
+    width, height = image.size
+    scale = max(1, max(width, height) // FLAT_SAMPLE_SIZE)
+    try:
+        sample = image.resize((max(1, width // scale), max(1, height // scale)), Image.Resampling.NEAREST)
+        if sample.mode == 'L':
+            keys = np.asarray(sample).ravel()
+        else:
+            pixels = np.asarray(sample.convert('RGB'), dtype=np.uint32)
+            keys = ((pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]).ravel()
+    except (ValueError, OSError):
+        return False
+    counts = np.sort(np.unique(keys, return_counts=True)[1])[::-1]
+    needed = int(np.searchsorted(np.cumsum(counts), FLAT_COVERAGE * keys.size)) + 1
+    return needed <= max_colors
+
+def describe_encodings(encodings):
+    """Share of pages per encoding, e.g. 'pages by encoding: lossy 90%, palette 10%'"""
+    total = max(1, sum(encodings.values()))
+    return "pages by encoding: " + ", ".join(f"{encoding} {count / total:.0%}"
+                                              for encoding, count in sorted(encodings.items(),
+                                                                            key=lambda item: -item[1]))
+
+def describe_trim(trimmed_pixels):
+    # Every trimmed pixel is one fewer to hold decoded, resize and encode
+    return (f"{trimmed_pixels / 1_000_000:.1f} Mpx of margins trimmed "
+            f"({format_file_size(trimmed_pixels * 3)} of decoded pixels not resized or encoded)")
+
+class ImageProcessor:
+    """Handles image processing with parallel execution and GPU acceleration"""
+    
+    @staticmethod
+    def process_image_gpu(image_data, target_size=2500, quality=85, resize_filter='lanczos', targets=(), trim=False,
+                          flat_colors=0):
+        """GPU-accelerated image processing using OpenCV"""
+        if not GPU_AVAILABLE:
+            return ImageProcessor.process_image(image_data, target_size, quality, resize_filter, targets, trim,
+                                                flat_colors)
+        
+        try:
+            if isinstance(image_data, tuple):
+                image_path, temp_dir = image_data
+                try:
+                    # Use OpenCV for faster loading and processing
+                    img_bgr = cv2.imread(image_path, cv2.IMREAD_COLOR)
+                    if img_bgr is None:
+                        # Fallback to PIL if OpenCV can't read
+                        return ImageProcessor.process_image(image_data, target_size, quality, resize_filter,
+                                                            targets, trim, flat_colors)
+                    
+                    # Convert BGR to RGB
+                    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+                    flat = flat_colors and is_flat_page(Image.fromarray(img_rgb), flat_colors)
+                    img_rgb, trimmed_pixels = ImageProcessor.trim_array(img_rgb) if trim else (img_rgb, 0)
+                    
+                    # Calculate new size maintaining aspect ratio
+                    height, width = img_rgb.shape[:2]
+                    if max(width, height) > target_size:
+                        if width > height:
+                            new_width = target_size
+                            new_height = int((height * target_size) / width)
+                        else:
+                            new_height = target_size
+                            new_width = int((width * target_size) / height)
+                        
+                        # GPU-accelerated resize using OpenCV
+                        img_rgb = cv2.resize(img_rgb, (new_width, new_height), interpolation=cv2_resize_filter(resize_filter))
+                    
+                    # Convert back to PIL for WebP saving
+                    pil_image = Image.fromarray(img_rgb)
+                    if trimmed_pixels:
+                        pil_image.info['trimmed_pixels'] = trimmed_pixels
+                    if flat:
+                        pil_image.info['flat_page'] = True
+                    
+                    # Save as WebP
+                    output_name = Path(image_path).stem + '.webp'
+                    output_path = os.path.join(temp_dir, output_name)
+                    encoding = ImageProcessor.save_webp(pil_image, output_path, quality)
+                    return ImageProcessor.outputs(output_path, pil_image, targets, resize_filter, encoding)
+                finally:
+                    # Clean up source file after processing
+                    try:
+                        os.remove(image_path)
+                    except (OSError, PermissionError):
+                        pass
+            else:
+                # Direct PIL Image object - convert to numpy for GPU processing
+                img_array = np.array(image_data)
+                flat = flat_colors and is_flat_page(image_data, flat_colors)
+                img_array, trimmed_pixels = ImageProcessor.trim_array(img_array) if trim else (img_array, 0)
+                
+                # Calculate new size maintaining aspect ratio
+                height, width = img_array.shape[:2]
+                if max(width, height) > target_size:
+                    if width > height:
+                        new_width = target_size
+                        new_height = int((height * target_size) / width)
+                    else:
+                        new_height = target_size
+                        new_width = int((width * target_size) / height)
+                    
+                    # GPU-accelerated resize
+                    img_array = cv2.resize(img_array, (new_width, new_height), interpolation=cv2_resize_filter(resize_filter))
+                
+                processed = Image.fromarray(img_array)
+                if trimmed_pixels:
+                    processed.info['trimmed_pixels'] = trimmed_pixels
+                if flat:
+                    processed.info['flat_page'] = True
+                return processed
+        except Exception as e:
+            print(f"GPU processing failed, falling back to CPU: {e}")
+            return ImageProcessor.process_image(image_data, target_size, quality, resize_filter, targets, trim,
+                                                flat_colors)
+    
+    @staticmethod
+    def process_image(image_data, target_size=2500, quality=85, resize_filter='lanczos', targets=(), trim=False,
+                      flat_colors=0):
+        """Process a single image: trim its borders (optionally), resize and convert to WebP
+
+        With flat_colors, pages is_flat_page finds flat are marked for save_webp to also
+        try lossless.
+        """
+        try:
+            if isinstance(image_data, tuple):
+                image_path, temp_dir = image_data
+                try:
+                    with Image.open(image_path) as img:
+                        # Convert to RGB if necessary
+                        if img.mode in ('RGBA', 'LA', 'P'):
+                            img = img.convert('RGB')
+                        
+                        img = ImageProcessor.fit(img, target_size, resize_filter, trim, flat_colors)
+                        
+                        # Save as WebP
+                        output_name = Path(image_path).stem + '.webp'
+                        output_path = os.path.join(temp_dir, output_name)
+                        encoding = ImageProcessor.save_webp(img, output_path, quality)
+                        return ImageProcessor.outputs(output_path, img, targets, resize_filter, encoding)
+                finally:
+                    # Clean up source file after processing
+                    try:
+                        os.remove(image_path)
+                    except (OSError, PermissionError):
+                        pass  # File might already be gone or locked
+            else:
+                # Direct PIL Image object
+                img = image_data
+                if img.mode in ('RGBA', 'LA', 'P'):
+                    img = img.convert('RGB')
+                
+                return ImageProcessor.fit(img, target_size, resize_filter, trim, flat_colors)
+        except Exception as e:
+            print(f"Error processing image: {e}")
+            return None
+
+    @staticmethod
+    def fit(img, target_size, resize_filter='lanczos', trim=False, flat_colors=0):
+        """Trim a page's borders (optionally) and resize it to fit target_size, maintaining aspect ratio
+
+        The trimmed region is resized straight from the page, so it is only copied when no
+        resize is needed. Flat pages are classified before resizing, which blends new
+        colours into every edge.
+        """
+        flat = flat_colors and is_flat_page(img, flat_colors)
+        box = find_margins(img) if trim else None
+        width, height = (box[2] - box[0], box[3] - box[1]) if box else img.size
+        trimmed_pixels = img.width * img.height - width * height
+        if max(width, height) > target_size:
+            if width > height:
+                new_width = target_size
+                new_height = int((height * target_size) / width)
+            else:
+                new_height = target_size
+                new_width = int((width * target_size) / height)
+            
+            img = img.resize((new_width, new_height), pil_resize_filter(resize_filter), box=box)
+        elif box:
+            img = img.crop(box)
+        if trimmed_pixels:
+            img.info['trimmed_pixels'] = trimmed_pixels
+        if flat:
+            img.info['flat_page'] = True
+        return img
+
+    @staticmethod
+    def trim_array(pixels):
+        """An RGB array without its borders, and the number of pixels removed"""
+        box = find_margins(Image.fromarray(pixels))
+        if box is None:
+            return pixels, 0
+        left, top, right, bottom = box
+        return pixels[top:bottom, left:right], pixels.shape[0] * pixels.shape[1] - (right - left) * (bottom - top)
+
+    @staticmethod
+    def save_webp(img, output, quality=85):
+        """Save a page as WebP to a path or file object, returning how it was encoded
+
+        Pages marked flat by fit are also encoded losslessly, exact when they have at most
+        FLAT_EXACT_COLORS colours and otherwise through a 256 colour palette (resizing blends
+        edges into many more), and the smaller encoding is kept: "lossy", "lossless",
+        "palette" or "flat lossy" (the lossy encoding won anyway).
+        """
+        if not img.info.get('flat_page'):
+            img.save(output, 'WEBP', quality=quality, optimize=True)
+            return 'lossy'
+        lossy = io.BytesIO()
+        img.save(lossy, 'WEBP', quality=quality, optimize=True)
+        if img.getcolors(FLAT_EXACT_COLORS) is not None:
+            flat, encoding = img, 'lossless'
+        else:
+            flat = img.convert('RGB').quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+            encoding = 'palette'
+        best = io.BytesIO()
+        flat.save(best, 'WEBP', lossless=True, quality=FLAT_LOSSLESS_EFFORT)
+        if best.tell() >= lossy.tell():
+            best, encoding = lossy, 'flat lossy'
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, 'wb') as f:
+                f.write(best.getbuffer())
+        else:
+            output.write(best.getbuffer())
+        return encoding
+
+    @staticmethod
+    def outputs(primary, image, targets, resize_filter='lanczos', encoding='lossy'):
+        """A page's primary output, or PageOutputs when it has renditions, trimmed borders or
+        a lossless encoding to report"""
+        trimmed_pixels = image.info.get('trimmed_pixels', 0)
+        if not targets and not trimmed_pixels and encoding == 'lossy':
+            return primary
+        renditions = ImageProcessor.target_renditions(image, targets, resize_filter) if targets else ()
+        return PageOutputs(primary, renditions, trimmed_pixels, encoding)
+
+    @staticmethod
+    def target_renditions(image, targets, resize_filter='lanczos'):
+        """Encode a page for each output target, downscaling progressively from the largest to the smallest
+
+        image is the primary output, so no rendition comes out larger than it. Returns a
+        tuple of (target index, encoded bytes).
+        """
+        renditions = []
+        current = image if image.mode in ('RGB', 'L') else image.convert('RGB')
+        for index, target in sorted(enumerate(targets), key=lambda item: -item[1].size):
+            width, height = current.size
+            if max(width, height) > target.size:
+                if width > height:
+                    new_width, new_height = target.size, max(1, int((height * target.size) / width))
+                else:
+                    new_width, new_height = max(1, int((width * target.size) / height)), target.size
+                current = current.resize((new_width, new_height), pil_resize_filter(resize_filter))
+            output = io.BytesIO()
+            save_rendition(current, output, target)
+            renditions.append((index, output.getvalue()))
+        return tuple(renditions)
+
+    @staticmethod
+    def encode_bytes(data, target_size=2500, quality=85, backend='', resize_filter='lanczos', targets=(), trim=False,
+                     flat_colors=0):
+        """Resize and encode raw image bytes, returning WebP bytes (or None on failure)
+
+        With targets (or trimmed borders, or a lossless encoding), returns
+        PageOutputs(WebP bytes, renditions, trimmed pixels, encoding) from the same decode.
+        """
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.load()
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                process = image_function(backend)
+                processed = process(img, target_size, quality, resize_filter, trim=trim, flat_colors=flat_colors)
+            if processed is None:
+                return None
+            output = io.BytesIO()
+            encoding = ImageProcessor.save_webp(processed, output, quality)
+            return ImageProcessor.outputs(output.getvalue(), processed, targets, resize_filter, encoding)
+        except Exception as e:
+            print(f"Error encoding image: {e}")
+            return None
+
+    @staticmethod
+    def process_buffer(task, target_size=2500, quality=85, backend='', resize_filter='lanczos', targets=(),
+                       trim=False, flat_colors=0):
+        """Encode an in-memory (page path, bytes) task, returning an EncodedPage"""
+        page_path, data = task
+        encoded = ImageProcessor.encode_bytes(data, target_size, quality, backend, resize_filter, targets, trim,
+                                              flat_colors)
+        if encoded is None:
+            return None
+        return ImageProcessor.encoded_page(page_path, encoded)
+
+    @staticmethod
+    def encoded_page(page_path, encoded):
+        """An encode_bytes result as the EncodedPage (or PageOutputs of one) for a page"""
+        name = Path(page_path).stem + '.webp'
+        if isinstance(encoded, PageOutputs):
+            return encoded._replace(primary=EncodedPage(name, encoded.primary))
+        return EncodedPage(name, encoded)
+
+    @staticmethod
+    def process_image_remote(image_data, pool, target_size=2500, quality=85):
+        """Process a single image file on a remote worker: resize and convert to WebP"""
+        image_path, temp_dir = image_data
+        try:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            encoded = pool.encode(data, os.path.basename(image_path), target_size, quality)
+            if encoded is None:
+                return None
+            output_path = os.path.join(temp_dir, Path(image_path).stem + '.webp')
+            with open(output_path, 'wb') as f:
+                f.write(encoded.primary if isinstance(encoded, PageOutputs) else encoded)
+            if isinstance(encoded, PageOutputs):
+                return encoded._replace(primary=output_path)
+            return output_path
+        finally:
+            # Clean up source file after processing
+            try:
+                os.remove(image_path)
+            except (OSError, PermissionError):
+                pass
+
+def pil_resize_filter(name):
+    """Pillow resampling filter for a resize_filter setting"""
+    return RESIZE_FILTERS.get(name, RESIZE_FILTERS['lanczos'])[0]
+
+def cv2_resize_filter(name):
+    """OpenCV interpolation flag for a resize_filter setting"""
+    return getattr(cv2, RESIZE_FILTERS.get(name, RESIZE_FILTERS['lanczos'])[1])
+
+def image_function(backend=''):
+    """Image processing function for an image_backend setting"""
+    # Use GPU acceleration if available unless calibration found Pillow faster
+    if backend == 'pillow' or not GPU_AVAILABLE:
+        return ImageProcessor.process_image
+    return ImageProcessor.process_image_gpu
+
+def page_function(settings):
+    """Local page processing function with the configured backend and resize filter"""
+    return partial(image_function(settings['image_backend']), resize_filter=settings['resize_filter'],
+                   targets=page_targets(settings), trim=settings['trim_margins'],
+                   flat_colors=settings['flat_page_colors'])
+
+def select_engine(settings, page_count, file_size, remote_pool=None):
+    """Engine for an archive's pages: "remote", or "threads" for small comics where
+    starting worker processes and pickling pages would cost more than the encoding"""
+    if remote_pool:
+        return "remote"
+    if settings['engine'] in ("threads", "processes"):
+        return settings['engine']
+    small = (page_count <= settings['thread_engine_pages'] and
+             file_size <= settings['thread_engine_mb'] * 1024 * 1024)
+    return "threads" if small else "processes"
+
+def archive_page_work(pages, temp_dir, engine):
+    """Tasks and memory estimate for archive pages: in-memory buffers for the thread engine,
+    otherwise pages extracted into temp_dir"""
+    if engine == "threads":
+        # Decoded bitmap plus the compressed buffer held alongside it
+        return pages.read(), lambda task: estimate_image_memory(task[1]) + len(task[1])
+    return ((path, temp_dir) for path in pages.extract()), lambda task: estimate_image_memory(task[0])
+
+class SampledPageExecutor:
+    """Hands back pages the savings estimator already encoded instead of encoding them again
+
+    The pipeline submits sequenced_call items, (sequence, task) with archive page tasks
+    starting with the page's path; other pages go to the wrapped executor, as does
+    everything else the pipeline asks of it (restart, shutdown, ...).
+    """
+
+    def __init__(self, executor, pages, sampled):
+        self.executor = executor
+        self._max_workers = getattr(executor, '_max_workers', 1)  # read by PagePipeline for utilization
+        # page path -> encode_bytes result, for the sampled members of pages (an ArchivePages)
+        self.sampled = {pages.members[name]: encoded for name, encoded in sampled.items() if name in pages.members}
+        self.reused = 0
+
+    def __getattr__(self, name):
+        return getattr(self.executor, name)
+
+    def submit(self, func, item, *args, **kwargs):
+        sequence, task = item
+        encoded = self.sampled.pop(task[0], None)
+        if encoded is None:
+            return self.executor.submit(func, item, *args, **kwargs)
+        if not isinstance(task[1], bytes):
+            os.remove(task[0])  # extracted for a worker that no longer needs it
+        self.reused += 1
+        future = concurrent.futures.Future()
+        future.set_result((sequence, ImageProcessor.encoded_page(task[0], encoded), 0.0))
+        return future
+
+def page_executor(remote_pool=None, thread_budget=None, settings=None, engine="processes", pool=None):
+    """Executor and page function for archive pages: local processes (from pool, a
+    SharedProcessPool, when given) or threads, or remote workers"""
+    if remote_pool:
+        # Remote calls block on the network, so one local thread per remote slot
+        return (ThreadPoolExecutor(max_workers=remote_pool.total_slots),
+                partial(ImageProcessor.process_image_remote, pool=remote_pool))
+    settings = settings or load_settings()
+    thread_budget = thread_budget or ThreadBudget.for_settings(settings)
+    if engine == "threads":
+        # Pillow and OpenCV release the GIL while decoding, resizing and encoding
+        return (ThreadPoolExecutor(**thread_budget.thread_executor_args()),
+                partial(ImageProcessor.process_buffer, backend=settings['image_backend'],
+                        resize_filter=settings['resize_filter'], targets=page_targets(settings),
+                        trim=settings['trim_margins'], flat_colors=settings['flat_page_colors']))
+    if pool:
+        return pool.borrow(), page_function(settings)
+    return RestartablePool(**thread_budget.executor_args()), page_function(settings)
+
+def encode_pdf_page(task, target_size=2500, quality=85, backend='', resize_filter='lanczos', targets=(),
+                    render_timeout=None, trim=False, flat_colors=0):
+    """Render one PDF page and save it as WebP in temp_dir, returning the path (or None)"""
+    pdf_path, page_number, temp_dir = task
+    try:
+        pil_image = render_pdf_page(pdf_path, page_number, timeout=render_timeout)
+    except Exception as e:
+        print(f"Error rendering PDF page {page_number}: {e}")
+        return None
+    index = page_number - 1
+    try:
+        processed_img = image_function(backend)(pil_image, target_size, quality, resize_filter, trim=trim,
+                                                flat_colors=flat_colors)
+        if processed_img:
+            output_path = os.path.join(temp_dir, f"page_{index:04d}.webp")
+            encoding = ImageProcessor.save_webp(processed_img, output_path, quality)
+            return ImageProcessor.outputs(output_path, processed_img, targets, resize_filter, encoding)
+    except Exception as e:
+        print(f"Error processing PDF image {index}: {e}")
+    return None
+
+# A decoded page bitmap in a shared memory segment, passed to worker processes instead of its pixels
+SharedBitmap = namedtuple('SharedBitmap', ['name', 'mode', 'size'])
+
+class SharedBitmaps:
+    """Shared memory segments holding rendered pages for worker processes
+
+    Workers unlink each segment once its page is encoded; close() unlinks whatever is
+    left after pages failed or were cancelled, so no segment outlives its file.
+    """
+
+    def __init__(self):
+        self.names = set()
+        self.lock = threading.Lock()
+
+    def put(self, image):
+        """Copy a PIL image into a new segment and return its descriptor"""
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        data = image.tobytes()
+        segment = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        with self.lock:
+            self.names.add(segment.name)
+        try:
+            segment.buf[:len(data)] = data
+        finally:
+            segment.close()  # the segment itself lives until it is unlinked
+        return SharedBitmap(segment.name, image.mode, image.size)
+
+    def close(self):
+        """Unlink every segment a worker did not consume"""
+        with self.lock:
+            names, self.names = self.names, set()
+        for name in names:
+            try:
+                segment = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                continue  # consumed by its worker
+            segment.close()
+            segment.unlink()
+
+def encode_shared_bitmap(task, target_size=2500, quality=85, backend='', resize_filter='lanczos', targets=(),
+                         trim=False, flat_colors=0):
+    """Encode a page bitmap from shared memory and save it as WebP in temp_dir, returning the path (or None)"""
+    bitmap, temp_dir, index = task
+    try:
+        segment = shared_memory.SharedMemory(name=bitmap.name)
+    except FileNotFoundError:
+        print(f"Error processing PDF image {index}: bitmap {bitmap.name} is gone")
+        return None
+    image = processed_img = None
+    try:
+        image = Image.frombuffer(bitmap.mode, bitmap.size, segment.buf, 'raw', bitmap.mode, 0, 1)
+        processed_img = image_function(backend)(image, target_size, quality, resize_filter, trim=trim,
+                                                flat_colors=flat_colors)
+        if processed_img:
+            output_path = os.path.join(temp_dir, f"page_{index:04d}.webp")
+            encoding = ImageProcessor.save_webp(processed_img, output_path, quality)
+            return ImageProcessor.outputs(output_path, processed_img, targets, resize_filter, encoding)
+    except Exception as e:
+        print(f"Error processing PDF image {index}: {e}")
+    finally:
+        image = processed_img = None  # drop views of the buffer before unmapping it
+        segment.close()
+        segment.unlink()
+    return None
+
+def shared_pdf_pages(pdf_path, page_numbers, temp_dir, bitmaps, renderers=2, render_timeout=None):
+    """Render PDF pages a few at a time into shared memory, yielding encode tasks in page order"""
+    render_pool = ThreadPoolExecutor(max_workers=renderers)  # pdftoppm runs outside the GIL
+    pending = deque()
+
+    def rendered(page_number, future):
+        try:
+            image = future.result()
+        except Exception as e:
+            print(f"Error rendering PDF page {page_number}: {e}")
+            return
+        yield bitmaps.put(image), temp_dir, page_number - 1
+
+    try:
+        for page_number in page_numbers:
+            pending.append((page_number, render_pool.submit(render_pdf_page, pdf_path, page_number,
+                                                            timeout=render_timeout)))
+            if len(pending) > renderers:
+                yield from rendered(*pending.popleft())
+        while pending:
+            yield from rendered(*pending.popleft())
+    finally:
+        render_pool.shutdown(wait=False, cancel_futures=True)
+
+def pdf_page_work(pdf_path, page_numbers, temp_dir, pdf_info, engine="threads", bitmaps=None, renderers=2,
+                  render_timeout=None):
+    """Tasks and memory estimate for PDF pages: rendered by each task for the thread engine,
+    otherwise rendered here into shared memory for worker processes"""
+    page_memory = estimate_pdf_page_memory(pdf_info)
+    if engine == "processes":
+        return (shared_pdf_pages(pdf_path, page_numbers, temp_dir, bitmaps, renderers, render_timeout),
+                lambda task: page_memory)
+    return ((pdf_path, page_number, temp_dir) for page_number in page_numbers), lambda task: page_memory
+
+def pdf_executor(thread_budget, settings, engine="threads", pool=None):
+    """Executor and page function for PDF pages: threads, or processes fed through shared memory"""
+    if engine == "processes":
+        return (pool.borrow() if pool else RestartablePool(**thread_budget.executor_args()),
+                partial(encode_shared_bitmap, backend=settings['image_backend'],
+                        resize_filter=settings['resize_filter'], targets=page_targets(settings),
+                        trim=settings['trim_margins'], flat_colors=settings['flat_page_colors']))
+    return (ThreadPoolExecutor(**thread_budget.thread_executor_args()),
+            partial(encode_pdf_page, backend=settings['image_backend'], resize_filter=settings['resize_filter'],
+                    targets=page_targets(settings), render_timeout=settings['page_timeout'] or None,
+                    trim=settings['trim_margins'], flat_colors=settings['flat_page_colors']))
+
+# Remote worker protocol: every frame is a 4-byte big-endian header length, a JSON
+# header and header["size"] bytes of payload. Requests carry the shared worker token and
+# are {"op": "encode"} with the source image as payload and the page settings in the
+# header, or {"op": "ping"}; replies carry the encoded WebP, followed by any target
+# renditions listed in the header.
+FRAME_HEADER_LIMIT = 64 * 1024
+FRAME_PAYLOAD_LIMIT = 256 * 1024 * 1024  # pages when there is no pixel budget, and replies
+WORKER_REQUEST_MARGIN = 30  # seconds on top of page_timeout for a page to travel to its worker and back
+
+def parse_worker_address(address):
+    """Socket family and address for "host:port" or "unix:/path" """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+def is_loopback_address(address):
+    """Whether a worker address is only reachable from this machine"""
+    family, bind_address = parse_worker_address(address)
+    return family == socket.AF_UNIX or bind_address[0] in ('localhost', '::1') or bind_address[0].startswith('127.')
+
+def worker_payload_limit(settings):
+    """Largest page a worker accepts: the pixel budget as uncompressed RGB, plus room for metadata"""
+    pixels = settings['max_page_megapixels'] * 1_000_000
+    return int(pixels * 3) + 1024 * 1024 if pixels else FRAME_PAYLOAD_LIMIT
+
+def worker_request_timeout(settings):
+    """Seconds before a remote page is considered lost with its worker (None = no limit)"""
+    return settings['page_timeout'] + WORKER_REQUEST_MARGIN if settings['page_timeout'] else None
+
+def worker_page_options(settings):
+    """Page settings sent with every remote encode, so remote pages match local ones"""
+    return {'resize_filter': settings['resize_filter'], 'trim': settings['trim_margins'],
+            'flat_colors': settings['flat_page_colors'],
+            'targets': [list(target) for target in page_targets(settings)]}
+
+def send_frame(sock, header, payload=b''):
+    """Send one protocol frame"""
+    raw = json.dumps(dict(header, size=len(payload))).encode('utf-8')
+    sock.sendall(struct.pack('!I', len(raw)) + raw)
+    if payload:
+        sock.sendall(payload)
+
+def recv_exact(sock, size):
+    """Read exactly size bytes from a socket"""
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("Connection closed mid-frame")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+def recv_frame(sock, payload_limit=FRAME_PAYLOAD_LIMIT, token=None):
+    """Receive one protocol frame as (header, payload)
+
+    With a token, frames that do not carry it raise PermissionError before their payload is read.
+    """
+    (header_size,) = struct.unpack('!I', recv_exact(sock, 4))
+    if header_size > FRAME_HEADER_LIMIT:
+        raise ConnectionError(f"Frame header too large: {header_size} bytes")
+    header = json.loads(recv_exact(sock, header_size).decode('utf-8'))
+    if token is not None and not hmac.compare_digest(str(header.get('token', '')).encode('utf-8'),
+                                                     token.encode('utf-8')):
+        raise PermissionError("Invalid worker token")
+    payload_size = int(header.get('size', 0))
+    if payload_size > payload_limit:
+        raise ConnectionError(f"Frame payload too large: {payload_size} bytes")
+    return header, recv_exact(sock, payload_size) if payload_size else b''
+
+class WorkerRequestHandler(socketserver.BaseRequestHandler):
+    """Serves encode and ping requests on one coordinator connection"""
+
+    def handle(self):
+        while True:
+            try:
+                header, payload = recv_frame(self.request, self.server.payload_limit, self.server.token)
+            except PermissionError as e:
+                try:
+                    send_frame(self.request, {'ok': False, 'error': str(e)})
+                except OSError:
+                    pass
+                return  # the connection is not trusted with another frame
+            except (ConnectionError, OSError, ValueError):
+                return  # coordinator went away
+
+            if header.get('op') == 'ping':
+                send_frame(self.request, {'op': 'pong', 'capacity': self.server.capacity})
+            elif header.get('op') == 'encode':
+                # The coordinator's page settings; the image backend is this machine's own
+                options = header.get('settings', {})
+                targets = tuple(OutputTarget(*target) for target in options.get('targets', ()))
+                future = self.server.executor.submit(ImageProcessor.encode_bytes, payload,
+                                                     header.get('target_size', 2500), header.get('quality', 85),
+                                                     self.server.settings['image_backend'],
+                                                     options.get('resize_filter', self.server.settings['resize_filter']),
+                                                     targets, options.get('trim', False), options.get('flat_colors', 0))
+                encoded = future.result()
+                if encoded is None:
+                    send_frame(self.request, {'id': header.get('id'), 'ok': False,
+                                              'error': f"Could not encode {header.get('name')}"})
+                elif isinstance(encoded, PageOutputs):
+                    renditions = encoded.renditions
+                    send_frame(self.request, {'id': header.get('id'), 'ok': True, 'encoding': encoded.encoding,
+                                              'trimmed_pixels': encoded.trimmed_pixels,
+                                              'renditions': [[index, len(data)] for index, data in renditions]},
+                               encoded.primary + b''.join(data for _, data in renditions))
+                else:
+                    send_frame(self.request, {'id': header.get('id'), 'ok': True}, encoded)
+            else:
+                send_frame(self.request, {'id': header.get('id'), 'ok': False,
+                                          'error': f"Unknown op: {header.get('op')}"})
+
+class WorkerTCPServer(socketserver.ThreadingTCPServer):
+    """Worker server that can rebind its port straight after a restart"""
+    allow_reuse_address = True
+
+def create_worker_server(address, workers=None, settings=None):
+    """Create (but do not start) a worker server bound to address
+
+    Anything other than a loopback address or unix socket needs a worker_token.
+    """
+    settings = settings or load_settings()
+    if not settings['worker_token'] and not is_loopback_address(address):
+        raise ValueError(f"Set COMIC_CRUNCHER_WORKER_TOKEN to listen on {address}")
+    family, bind_address = parse_worker_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(bind_address):
+            os.remove(bind_address)
+        server = socketserver.ThreadingUnixStreamServer(bind_address, WorkerRequestHandler)
+    else:
+        server = WorkerTCPServer(bind_address, WorkerRequestHandler)
+    server.daemon_threads = True
+    server.settings = settings
+    server.token = settings['worker_token'] or None
+    server.payload_limit = worker_payload_limit(settings)
+    server.capacity = workers or server.settings['workers'] or multiprocessing.cpu_count()
+    # Forked pool processes would inherit coordinator sockets and keep them open after
+    # this process dies, hiding the failure from the coordinator
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    server.executor = ProcessPoolExecutor(mp_context=context, **ThreadBudget(
+        server.capacity, server.settings['library_threads']).executor_args())
+    return server
+
+def run_worker(address, workers=None):
+    """Serve page encoding for remote coordinators until interrupted"""
+    server = create_worker_server(address, workers)
+    bound = server.server_address
+    if isinstance(bound, tuple):
+        bound = f"{bound[0]}:{bound[1]}"
+    print(f"Comic Cruncher worker listening on {bound} ({server.capacity} processes"
+          f"{', token required' if server.token else ''})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown(cancel_futures=True)
+
+class RemoteWorker:
+    """A remote worker process and its open connections"""
+
+    def __init__(self, address, token=''):
+        self.address = address
+        self.token = token
+        self.healthy = False
+        self.capacity = 0
+        self.connections = []
+
+    def connect(self, timeout=5):
+        """Open a socket to the worker"""
+        family, address = parse_worker_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def ping(self, sock):
+        """Health check; returns the worker's advertised capacity"""
+        send_frame(sock, {'op': 'ping', 'token': self.token})
+        header, _ = recv_frame(sock)
+        if header.get('op') != 'pong':
+            raise ConnectionError(header.get('error') or f"Unexpected ping reply from {self.address}")
+        return int(header.get('capacity', 1))
+
+class RemoteWorkerPool:
+    """Dispatches page encoding to remote workers with back-pressure, health checks and retry"""
+
+    def __init__(self, addresses, retries=3, health_interval=10, token='', request_timeout=None, options=None):
+        self.workers = [RemoteWorker(address, token) for address in addresses]
+        self.token = token
+        self.request_timeout = request_timeout  # None waits as long as the page takes
+        self.options = options or {}  # page settings sent with every encode (worker_page_options)
+        self.retries = retries
+        self.health_interval = health_interval
+        self.idle = queue.Queue()  # (worker, socket) slots ready for a request
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.next_id = 0
+        for worker in self.workers:
+            self.revive(worker)
+        self.health_thread = threading.Thread(target=self.health_loop, daemon=True)
+        self.health_thread.start()
+
+    @property
+    def total_slots(self):
+        return max(1, sum(worker.capacity for worker in self.workers))
+
+    def healthy_workers(self):
+        return [worker for worker in self.workers if worker.healthy]
+
+    def revive(self, worker):
+        """Ping a worker and open one connection per advertised slot"""
+        try:
+            sock = worker.connect()
+            capacity = worker.ping(sock)
+            connections = [sock] + [worker.connect() for _ in range(capacity - 1)]
+        except (OSError, ConnectionError, ValueError) as e:
+            if worker.capacity == 0:
+                print(f"Warning: Remote worker {worker.address} unavailable: {e}")
+            return False
+        for sock in connections:
+            sock.settimeout(self.request_timeout)
+        with self.lock:
+            worker.capacity = capacity
+            worker.connections = connections
+            worker.healthy = True
+        for sock in connections:
+            self.idle.put((worker, sock))
+        return True
+
+    def disconnect(self, worker):
+        """Take a worker out of rotation; its queued slots are dropped as they are drawn"""
+        with self.lock:
+            was_healthy = worker.healthy
+            worker.healthy = False
+            connections, worker.connections = worker.connections, []
+        for sock in connections:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        return was_healthy
+
+    def mark_failed(self, worker):
+        if self.disconnect(worker) and not self.closed.is_set():
+            print(f"Warning: Remote worker {worker.address} failed, retrying its pages elsewhere")
+
+    def health_loop(self):
+        """Periodically bring failed workers back into rotation"""
+        while not self.closed.wait(self.health_interval):
+            for worker in self.workers:
+                if not worker.healthy:
+                    self.revive(worker)
+
+    def acquire(self):
+        """Wait for a free slot on a healthy worker (this is the back-pressure point)"""
+        while not self.closed.is_set():
+            if not self.healthy_workers():
+                raise ConnectionError("No remote workers available")
+            try:
+                worker, sock = self.idle.get(timeout=1)
+            except queue.Empty:
+                continue
+            if worker.healthy and sock in worker.connections:
+                return worker, sock
+        raise ConnectionError("Remote worker pool closed")
+
+    def encode(self, data, name, target_size=2500, quality=85):
+        """Encode one page remotely, retrying on another worker if its worker fails
+
+        Returns WebP bytes, or PageOutputs when the page has renditions, trimmed borders
+        or a lossless encoding, like encode_bytes.
+        """
+        for attempt in range(self.retries + 1):
+            worker, sock = self.acquire()
+            with self.lock:
+                self.next_id += 1
+                request_id = self.next_id
+            try:
+                send_frame(sock, {'op': 'encode', 'id': request_id, 'name': name, 'token': self.token,
+                                  'target_size': target_size, 'quality': quality, 'settings': self.options}, data)
+                header, payload = recv_frame(sock)
+            except (OSError, ConnectionError, ValueError):
+                self.mark_failed(worker)
+                continue
+            self.idle.put((worker, sock))
+            if not header.get('ok'):
+                print(f"Error processing image {name}: {header.get('error')}")
+                return None
+            if 'renditions' not in header:
+                return payload
+            offset = len(payload) - sum(size for _, size in header['renditions'])
+            primary, renditions = payload[:offset], []
+            for index, size in header['renditions']:
+                renditions.append((index, payload[offset:offset + size]))
+                offset += size
+            return PageOutputs(primary, tuple(renditions), header.get('trimmed_pixels', 0),
+                               header.get('encoding', 'lossy'))
+        raise ConnectionError(f"Page {name} failed on {self.retries + 1} remote workers")
+
+    def close(self):
+        self.closed.set()
+        for worker in self.workers:
+            self.disconnect(worker)
+
+def connect_remote_workers(settings):
+    """Remote worker pool from the remote_workers setting, or None for local processing"""
+    addresses = [address.strip() for address in settings['remote_workers'].split(',') if address.strip()]
+    if not addresses:
+        return None
+    pool = RemoteWorkerPool(addresses, token=settings['worker_token'],
+                            request_timeout=worker_request_timeout(settings), options=worker_page_options(settings))
+    if not pool.healthy_workers():
+        pool.close()
+        raise ConnectionError("None of the configured remote workers are reachable")
+    return pool
+
+class NoPagesFound(Exception):
+    """Raised when a file has no pages, or none of them could be encoded; the original is restored"""
+
+# A crunched file: its size before and after, the engine its pages went through, the finished
+# PagePipeline (for stats) and the destinations of its output target renditions
+CrunchedFile = namedtuple('CrunchedFile', ['original_size', 'new_size', 'engine', 'pipeline', 'destinations'])
+
+def list_pdf_pages(pdf_path):
+    """A PDF's page numbers and pdfinfo; pages are rendered one at a time to bound memory"""
+    try:
+        pdf_info = pdf2image.pdfinfo_from_path(pdf_path)
+        return list(range(1, pdf_info["Pages"] + 1)), pdf_info
+    except Exception as e:
+        print(f"Error extracting from PDF {pdf_path}: {e}")
+        return [], None
+
+def crunch_file(processor, file_path, thread_budget, on_page=None, sampled=None):
+    """Crunch one comic into a CBZ in its place, returning a CrunchedFile
+
+    The file is backed up, its pages stream through a PagePipeline into a CBZ in scratch
+    space, and that CBZ replaces it. On any failure the original is restored and the
+    exception re-raised. processor provides settings, pool, remote_pool, should_stop and
+    file_info_update, and gets the executor for stop(); on_page(pages done, total) reports
+    progress. sampled (member name -> encode_bytes result, from estimate_savings) pages
+    are not encoded again.
+    """
+    settings = processor.settings
+    file_path = Path(file_path)
+    original_size = file_path.stat().st_size
+    is_pdf = file_path.suffix.lower() == '.pdf'
+    backup_path = None
+    bitmaps = SharedBitmaps()  # rendered PDF pages handed to worker processes
+    target_outputs = None
+    try:
+        # Pages and the new CBZ are built in scratch space, sized up before starting
+        scratch = ScratchSpace.for_settings(settings)
+        needed = estimate_scratch_bytes(file_path, settings['archive_backends'])
+        with scratch.job(file_path, needed, processor.file_info_update.emit) as temp_dir:
+            backup_path = make_backup(file_path)
+            
+            # PDF pages are rendered on demand; archive pages are read in a single pass
+            if is_pdf:
+                images, pdf_info = list_pdf_pages(file_path)
+            else:
+                try:
+                    images = list_archive_pages(file_path, os.path.join(temp_dir, "pages"),
+                                                preference=settings['archive_backends'])
+                except Exception as e:
+                    print(f"Error extracting from {file_path}: {e}")
+                    images = []
+            if not images:
+                raise NoPagesFound("No images found in file")
+            
+            # Pages stream out of the file, through the pool and into the new CBZ concurrently
+            temp_cbz_path = Path(temp_dir) / f"temp_{file_path.stem}.cbz"
+            if is_pdf:
+                # Each page renders and encodes in a thread; long PDFs are rendered here instead
+                # and handed to worker processes through shared memory
+                engine = select_engine(settings, len(images), original_size)
+                tasks, estimate = pdf_page_work(file_path, images, temp_dir, pdf_info, engine, bitmaps,
+                                                max(1, thread_budget.workers // 2), settings['page_timeout'] or None)
+                executor, process_func = pdf_executor(thread_budget, settings, engine, processor.pool)
+            else:
+                # In memory for small comics, otherwise extracted to disk for worker processes
+                engine = select_engine(settings, len(images), original_size, processor.remote_pool)
+                tasks, estimate = archive_page_work(images, temp_dir, engine)
+                executor, process_func = page_executor(processor.remote_pool, thread_budget, settings, engine,
+                                                       processor.pool)
+            processor.executor = executor  # stop() tears it down
+            if processor.should_stop:
+                executor.shutdown(cancel_futures=True)
+                raise ProcessingCancelled()
+            target_outputs = TargetOutputs.for_settings(settings, file_path)
+            # Work is admitted under the memory budget rather than all at once
+            pipeline = PagePipeline(SampledPageExecutor(executor, images, sampled) if sampled and not is_pdf
+                                    else executor, settings['memory_budget_mb'] * 1024 * 1024,
+                                    guard=PageGuard.for_settings(settings))
+            pages_done = 0
+            try:
+                results = pipeline.run(process_func, tasks, estimate, temp_cbz_path,
+                                       should_stop=lambda: processor.should_stop, targets=target_outputs)
+                try:
+                    for i, result in enumerate(results):
+                        if result and not isinstance(result, QuarantinedPage):
+                            pages_done += 1
+                        if on_page:
+                            on_page(i + 1, len(images))
+                except Exception:
+                    if processor.should_stop:
+                        raise ProcessingCancelled() from None  # workers were killed under us
+                    raise
+            finally:
+                # Threads the watchdog gave up on cannot be stopped; they finish in the background
+                executor.shutdown(wait=not pipeline.scheduler.abandoned)
+            if pipeline.quarantined:
+                record_quarantine(settings['quarantine_log'], file_path, pipeline.quarantined,
+                                  settings['quarantine'])
+                processor.file_info_update.emit(describe_quarantine(pipeline.quarantined))
+            
+            if processor.should_stop:
+                raise ProcessingCancelled()
+            if not pages_done:
+                raise NoPagesFound("Failed to process any images")
+            append_comic_info(temp_cbz_path, pipeline.page_index, getattr(images, 'comic_info', None))
+            
+            # PDF/CBR/... become a CBZ next to the original; a CBZ is replaced in place
+            final_path = file_path.with_suffix('.cbz') if file_path.suffix.lower() != '.cbz' else file_path
+            replace_file(temp_cbz_path, final_path)
+            destinations = target_outputs.commit() if target_outputs else []
+            if final_path != file_path and file_path.exists():
+                os.remove(file_path)
+            if backup_path.exists():
+                os.remove(backup_path)
+            return CrunchedFile(original_size, final_path.stat().st_size, engine, pipeline, destinations)
+    except FileNotFoundError:
+        raise  # the file went away; there is nothing to put back
+    except ProcessingTimedOut as e:
+        restore_original(file_path, backup_path)
+        record_quarantine(settings['quarantine_log'], file_path, [(None, str(e))], "kept original")
+        raise
+    except BaseException:
+        # The scratch work directory is already gone; put the original back
+        restore_original(file_path, backup_path)
+        raise
+    finally:
+        processor.executor = None
+        bitmaps.close()
+        if target_outputs:
+            target_outputs.close()
+
+class BatchProcessor:
+    """Processes multiple comic files; run() blocks, so callers give it a thread"""
+    
+    def __init__(self, file_paths, settings=None, pool=None):
+        self.progress_update = Signal()  # stage, percentage
+        self.file_info_update = Signal()  # current file info
+        self.batch_progress = Signal()  # current file, total files
+        self.finished = Signal()  # success, message
+        self.file_paths = file_paths
+        self.settings = settings or load_settings()
+        self.should_stop = False
+        self.processed_count = 0
+        self.skipped_count = 0
+        self.error_count = 0
+        self.quarantined_count = 0  # pages the guard gave up on
+        self.trimmed_pixels = 0
+        self.encodings = {}  # pages per encoding across the batch
+        self.total_space_saved = 0
+        self.peak_page_memory = 0
+        self.remote_pool = None
+        self.pool = pool  # SharedProcessPool for process engine pages (default: a pool per file)
+        self.estimates = {}
+        self.estimate_errors = []
+        self.cancel_started = None
+        self.executor = None
+        self.thread_budget = ThreadBudget.for_settings(self.settings)
+        self.engines = {}  # engine -> files processed with it
+    
+    def run(self):
+        IO_THROTTLE.configure(self.settings)
+        try:
+            total_files = len(self.file_paths)
+            self.file_info_update.emit(f"Starting batch: {total_files} files found")
+            
+            # Optional remote workers for archive pages
+            self.remote_pool = connect_remote_workers(self.settings)
+            if self.remote_pool:
+                self.file_info_update.emit(f"Stats: {len(self.remote_pool.healthy_workers())} remote workers, "
+                                           f"{self.remote_pool.total_slots} slots")
+            
+            # Sample archives first: skip low-yield files and crunch the biggest wins first
+            file_paths = self.file_paths
+            if self.settings['min_savings_percent'] > 0:
+                file_paths = self.prioritize_by_savings(file_paths)
+            
+            for i, file_path in enumerate(file_paths):
+                if self.should_stop:
+                    break
+                
+                self.batch_progress.emit(i + 1, len(file_paths))
+                
+                # Update with current file being processed
+                file_name = Path(file_path).name
+                self.file_info_update.emit(f"Processing: {file_name}")
+                
+                # Process single file
+                started = time.perf_counter()
+                result = self.process_single_file(file_path)
+                self.record_estimate(file_path, result, time.perf_counter() - started)
+                
+                # Update with result
+                if result == "success":
+                    self.processed_count += 1
+                    self.file_info_update.emit(f"Completed: {file_name}")
+                elif result == "skipped":
+                    self.skipped_count += 1
+                    self.file_info_update.emit(f"Skipped: {file_name} (already crunched)")
+                elif result == "cancelled":
+                    self.file_info_update.emit(f"Cancelled: {file_name} (original restored)")
+                elif isinstance(result, tuple) and result[0] == "error":
+                    self.error_count += 1
+                    error_detail = result[1]
+                    self.file_info_update.emit(f"Error: {file_name} - {error_detail}")
+                elif isinstance(result, tuple) and len(result) == 3:
+                    # Result with file size info (success, original_size, new_size)
+                    self.processed_count += 1
+                    original_size, new_size = result[1], result[2]
+                    space_saved = original_size - new_size
+                    self.total_space_saved += space_saved
+                    
+                    if original_size > 0:
+                        percent_saved = int((space_saved / original_size) * 100)
+                        size_info = f"({format_file_size(original_size)} → {format_file_size(new_size)}, {percent_saved}% saved)"
+                    else:
+                        size_info = ""
+                    
+                    self.file_info_update.emit(f"Completed: {file_name} {size_info}")
+                else:
+                    self.error_count += 1
+                    self.file_info_update.emit(f"Error: {file_name} (unknown error)")
+            
+            # Generate summary message
+            summary = f"Batch complete! Processed: {self.processed_count}, Skipped: {self.skipped_count}"
+            if self.should_stop:
+                summary = (f"Batch cancelled in {time.perf_counter() - self.cancel_started:.1f}s. "
+                           f"Processed: {self.processed_count}, Skipped: {self.skipped_count}")
+            if self.error_count > 0:
+                summary += f", Errors: {self.error_count}"
+            if self.quarantined_count > 0:
+                summary += f", Quarantined pages: {self.quarantined_count}"
+            if self.total_space_saved > 0:
+                summary += f" | Space saved: {format_file_size(self.total_space_saved)}"
+            if self.peak_page_memory > 0:
+                budget = self.settings['memory_budget_mb'] * 1024 * 1024
+                summary += f" | Peak page memory: {format_file_size(self.peak_page_memory)} of {format_file_size(budget)}"
+            if self.trimmed_pixels:
+                summary += f" | {describe_trim(self.trimmed_pixels)}"
+            if set(self.encodings) - {'lossy'}:
+                summary += f" | {describe_encodings(self.encodings).capitalize()}"
+            if self.processed_count and not self.remote_pool:
+                summary += f" | {self.thread_budget.describe()}"
+            if IO_THROTTLE.describe():
+                summary += f" | {IO_THROTTLE.describe()}"
+            if self.engines:
+                summary += " | Engines: " + ", ".join(f"{engine} {count}" for engine, count in sorted(self.engines.items()))
+            if self.estimate_errors:
+                error = sum(self.estimate_errors) / len(self.estimate_errors)
+                summary += f" | Savings estimate off by {error:.1f} points on average"
+            
+            self.finished.emit(True, summary)
+            
+        except Exception as e:
+            self.finished.emit(False, f"Batch error: {str(e)}")
+        finally:
+            if self.remote_pool:
+                self.remote_pool.close()
+    
+    def prioritize_by_savings(self, file_paths):
+        """Drop archives projected to save less than the threshold and order the rest by bytes saved
+
+        Files are sampled in parallel, one per worker of the thread budget, and their sample
+        pages are kept (up to SAMPLE_REUSE_BYTES) for the crunch to reuse.
+        """
+        threshold = self.settings['min_savings_percent']
+        estimates = {}
+        with ThreadPoolExecutor(max_workers=self.thread_budget.workers) as executor:
+            futures = {executor.submit(self.sample_savings, file_path): file_path for file_path in file_paths}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                if self.should_stop:
+                    executor.shutdown(cancel_futures=True)
+                    break
+                self.file_info_update.emit(f"Estimating savings: {done}/{len(file_paths)}")
+                estimates[futures[future]] = future.result()
+        
+        ranked = []
+        kept_bytes = 0
+        for file_path in file_paths:
+            estimate = estimates.get(file_path)
+            if estimate is None:
+                ranked.append((0, file_path))  # unknown (PDF, already crunched): keep, after the known wins
+                continue
+            percent = savings_percent(estimate.original_size, estimate.projected_size)
+            if percent < threshold:
+                self.skipped_count += 1
+                self.file_info_update.emit(f"Skipped: {Path(file_path).name} (projected {percent:.0f}% savings)")
+                continue
+            kept_bytes += sampled_bytes(estimate)
+            if kept_bytes > SAMPLE_REUSE_BYTES:
+                estimate = estimate._replace(sampled=None)
+            self.estimates[str(file_path)] = estimate
+            ranked.append((estimate.original_size - estimate.projected_size, file_path))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return [file_path for _, file_path in ranked]
+    
+    def sample_savings(self, file_path):
+        """A file's SavingsEstimate, or None for files that are already crunched or cannot be sampled"""
+        if self.should_stop or self.is_already_crunched(Path(file_path)):
+            return None
+        return estimate_savings(file_path, self.settings)
+    
+    def record_estimate(self, file_path, result, seconds):
+        """Log projected vs actual savings for files the estimator sampled"""
+        estimate = self.estimates.pop(str(file_path), None)
+        if estimate is None or not (isinstance(result, tuple) and result[0] == "success"):
+            return
+        entry = record_savings_estimate(self.settings['savings_log'], file_path, estimate, result[2], seconds)
+        self.estimate_errors.append(abs(entry['projected_savings_percent'] - entry['actual_savings_percent']))
+    
+    def process_single_file(self, file_path):
+        """Process a single file and return result status"""
+        file_path = Path(file_path)
+        try:
+            # Check if already crunched
+            if self.is_already_crunched(file_path):
+                return "skipped"
+            
+            if file_path.suffix.lower() not in COMIC_EXTENSIONS:
+                return ("error", "Unsupported file format")
+            
+            estimate = self.estimates.get(str(file_path))
+            crunched = crunch_file(self, file_path, self.thread_budget,
+                                   sampled=estimate.sampled if estimate else None)
+        except ProcessingCancelled:
+            return "cancelled"
+        except ProcessingTimedOut as e:
+            return ("error", f"Timed out: {e} (original kept)")
+        except NoPagesFound as e:
+            return ("error", str(e))
+        except PermissionError as e:
+            return ("error", f"Permission denied: {str(e)}")
+        except FileNotFoundError as e:
+            return ("error", f"File not found: {str(e)}")
+        except zipfile.BadZipFile as e:
+            return ("error", f"Corrupted archive: {str(e)}")
+        except Exception as e:
+            if self.should_stop:
+                return "cancelled"  # pages were lost when stop() killed the workers
+            return ("error", f"Processing failed: {str(e)}")
+        
+        pipeline = crunched.pipeline
+        self.engines[crunched.engine] = self.engines.get(crunched.engine, 0) + 1
+        self.peak_page_memory = max(self.peak_page_memory, pipeline.scheduler.peak_bytes)
+        self.trimmed_pixels += pipeline.trimmed_pixels
+        self.quarantined_count += len(pipeline.quarantined)
+        for encoding, count in pipeline.encodings.items():
+            self.encodings[encoding] = self.encodings.get(encoding, 0) + count
+        return ("success", crunched.original_size, crunched.new_size)
+    
+    def stop(self):
+        """Cancel: drop queued pages, stop in-flight workers and roll the current file back"""
+        if self.should_stop:
+            return
+        self.cancel_started = time.perf_counter()
+        self.should_stop = True
+        if self.remote_pool:
+            self.remote_pool.close()
+        executor = self.executor
+        if executor:
+            shutdown_executor(executor)
+    
+    def is_already_crunched(self, file_path):
+        """Check if file already contains WebP images"""
+        return is_already_crunched(file_path, self.settings['archive_backends'])
+
+class ComicProcessor:
+    """Processes one comic file; run() blocks, so callers give it a thread"""
+    
+    def __init__(self, file_path, settings=None, pool=None):
+        self.progress_update = Signal()  # stage, percentage
+        self.file_info_update = Signal()  # file path
+        self.finished = Signal()  # success, message
+        self.file_path = file_path
+        self.settings = settings or load_settings()
+        self.should_stop = False
+        self.cancel_started = None
+        self.executor = None
+        self.remote_pool = None
+        self.pool = pool  # SharedProcessPool for process engine pages (default: a pool per file)
+    
+    def run(self):
+        IO_THROTTLE.configure(self.settings)
+        try:
+            file_path = Path(self.file_path)
+            self.file_info_update.emit(str(file_path))
+            
+            # Check if file is already crunched (contains WebP images)
+            if self.is_already_crunched(file_path):
+                self.finished.emit(True, "File already crunched with WebP images!")
+                return
+            
+            if file_path.suffix.lower() not in COMIC_EXTENSIONS:
+                self.finished.emit(False, "Unsupported file format")
+                return
+            
+            self.progress_update.emit("RESIZING", 5)
+            if file_path.suffix.lower() != '.pdf':
+                self.remote_pool = connect_remote_workers(self.settings)
+            thread_budget = ThreadBudget.for_settings(self.settings)
+            
+            def page_progress(done, total):
+                progress = 10 + int(done / total * 80)
+                self.progress_update.emit("RESIZING" if progress < 60 else "COMPRESSING", progress)
+            
+            crunched = crunch_file(self, file_path, thread_budget, on_page=page_progress)
+            
+            stats = f"Stats: {crunched.engine} engine, {crunched.pipeline.describe()}; {thread_budget.describe()}"
+            if IO_THROTTLE.describe():
+                stats += f"; {IO_THROTTLE.describe()}"
+            self.file_info_update.emit(stats)
+            for destination in crunched.destinations:
+                self.file_info_update.emit(f"Target: {destination}")
+            self.progress_update.emit("REPACKAGING", 100)
+            self.finished.emit(True, "Comic processed successfully!")
+                
+        except ProcessingCancelled:
+            self.finished.emit(False, f"Cancelled: stopped and rolled back in {time.perf_counter() - self.cancel_started:.1f}s")
+        except ProcessingTimedOut as e:
+            self.finished.emit(False, f"Timed out: {e} (original kept)")
+        except NoPagesFound as e:
+            self.finished.emit(False, str(e))
+        except MemoryError:
+            self.finished.emit(False, "Memory Error: File too large. Try reducing batch size or closing other applications.")
+        except PermissionError:
+            self.finished.emit(False, "Permission Error: Cannot access file. Check file permissions and try again.")
+        except FileNotFoundError:
+            self.finished.emit(False, "File Error: File not found or moved during processing.")
+        except Exception as e:
+            self.finished.emit(False, f"Error: {str(e)}")
+        finally:
+            if self.remote_pool:
+                self.remote_pool.close()
+    
+    def stop(self):
+        """Cancel: drop queued pages, stop in-flight workers and roll the file back"""
+        if self.should_stop:
+            return
+        self.cancel_started = time.perf_counter()
+        self.should_stop = True
+        if self.remote_pool:
+            self.remote_pool.close()
+        if self.executor:
+            shutdown_executor(self.executor)
+    
+    def is_already_crunched(self, file_path):
+        """Check if file already contains WebP images"""
+        return is_already_crunched(file_path, self.settings['archive_backends'])
+
+class LibraryIndex:
+    """Persistent record of files already handled, keyed by path, size and mtime"""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else CONFIG_DIR / "library_index.json"
+        self.lock = threading.Lock()
+        self.entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read library index {self.path}: {e}")
+
+    def knows(self, file_path):
+        """True if file_path was handled and has not changed since"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        entry = self.entries.get(os.path.abspath(file_path))
+        return bool(entry) and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime
+
+    def record(self, file_path, status):
+        """Remember the current state of file_path and save the index"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        with self.lock:
+            self.entries[os.path.abspath(file_path)] = {
+                'size': stat.st_size, 'mtime': stat.st_mtime, 'status': status, 'time': time.time()}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix('.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(temp_path, self.path)
+
+class PollingWatcher:
+    """Reports new or changed comic files by rescanning directories"""
+
+    def __init__(self, directories, interval=2.0):
+        self.directories = directories
+        self.interval = interval
+        self.snapshot = {}
+
+    def scan(self):
+        found = {}
+        for directory in self.directories:
+            for root, dirs, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    found[path] = (stat.st_size, stat.st_mtime)
+        return found
+
+    def changes(self, stop_event):
+        """Wait one interval and return paths that appeared or changed"""
+        stop_event.wait(self.interval)
+        found = self.scan()
+        changed = [path for path, state in found.items() if self.snapshot.get(path) != state]
+        self.snapshot = found
+        return changed
+
+class InotifyWatcher:
+    """Reports comic files as inotify sees them written or moved in (Linux)"""
+
+    EVENTS = ('CLOSE_WRITE', 'MOVED_TO', 'CREATE', 'MODIFY')
+
+    def __init__(self, directories, interval=1.0):
+        self.inotify = inotify_simple.INotify()
+        self.interval = interval
+        self.watches = {}
+        self.mask = 0
+        for name in self.EVENTS:
+            self.mask |= getattr(inotify_simple.flags, name)
+        for directory in directories:
+            for root, dirs, files in os.walk(directory):
+                self.add_watch(root)
+
+    def add_watch(self, directory):
+        wd = self.inotify.add_watch(directory, self.mask)
+        self.watches[wd] = directory
+
+    def changes(self, stop_event):
+        """Block up to one interval for events and return the paths they touched"""
+        changed = []
+        for event in self.inotify.read(timeout=int(self.interval * 1000)):
+            directory = self.watches.get(event.wd)
+            if not directory or not event.name:
+                continue
+            path = os.path.join(directory, event.name)
+            if event.mask & inotify_simple.flags.ISDIR:
+                if event.mask & inotify_simple.flags.CREATE:
+                    self.add_watch(path)  # new sub-folder in the inbox
+                continue
+            changed.append(path)
+        return changed
+
+class WatchMetrics:
+    """Queue depth, arrival-to-done latency and throughput of the watch daemon"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.latencies = deque(maxlen=1000)
+
+    def finish(self, arrival_time, ok, size):
+        with self.lock:
+            self.running -= 1
+            if ok:
+                self.completed += 1
+                self.bytes_in += size
+            else:
+                self.failed += 1
+            self.latencies.append(time.time() - arrival_time)
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-6)
+            latencies = sorted(self.latencies)
+            return {
+                'queue_depth': self.queued,
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'latency_avg_s': sum(latencies) / len(latencies) if latencies else 0.0,
+                'latency_p95_s': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                'files_per_hour': self.completed / elapsed * 3600,
+                'mb_per_s': self.bytes_in / elapsed / (1024 * 1024),
+            }
+
+class WatchDaemon:
+    """Watches inbox folders and crunches or combines comics once they are fully written"""
+
+    def __init__(self, directories, mode="crunch", concurrency=2, settle=5.0, settings=None,
+                 index=None, metrics_interval=60, metrics_file=None):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.mode = mode
+        self.concurrency = concurrency
+        self.settle = settle
+        self.settings = settings or load_settings()
+        self.index = index or LibraryIndex(self.settings['library_index'] or None)
+        self.metrics = WatchMetrics()
+        self.metrics_interval = metrics_interval
+        self.metrics_file = metrics_file
+        self.stop_event = threading.Event()
+        self.candidates = {}  # path -> [size, mtime, last change, first seen]
+        self.combine_pending = {}  # directory -> [(path, first seen)]
+        self.in_progress = set()
+
+    def create_watcher(self):
+        if INOTIFY_AVAILABLE:
+            try:
+                return InotifyWatcher(self.directories)
+            except OSError as e:
+                print(f"inotify unavailable ({e}), falling back to polling")
+        return PollingWatcher(self.directories)
+
+    def is_candidate(self, path):
+        name = os.path.basename(path)
+        # Skip our own in-flight outputs and backups
+        if name.startswith('temp_') or name.endswith('.backup'):
+            return False
+        return name.lower().endswith(ARCHIVE_EXTENSIONS if self.mode == "combine" else COMIC_EXTENSIONS)
+
+    def note(self, path, now):
+        """Record a file that appeared or changed; it is queued once it stops changing"""
+        if not self.is_candidate(path) or path in self.in_progress:
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.candidates.pop(path, None)
+            return
+        state = self.candidates.get(path)
+        if state is None:
+            self.candidates[path] = [stat.st_size, stat.st_mtime, now, now]
+        elif (state[0], state[1]) != (stat.st_size, stat.st_mtime):
+            state[0], state[1], state[2] = stat.st_size, stat.st_mtime, now
+
+    def check_stable(self, now):
+        """Queue candidates whose size and mtime have not changed for the settle time"""
+        for path, state in list(self.candidates.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.candidates[path]
+                continue
+            if (state[0], state[1]) != (stat.st_size, stat.st_mtime):
+                state[0], state[1], state[2] = stat.st_size, stat.st_mtime, now
+                continue
+            if now - state[2] < self.settle:
+                continue
+
+            del self.candidates[path]
+            if self.index.knows(path):
+                with self.metrics.lock:
+                    self.metrics.skipped += 1
+                continue
+            if self.mode == "combine":
+                self.combine_pending.setdefault(os.path.dirname(path), []).append((path, state[3]))
+            else:
+                self.submit(self.crunch_job, [path], state[3])
+
+        if self.mode == "combine":
+            self.flush_combines(now)
+
+    def flush_combines(self, now):
+        """Combine a folder's issues once nothing new has arrived in it for the settle time"""
+        for directory, pending in list(self.combine_pending.items()):
+            settling = any(os.path.dirname(path) == directory for path in self.candidates)
+            newest = max(first_seen for _, first_seen in pending)
+            if settling or now - newest < self.settle or len(pending) < 2:
+                continue
+            del self.combine_pending[directory]
+            self.submit(self.combine_job, [path for path, _ in pending], min(t for _, t in pending))
+
+    def submit(self, job, paths, arrival_time):
+        with self.metrics.lock:
+            self.metrics.queued += 1
+        self.in_progress.update(paths)
+        future = self.executor.submit(self.run_job, job, paths, arrival_time)
+        future.add_done_callback(lambda _: self.in_progress.difference_update(paths))
+
+    def run_job(self, job, paths, arrival_time):
+        with self.metrics.lock:
+            self.metrics.queued -= 1
+            self.metrics.running += 1
+        size = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+        ok = False
+        try:
+            ok = job(paths)
+        except Exception as e:
+            print(f"Error: {', '.join(os.path.basename(p) for p in paths)} - {e}")
+        finally:
+            self.metrics.finish(arrival_time, ok, size)
+
+    def crunch_job(self, paths):
+        file_path = Path(paths[0])
+        processor = BatchProcessor([], self.settings)
+        if self.settings['min_savings_percent'] > 0 and not processor.prioritize_by_savings([paths[0]]):
+            self.index.record(file_path, "low-yield")
+            print(f"Skipped: {file_path.name} (below {self.settings['min_savings_percent']:g}% projected savings)")
+            return True
+        started = time.perf_counter()
+        result = processor.process_single_file(file_path)
+        processor.record_estimate(paths[0], result, time.perf_counter() - started)
+        output_path = file_path.with_suffix('.cbz')
+        if result == "skipped":
+            self.index.record(file_path, "skipped")
+            print(f"Skipped: {file_path.name} (already crunched)")
+            return True
+        if isinstance(result, tuple) and result[0] == "success":
+            self.index.record(output_path, "crunched")
+            print(f"Completed: {file_path.name} ({format_file_size(result[1])} → {format_file_size(result[2])})")
+            return True
+        self.index.record(file_path, "error")
+        print(f"Error: {file_path.name} - {result[1] if isinstance(result, tuple) else result}")
+        return False
+
+    def combine_job(self, paths):
+        combiner = ComicCombiner(paths, self.settings)
+        outcome = {}
+        volumes = []
+        def on_info(message):
+            if message.startswith("Completed: "):
+                volumes.append(os.path.join(os.path.dirname(paths[0]), message[len("Completed: "):]))
+                print(message)
+        combiner.file_info_update.connect(on_info)
+        combiner.finished.connect(lambda ok, message: outcome.update(ok=ok, message=message))
+        combiner.run()
+        print(("Completed: " if outcome.get('ok') else "Error: ") + outcome.get('message', 'combine failed'))
+        # The new volumes land in the inbox too; remember them so they are not combined again
+        for volume in volumes:
+            self.index.record(volume, "combined")
+        for path in paths:
+            if os.path.exists(path):
+                self.index.record(path, "error")  # left in place, don't retry until it changes
+        return bool(outcome.get('ok'))
+
+    def report_metrics(self):
+        metrics = self.metrics.snapshot()
+        print("Metrics: queue {queue_depth}, running {running}, done {completed}, failed {failed}, "
+              "skipped {skipped}, latency avg {latency_avg_s:.1f}s p95 {latency_p95_s:.1f}s, "
+              "{files_per_hour:.1f} files/h, {mb_per_s:.2f} MB/s".format(**metrics) +
+              (f", {IO_THROTTLE.describe()}" if IO_THROTTLE.describe() else ""))
+        if self.metrics_file:
+            with open(self.metrics_file, 'w', encoding='utf-8') as f:
+                json.dump(metrics, f, indent=2)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        """Watch until stop() is called or the process is interrupted"""
+        watcher = self.create_watcher()
+        IO_THROTTLE.configure(self.settings)
+        print(f"Watching {', '.join(self.directories)} ({self.mode}, {type(watcher).__name__}, "
+              f"concurrency {self.concurrency}, settle {self.settle:g}s)")
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        now = time.time()
+        # Files already sitting in the inbox count as new arrivals
+        for path in PollingWatcher(self.directories).scan():
+            self.note(path, now)
+        last_report = now
+        try:
+            while not self.stop_event.is_set():
+                changed = watcher.changes(self.stop_event)
+                now = time.time()
+                for path in changed:
+                    self.note(path, now)
+                self.check_stable(now)
+                if now - last_report >= self.metrics_interval:
+                    self.report_metrics()
+                    last_report = now
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.executor.shutdown(wait=True)
+            self.report_metrics()
+
+def synthetic_page(path, seed, size=(2000, 3000)):
+    """Write a comic-like test page: flat colour panels, line art and print grain"""
+    rng = random.Random(seed)
+    width, height = size
+    page = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(page)
+    margin = width // 30
+    for row in range(3):
+        for col in range(2):
+            left, top = margin + col * (width - margin) // 2, margin + row * (height - margin) // 3
+            right, bottom = (col + 1) * (width - margin) // 2, (row + 1) * (height - margin) // 3
+            draw.rectangle((left, top, right, bottom), fill=tuple(rng.randint(40, 230) for _ in range(3)),
+                           outline='black', width=8)
+            for _ in range(15):
+                points = [(rng.randint(left, right), rng.randint(top, bottom)) for _ in range(2)]
+                draw.line(points, fill='black', width=rng.randint(2, 6))
+            x, y = rng.randint(left, right - 200), rng.randint(top, bottom - 120)
+            draw.ellipse((x, y, x + 200, y + 120), fill='white', outline='black', width=4)
+    grain = Image.effect_noise(size, 40).convert('RGB')
+    Image.blend(page, grain, 0.08).save(path, quality=92)
+    return path
+
+def page_psnr(path, reference):
+    """Peak signal-to-noise ratio of an encoded page against a reference image, in dB"""
+    with Image.open(path) as img:
+        if img.size != reference.size:
+            img = img.resize(reference.size)
+        diff = ImageStat.Stat(ImageChops.difference(img.convert('RGB'), reference.convert('RGB')))
+    mse = sum(rms ** 2 for rms in diff.rms) / len(diff.rms)
+    return float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+def copy_pages(pages, dest_dir, copies=1):
+    """Fresh copies of the test pages; encoding consumes its input"""
+    os.makedirs(dest_dir, exist_ok=True)
+    return [shutil.copy(page, os.path.join(dest_dir, f"{i}_{os.path.basename(page)}"))
+            for i in range(copies) for page in pages]
+
+def calibrate(page_count=6, tolerance_db=0.5, profile_path=None):
+    """Benchmark this machine and write the fastest settings within tolerance_db to the profile
+
+    Backends and resize filters are timed one page at a time in this process and
+    scored by PSNR against an unencoded Lanczos resize of each page; any within
+    tolerance_db of Pillow's Lanczos encode qualifies. The fastest is then run
+    through pools of different worker and library thread counts.
+    """
+    profile_path = Path(profile_path or PROFILE_PATH)
+    cpu_count = multiprocessing.cpu_count()
+    backends = ['pillow'] + (['opencv'] if GPU_AVAILABLE else [])
+    work_dir = tempfile.mkdtemp(prefix="cc_calibrate_")
+    previous_limits = limit_library_threads(1)  # per-page cost; library threads are tuned with the pool below
+    try:
+        pages = [synthetic_page(os.path.join(work_dir, f"page_{i:03d}.jpg"), i) for i in range(page_count)]
+        print(f"Calibrating on {page_count} synthetic pages, {cpu_count} CPUs, backends: {', '.join(backends)}")
+
+        def encode(backend, resize_filter, name):
+            dest = os.path.join(work_dir, name)
+            process = partial(image_function(backend), resize_filter=resize_filter)
+            copies = copy_pages(pages, dest)
+            start = time.perf_counter()
+            outputs = [process((page, dest)) for page in copies]
+            return outputs, (time.perf_counter() - start) / len(copies)
+
+        references = []
+        for page in pages:
+            with Image.open(page) as img:
+                references.append(ImageProcessor.process_image(img.convert('RGB')))
+        candidates = []
+        for backend in backends:
+            for resize_filter in RESIZE_FILTERS:
+                outputs, seconds = encode(backend, resize_filter, f"{backend}_{resize_filter}")
+                if None in outputs:
+                    print(f"  {backend:<8} {resize_filter:<9} failed")
+                    continue
+                psnr = min(page_psnr(output, reference) for output, reference in zip(outputs, references))
+                candidates.append({'backend': backend, 'resize_filter': resize_filter,
+                                   'seconds_per_page': round(seconds, 4), 'psnr': round(psnr, 2)})
+                print(f"  {backend:<8} {resize_filter:<9} {seconds * 1000:8.0f} ms/page  {psnr:6.1f} dB")
+        baseline = candidates[0]['psnr']  # Pillow Lanczos, what every run used before calibration
+        best = min((c for c in candidates if c['psnr'] >= baseline - tolerance_db),
+                   key=lambda c: c['seconds_per_page'])
+        process = partial(image_function(best['backend']), resize_filter=best['resize_filter'])
+
+        worker_counts = sorted({min(2 ** i, cpu_count) for i in range(cpu_count.bit_length() + 1)})
+        pools = []
+        for workers in worker_counts:
+            for library_threads in sorted({1, max(1, cpu_count // workers)}):
+                budget = ThreadBudget(workers, library_threads)
+                dest = os.path.join(work_dir, f"pool_{workers}_{library_threads}")
+                copies = copy_pages(pages, dest, -(-2 * workers // page_count))  # two pages per worker at least
+                with ProcessPoolExecutor(**budget.executor_args()) as executor:
+                    list(executor.map(abs, range(workers)))  # start workers outside the timing
+                    start = time.perf_counter()
+                    list(executor.map(process, [(page, dest) for page in copies]))
+                    rate = len(copies) / (time.perf_counter() - start)
+                pools.append({'workers': workers, 'library_threads': library_threads,
+                              'pages_per_second': round(rate, 2)})
+                print(f"  {workers:3d} workers x {library_threads:2d} library threads {rate:8.1f} pages/s")
+        fastest = max(pools, key=lambda p: p['pages_per_second'])
+    finally:
+        restore_library_threads(previous_limits)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    profile = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'cpu_count': cpu_count,
+        'tolerance_db': tolerance_db,
+        'settings': {'image_backend': best['backend'], 'resize_filter': best['resize_filter'],
+                     'workers': fastest['workers'], 'library_threads': fastest['library_threads']},
+        'backends': candidates,
+        'pools': pools,
+    }
+    profile_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(profile_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    print(f"Profile: {best['backend']}, {best['resize_filter']} filter, {fastest['workers']} workers x "
+          f"{fastest['library_threads']} library threads -> {profile_path}")
+    return profile
+
+# Async library API: each job's processor runs on a thread of the event loop's default
+# executor and its signals arrive as these events, in the order they were emitted
+ProgressEvent = namedtuple('ProgressEvent', ['stage', 'percent'])
+InfoEvent = namedtuple('InfoEvent', ['message'])
+BatchEvent = namedtuple('BatchEvent', ['current', 'total'])
+FinishedEvent = namedtuple('FinishedEvent', ['success', 'message'])
+
+@lru_cache(maxsize=None)
+def shared_pool():
+    """The SharedProcessPool used by every async job in this process, started on first use"""
+    return SharedProcessPool()
+
+async def processor_events(processor):
+    """Run a processor off the event loop, yielding its progress as events up to a FinishedEvent
+
+    Leaving the loop early (break, task cancellation) stops the processor and waits for its rollback.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    def forward(event_type):
+        return lambda *args: loop.call_soon_threadsafe(events.put_nowait, event_type(*args))
+    processor.progress_update.connect(forward(ProgressEvent))
+    processor.file_info_update.connect(forward(InfoEvent))
+    if hasattr(processor, 'batch_progress'):
+        processor.batch_progress.connect(forward(BatchEvent))
+    processor.finished.connect(forward(FinishedEvent))
+    run = loop.run_in_executor(None, processor.run)
+    run.add_done_callback(lambda _: events.put_nowait(None))  # queued behind everything run() emitted
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+        await run
+    finally:
+        if not run.done():
+            processor.stop()
+            await asyncio.wait([run])
+
+def crunch(path, settings=None):
+    """Crunch one comic: async iterator of ProgressEvent/InfoEvent ending with a FinishedEvent"""
+    return processor_events(ComicProcessor(path, settings, shared_pool()))
+
+def crunch_batch(paths, settings=None):
+    """Crunch comics one after another, with BatchEvents between files, ending with a FinishedEvent"""
+    return processor_events(BatchProcessor(paths, settings, shared_pool()))
+
+def combine(paths, settings=None):
+    """Combine issues into TPB volumes: async iterator of events ending with a FinishedEvent"""
+    return processor_events(ComicCombiner(paths, settings))
+
+# Job service: crunch/combine jobs submitted over HTTP, kept in SQLite so queued work survives restarts
+JOB_KINDS = ("crunch", "combine")
+QOS_SETTINGS = ('io_read_mbps', 'io_write_mbps', 'io_ops_per_second', 'low_priority')  # adjustable at runtime
+
+class JobQueue:
+    """Persistent job queue, claimed by priority (highest first) then submission order"""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else CONFIG_DIR / "jobs.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, paths TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0, state TEXT NOT NULL DEFAULT 'queued', message TEXT,
+                submitted REAL NOT NULL, started REAL, finished REAL, bytes_in INTEGER, bytes_out INTEGER)""")
+            interrupted = [row['id'] for row in self.db.execute("SELECT id FROM jobs WHERE state = 'running'")]
+        # Jobs cut off by a restart run again, unless that is no longer safe
+        for job_id in interrupted:
+            self.requeue(job_id)
+
+    def job(self, row):
+        job = dict(row)
+        job['paths'] = json.loads(job['paths'])
+        return job
+
+    def submit(self, kind, paths, priority=0):
+        with self.lock:
+            cursor = self.db.execute("INSERT INTO jobs (kind, paths, priority, submitted) VALUES (?, ?, ?, ?)",
+                                     (kind, json.dumps(paths), priority, time.time()))
+            return cursor.lastrowid
+
+    def claim(self):
+        """Mark the next queued job running and return it, or None"""
+        with self.lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE state = 'queued' "
+                                  "ORDER BY priority DESC, id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE jobs SET state = 'running', started = ? WHERE id = ?", (time.time(), row['id']))
+        return self.get(row['id'])
+
+    def finish(self, job_id, state, message=None, bytes_in=None, bytes_out=None):
+        with self.lock:
+            self.db.execute("UPDATE jobs SET state = ?, message = ?, finished = ?, bytes_in = ?, bytes_out = ? "
+                            "WHERE id = ?", (state, message, time.time(), bytes_in, bytes_out, job_id))
+
+    def requeue(self, job_id):
+        """Queue an interrupted job to run again; False if it was marked failed instead
+
+        A crunch never leaves a file half replaced, so it can always run again. A combine
+        removes each volume's originals once the volume is written, and running it again
+        on what is left would renumber the volumes and overwrite the finished ones.
+        """
+        job = self.get(job_id)
+        missing = [path for path in job['paths'] if not os.path.exists(path)] if job['kind'] == "combine" else []
+        with self.lock:
+            if missing:
+                message = (f"Interrupted after combining some volumes; {len(missing)} of {len(job['paths'])} "
+                           f"issues were already combined (first: {Path(missing[0]).name})")
+                self.db.execute("UPDATE jobs SET state = 'failed', message = ?, finished = ? WHERE id = ?",
+                                (message, time.time(), job_id))
+            else:
+                self.db.execute("UPDATE jobs SET state = 'queued', started = NULL WHERE id = ?", (job_id,))
+        return not missing
+
+    def cancel_queued(self, job_id):
+        """Cancel a job that has not started; False if it is running or already over"""
+        with self.lock:
+            cursor = self.db.execute("UPDATE jobs SET state = 'cancelled', finished = ? "
+                                     "WHERE id = ? AND state = 'queued'", (time.time(), job_id))
+            return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self.job(row) if row else None
+
+    def jobs(self, state=None, limit=100):
+        """Most recent jobs first"""
+        with self.lock:
+            if state:
+                rows = self.db.execute("SELECT * FROM jobs WHERE state = ? ORDER BY id DESC LIMIT ?", (state, limit))
+            else:
+                rows = self.db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+            return [self.job(row) for row in rows.fetchall()]
+
+    def metrics(self, since):
+        """Queue depth by state, plus latency and throughput of jobs finished after since"""
+        with self.lock:
+            counts = dict(self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            finished = self.db.execute("SELECT finished - submitted, bytes_in FROM jobs "
+                                       "WHERE state = 'done' AND finished >= ?", (since,)).fetchall()
+        elapsed = max(time.time() - since, 1e-6)
+        latencies = sorted(latency for latency, _ in finished)
+        return {
+            'queue_depth': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'completed': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'cancelled': counts.get('cancelled', 0),
+            'latency_avg_s': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p95_s': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            'jobs_per_hour': len(finished) / elapsed * 3600,
+            'mb_per_s': sum(size or 0 for _, size in finished) / elapsed / (1024 * 1024),
+        }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class JobService:
+    """Runs queued jobs on concurrency threads; process-engine pages go to the service's process pool"""
+
+    def __init__(self, job_queue, concurrency=2, settings=None):
+        self.queue = job_queue
+        self.concurrency = concurrency
+        self.settings = settings or load_settings()
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self.condition = threading.Condition()
+        self.lock = threading.Lock()
+        self.running = {}  # job id -> processor
+        self.progress = {}  # job id -> live stage, percent, file and last message
+        self.threads = []
+        self.pool = None  # SharedProcessPool for crunch jobs, started by the first one
+
+    def start(self):
+        IO_THROTTLE.configure(self.settings)
+        for _ in range(self.concurrency):
+            thread = threading.Thread(target=self.worker_loop, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, kind, paths, priority=0):
+        job_id = self.queue.submit(kind, paths, priority)
+        with self.condition:
+            self.condition.notify()
+        return job_id
+
+    def status(self, job_id):
+        job = self.queue.get(job_id)
+        if job is None:
+            return None
+        with self.lock:
+            progress = self.progress.get(job_id)
+            if progress:
+                job['progress'] = dict(progress)
+        now = time.time()
+        job['wait_s'] = (job['started'] or job['finished'] or now) - job['submitted']
+        if job['started']:
+            job['run_s'] = (job['finished'] or now) - job['started']
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or stop a running one (it rolls back and is marked cancelled)"""
+        if not self.queue.cancel_queued(job_id):
+            with self.lock:
+                processor = self.running.get(job_id)
+            if processor:
+                processor.stop()
+        return self.status(job_id)
+
+    def metrics(self):
+        metrics = self.queue.metrics(self.started)
+        metrics['concurrency'] = self.concurrency
+        metrics['io'] = IO_THROTTLE.snapshot()
+        return metrics
+
+    def qos(self):
+        """I/O caps and worker priority, with the throughput achieved against the caps"""
+        qos = {key: self.settings[key] for key in QOS_SETTINGS}
+        qos['achieved'] = IO_THROTTLE.snapshot()
+        return qos
+
+    def set_qos(self, changes):
+        """Apply new caps or priority to running and later jobs; raises ValueError for bad values"""
+        updates = {}
+        for key, value in changes.items():
+            if key not in QOS_SETTINGS:
+                raise ValueError(f"unknown setting {key!r}, expected one of {', '.join(QOS_SETTINGS)}")
+            default = DEFAULT_SETTINGS[key]
+            if isinstance(default, bool):
+                if not isinstance(value, bool):
+                    raise ValueError(f"{key} must be true or false")
+            elif isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"{key} must be a number >= 0")
+            updates[key] = type(default)(value)
+        with self.lock:
+            self.settings.update(updates)
+            pool = self.pool
+        IO_THROTTLE.configure(self.settings)
+        if 'low_priority' in updates and pool:
+            pool.set_low_priority(updates['low_priority'])  # a pool started later reads it from settings
+        return self.qos()
+
+    def process_pool(self):
+        """The service's SharedProcessPool, built from its settings on first use"""
+        with self.lock:
+            if self.pool is None:
+                self.pool = SharedProcessPool(self.settings)
+            return self.pool
+
+    def worker_loop(self):
+        while not self.stop_event.is_set():
+            job = self.queue.claim()
+            if job is None:
+                with self.condition:
+                    self.condition.wait(1.0)
+                continue
+            try:
+                self.run_job(job)
+            except Exception as e:
+                print(f"Error: job {job['id']} - {e}")
+                self.queue.finish(job['id'], "failed", str(e))
+
+    def run_job(self, job):
+        paths = job['paths']
+        if job['kind'] == "combine":
+            processor = ComicCombiner(paths, self.settings)
+        else:
+            processor = BatchProcessor(paths, self.settings, self.process_pool())
+        progress = {'stage': None, 'percent': 0, 'file': None, 'message': None}
+        outcome = {}
+        processor.progress_update.connect(lambda stage, percent: progress.update(stage=stage, percent=percent))
+        processor.file_info_update.connect(lambda message: progress.update(message=message))
+        if hasattr(processor, 'batch_progress'):
+            processor.batch_progress.connect(lambda current, total: progress.update(file=f"{current}/{total}"))
+        processor.finished.connect(lambda ok, message: outcome.update(ok=ok, message=message))
+        bytes_in = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+        with self.lock:
+            self.running[job['id']] = processor
+            self.progress[job['id']] = progress
+        try:
+            processor.run()
+        finally:
+            with self.lock:
+                del self.running[job['id']]
+                del self.progress[job['id']]
+        message = outcome.get('message', "job ended without a result")
+        if processor.should_stop and self.stop_event.is_set():
+            # Interrupted by shutdown: run it again next start, if that is still safe
+            if not self.queue.requeue(job['id']):
+                print(f"Job {job['id']} failed: {self.queue.get(job['id'])['message']}")
+            return
+        if processor.should_stop:
+            state = "cancelled"
+        elif outcome.get('ok') and not getattr(processor, 'error_count', 0):
+            state = "done"
+        else:
+            state = "failed"
+        bytes_out = bytes_in - processor.total_space_saved if job['kind'] == "crunch" else None
+        self.queue.finish(job['id'], state, message, bytes_in, bytes_out)
+        print(f"Job {job['id']} {state}: {message}")
+
+    def stop(self):
+        """Stop taking jobs; running ones roll back and stay queued for the next start"""
+        self.stop_event.set()
+        with self.lock:
+            processors = list(self.running.values())
+        for processor in processors:
+            processor.stop()
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+        if self.pool:
+            self.pool.close()
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API: POST /jobs, GET /jobs[?state=], GET /jobs/<id>, POST /jobs/<id>/cancel
+    (or DELETE /jobs/<id>), GET /metrics, and GET or PUT /qos"""
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def route(self):
+        """(path parts, query) once the request is authorized, else None after replying 401"""
+        token = self.server.service.settings['service_token']
+        if token and not hmac.compare_digest(self.headers.get('Authorization', ''), f"Bearer {token}"):
+            self.send_json(401, {'error': "missing or wrong bearer token"})
+            return None
+        url = urllib.parse.urlsplit(self.path)
+        return [part for part in url.path.split('/') if part], urllib.parse.parse_qs(url.query)
+
+    def job_id(self, parts):
+        try:
+            return int(parts[1])
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        route = self.route()
+        if route is None:
+            return
+        parts, query = route
+        service = self.server.service
+        if parts == ['metrics']:
+            self.send_json(200, service.metrics())
+        elif parts == ['qos']:
+            self.send_json(200, service.qos())
+        elif parts == ['jobs']:
+            self.send_json(200, service.queue.jobs(query.get('state', [None])[0]))
+        elif len(parts) == 2 and parts[0] == 'jobs' and (job := service.status(self.job_id(parts))):
+            self.send_json(200, job)
+        else:
+            self.send_json(404, {'error': "not found"})
+
+    def do_POST(self):
+        route = self.route()
+        if route is None:
+            return
+        parts, _ = route
+        if parts == ['jobs']:
+            self.submit_job()
+        elif parts == ['qos']:
+            self.update_qos()
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            self.cancel_job(parts)
+        else:
+            self.send_json(404, {'error': "not found"})
+
+    def do_PUT(self):
+        route = self.route()
+        if route is None:
+            return
+        parts, _ = route
+        if parts == ['qos']:
+            self.update_qos()
+        else:
+            self.send_json(404, {'error': "not found"})
+
+    def update_qos(self):
+        try:
+            changes = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not isinstance(changes, dict):
+                raise ValueError("expected a JSON object")
+            self.send_json(200, self.server.service.set_qos(changes))
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+
+    def do_DELETE(self):
+        route = self.route()
+        if route is None:
+            return
+        parts, _ = route
+        if len(parts) == 2 and parts[0] == 'jobs':
+            self.cancel_job(parts)
+        else:
+            self.send_json(404, {'error': "not found"})
+
+    def cancel_job(self, parts):
+        job = self.server.service.cancel(self.job_id(parts))
+        if job:
+            self.send_json(200, job)
+        else:
+            self.send_json(404, {'error': "not found"})
+
+    def submit_job(self):
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            kind = request.get('kind', "crunch")
+            paths = [os.path.abspath(path) for path in request['paths']]
+            priority = int(request.get('priority', 0))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.send_json(400, {'error': f"expected {{\"kind\", \"paths\": [...], \"priority\"}}: {e}"})
+            return
+        extensions = ARCHIVE_EXTENSIONS if kind == "combine" else COMIC_EXTENSIONS
+        problems = [f"{path}: not a {'/'.join(extensions)} file" for path in paths
+                    if not (os.path.isfile(path) and path.lower().endswith(extensions))]
+        if kind not in JOB_KINDS:
+            problems.insert(0, f"unknown kind {kind!r}, expected one of {', '.join(JOB_KINDS)}")
+        elif not paths or (kind == "combine" and len(paths) < 2):
+            problems.insert(0, "combine needs at least 2 paths" if kind == "combine" else "no paths")
+        if problems:
+            self.send_json(400, {'error': "; ".join(problems)})
+            return
+        job_id = self.server.service.submit(kind, paths, priority)
+        self.send_json(201, self.server.service.status(job_id))
+
+def create_job_server(listen="127.0.0.1:8787", concurrency=2, queue_path=None, settings=None):
+    """Create (but do not start) the job service's HTTP server
+
+    Jobs delete and replace files, so anything other than a loopback address needs a service_token.
+    """
+    settings = settings or load_settings()
+    if not settings['service_token'] and not is_loopback_address(listen):
+        raise ValueError(f"Set COMIC_CRUNCHER_SERVICE_TOKEN to listen on {listen}")
+    host, _, port = listen.rpartition(':')
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), JobRequestHandler)
+    server.service = JobService(JobQueue(queue_path or settings['job_queue'] or None), concurrency, settings)
+    return server
+
+def run_job_service(listen="127.0.0.1:8787", concurrency=2, queue_path=None, settings=None):
+    """Serve the job API until interrupted; queued and interrupted jobs resume on the next start"""
+    settings = settings or load_settings()
+    server = create_job_server(listen, concurrency, queue_path, settings)
+    service = server.service
+    # Service managers stop daemons with SIGTERM; roll running jobs back and requeue them
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    service.start()
+    print(f"Job service on http://{server.server_address[0]}:{server.server_address[1]} "
+          f"(concurrency {concurrency}, queue {service.queue.path}"
+          f"{', token required' if settings['service_token'] else ''})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        service.queue.close()
+
+def run_command(argv):
+    """Headless command line modes"""
+    parser = argparse.ArgumentParser(prog="comic_cruncher.py", description="Comic Cruncher headless modes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    worker = subparsers.add_parser("worker", help="serve page encoding to remote coordinators")
+    worker.add_argument("--listen", default="127.0.0.1:7878",
+                        help="host:port or unix:/path (default: 127.0.0.1:7878; other hosts need a worker token)")
+    worker.add_argument("--workers", type=int, default=None, help="encode processes (default: CPU count)")
+    
+    watch = subparsers.add_parser("watch", help="crunch or combine comics as they land in inbox folders")
+    watch.add_argument("directories", nargs="+", help="folders to watch")
+    watch.add_argument("--mode", choices=("crunch", "combine"), default="crunch")
+    watch.add_argument("--concurrency", type=int, default=2, help="files processed at once (default: 2)")
+    watch.add_argument("--settle", type=float, default=5.0,
+                       help="seconds a file's size and mtime must be stable before it is queued (default: 5)")
+    watch.add_argument("--metrics-interval", type=float, default=60, help="seconds between metrics reports")
+    watch.add_argument("--metrics-file", help="also write metrics as JSON to this file")
+    
+    calibrate_parser = subparsers.add_parser("calibrate", help="benchmark this machine and save a settings profile")
+    calibrate_parser.add_argument("--pages", type=int, default=6, help="synthetic pages per measurement (default: 6)")
+    calibrate_parser.add_argument("--tolerance", type=float, default=0.5,
+                                  help="PSNR in dB a backend or filter may lose against Pillow Lanczos (default: 0.5)")
+    calibrate_parser.add_argument("--output", help=f"profile to write (default: {PROFILE_PATH})")
+    
+    serve = subparsers.add_parser("serve", help="HTTP job service with a persistent queue")
+    serve.add_argument("--listen", default="127.0.0.1:8787",
+                       help="host:port (default: 127.0.0.1:8787; other hosts need a service token)")
+    serve.add_argument("--concurrency", type=int, default=2, help="jobs run at once (default: 2)")
+    serve.add_argument("--queue", help="job database (default: ~/.comic_cruncher/jobs.sqlite3)")
+    
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        try:
+            run_job_service(args.listen, args.concurrency, args.queue)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.command == "calibrate":
+        calibrate(args.pages, args.tolerance, args.output)
+    elif args.command == "worker":
+        try:
+            run_worker(args.listen, args.workers)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.command == "watch":
+        daemon = WatchDaemon(args.directories, args.mode, args.concurrency, args.settle,
+                             metrics_interval=args.metrics_interval, metrics_file=args.metrics_file)
+        # Service managers stop daemons with SIGTERM; finish running jobs like Ctrl+C does
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+        daemon.run()
+
+COMMANDS = ("worker", "watch", "calibrate", "serve")
+
+if __name__ == "__main__":
+    # Headless hosts can run the commands without Qt installed
+    run_command(sys.argv[1:])
@@ -1,1002 +1,117 @@
 import sys
 import os
-import zipfile
-import rarfile
-import tempfile
-import shutil
 from pathlib import Path
-from PIL import Image
-import pdf2image
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                            QHBoxLayout, QLabel, QProgressBar, QFrame, QTextEdit, QPushButton)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QMimeData, QTimer
+                            QHBoxLayout, QLabel, QProgressBar, QFrame, QPushButton,
+                            QListView, QAbstractItemView)
+from PyQt6.QtCore import (Qt, QThread, pyqtSignal, QMimeData, QTimer,
+                          QAbstractListModel, QModelIndex)
 from PyQt6.QtGui import QFont, QPixmap, QPainter, QColor, QPen, QDragEnterEvent, QDropEvent
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-import multiprocessing
-from functools import partial
-import re
-import io
+from collections import deque
 
-# GPU acceleration imports
-try:
-    import cv2
-    import numpy as np
-    GPU_AVAILABLE = True
-except ImportError:
-    GPU_AVAILABLE = False
+from comic_core import (ARCHIVE_EXTENSIONS, COMIC_EXTENSIONS, COMMANDS, GPU_AVAILABLE,
+                        BatchProcessor, ComicCombiner, ComicProcessor, load_settings, run_command)
 
-def format_file_size(size_bytes):
-    """Convert bytes to human readable format"""
-    if size_bytes == 0:
-        return "0B"
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    return f"{size_bytes:.1f}{size_names[i]}"
+# Activity feed limits - keep GUI cost flat no matter how fast workers report
+FEED_MAX_ENTRIES = 500
+FEED_REFRESH_MS = 100  # coalesced UI refresh interval (10 Hz)
+FEED_PLACEHOLDER = "Drop files to begin..."
 
-class ComicCombiner(QThread):
-    """Background thread for combining comic issues into TPB collections"""
+class ProcessorThread(QThread):
+    """Runs a comic_core processor on a Qt thread, re-emitting its callbacks as Qt signals
+    so the GUI's slots run on the GUI thread"""
     
     progress_update = pyqtSignal(str, int)  # stage, percentage
     file_info_update = pyqtSignal(str)  # current file info
+    batch_progress = pyqtSignal(int, int)  # current file, total files
     finished = pyqtSignal(bool, str)  # success, message
     
-    def __init__(self, file_paths):
+    def __init__(self, processor):
         super().__init__()
-        self.file_paths = file_paths
-        self.should_stop = False
+        self.processor = processor
+        for name in ('progress_update', 'file_info_update', 'batch_progress', 'finished'):
+            if hasattr(processor, name):
+                getattr(processor, name).connect(getattr(self, name).emit)
     
-    def run(self):
-        try:
-            if len(self.file_paths) < 2:
-                self.finished.emit(False, "Need at least 2 files to combine")
-                return
-            
-            self.progress_update.emit("SCANNING", 10)
-            
-            # Detect series pattern and sort files
-            series_info = self.detect_series_pattern(self.file_paths)
-            if not series_info:
-                self.finished.emit(False, "Could not detect comic series pattern")
-                return
-            
-            series_name = series_info['name']
-            sorted_files = series_info['files']
-            
-            # Split into batches of 12 issues
-            batch_size = 12
-            batches = []
-            for i in range(0, len(sorted_files), batch_size):
-                batch = sorted_files[i:i + batch_size]
-                batches.append(batch)
-            
-            self.file_info_update.emit(f"Found {len(sorted_files)} issues, creating {len(batches)} TPB volumes")
-            
-            total_created = 0
-            
-            # Process each batch
-            for batch_idx, batch_files in enumerate(batches):
-                if self.should_stop:
-                    return
-                
-                # Calculate issue range for this batch
-                batch_issues = []
-                for file_path in batch_files:
-                    name = Path(file_path).stem
-                    for pattern in [
-                        r'(.+?)\s+(\d{3})(?:\s|$)',
-                        r'(.+?)\s+Issue\s+(\d+)',
-                        r'(.+?)\s+#(\d+)',
-                        r'(.+?)\s+(\d+)(?:\s|$)',
-                    ]:
-                        match = re.search(pattern, name, re.IGNORECASE)
-                        if match:
-                            batch_issues.append(int(match.group(2)))
-                            break
-                
-                if batch_issues:
-                    issue_range = self.format_issue_range(batch_issues)
-                    volume_num = batch_idx + 1
-                    tpb_name = f"{series_name} Vol {volume_num} (Issues {issue_range}).cbz"
-                else:
-                    volume_num = batch_idx + 1
-                    tpb_name = f"{series_name} Vol {volume_num}.cbz"
-                
-                output_path = Path(batch_files[0]).parent / tpb_name
-                
-                # Update progress for this batch
-                batch_progress = 20 + int((batch_idx / len(batches)) * 60)
-                self.progress_update.emit("COMBINING", batch_progress)
-                self.file_info_update.emit(f"Creating Volume {volume_num}: {len(batch_files)} issues")
-                
-                # Combine all images from this batch
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    all_images = []
-                    
-                    for i, file_path in enumerate(batch_files):
-                        if self.should_stop:
-                            return
-                        
-                        file_name = Path(file_path).name
-                        self.file_info_update.emit(f"Processing: {file_name}")
-                        
-                        # Extract images from this issue
-                        images = self.extract_images_from_comic(file_path, temp_dir, i)
-                        all_images.extend(images)
-                    
-                    if not all_images:
-                        self.file_info_update.emit(f"Warning: No images found in Volume {volume_num}")
-                        continue
-                    
-                    # Create combined CBZ for this batch
-                    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as tpb:
-                        for img_path in sorted(all_images):
-                            if os.path.exists(img_path):
-                                tpb.write(img_path, os.path.basename(img_path))
-                    
-                    # Remove original files from this batch
-                    for file_path in batch_files:
-                        try:
-                            os.remove(file_path)
-                        except Exception as e:
-                            print(f"Warning: Could not remove {file_path}: {e}")
-                    
-                    total_created += 1
-                    self.file_info_update.emit(f"Completed: {tpb_name}")
-            
-            self.progress_update.emit("FINALIZING", 100)
-            
-            if total_created > 1:
-                message = f"Created {total_created} TPB volumes from {len(sorted_files)} issues"
-            else:
-                message = f"Created 1 TPB volume from {len(sorted_files)} issues"
-            
-            self.finished.emit(True, message)
-                
-        except MemoryError as e:
-            self.finished.emit(False, f"Memory Error: Not enough memory to combine files. Try fewer files at once.")
-        except PermissionError as e:
-            self.finished.emit(False, f"Permission Error: Cannot access files. Check file permissions.")
-        except Exception as e:
-            self.finished.emit(False, f"Combination error: {str(e)}")
+    @property
+    def should_stop(self):
+        return self.processor.should_stop
     
-    def detect_series_pattern(self, file_paths):
-        """Detect comic series pattern and extract issue numbers"""
-        try:
-            comics = []
-            for file_path in file_paths:
-                name = Path(file_path).stem
-                issue_num = None
-                series_name = None
-                
-                # Try multiple patterns for issue detection
-                patterns = [
-                    r'(.+?)\s+(\d{3})(?:\s|$)',  # Original: "Series Name 001"
-                    r'(.+?)\s+Issue\s+(\d+)',     # "Series Name Issue 1"
-                    r'(.+?)\s+#(\d+)',           # "Series Name #1"
-                    r'(.+?)\s+(\d+)(?:\s|$)',    # "Series Name 1" (fallback)
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, name, re.IGNORECASE)
-                    if match:
-                        series_name = match.group(1).strip()
-                        issue_num = int(match.group(2))
-                        break
-                
-                if series_name and issue_num is not None:
-                    comics.append({
-                        'path': file_path,
-                        'series': series_name,
-                        'issue': issue_num,
-                        'name': name
-                    })
-            
-            if not comics:
-                return None
-            
-            # Group by series name (take the most common one)
-            series_counts = {}
-            for comic in comics:
-                series = comic['series']
-                if series in series_counts:
-                    series_counts[series] += 1
-                else:
-                    series_counts[series] = 1
-            
-            main_series = max(series_counts, key=series_counts.get)
-            series_comics = [c for c in comics if c['series'] == main_series]
-            
-            # Sort by issue number
-            series_comics.sort(key=lambda x: x['issue'])
-            
-            # Generate range string
-            issues = [c['issue'] for c in series_comics]
-            range_str = self.format_issue_range(issues)
-            
-            return {
-                'name': main_series,
-                'range': range_str,
-                'files': [c['path'] for c in series_comics]
-            }
-            
-        except Exception as e:
-            print(f"Error detecting series pattern: {e}")
-            return None
-    
-    def format_issue_range(self, issues):
-        """Format issue numbers into a readable range string"""
-        if not issues:
-            return ""
-        
-        if len(issues) == 1:
-            return str(issues[0])
-        
-        ranges = []
-        start = issues[0]
-        end = issues[0]
-        
-        for i in range(1, len(issues)):
-            if issues[i] == end + 1:
-                end = issues[i]
-            else:
-                if start == end:
-                    ranges.append(str(start))
-                else:
-                    ranges.append(f"{start}-{end}")
-                start = end = issues[i]
-        
-        # Add the last range
-        if start == end:
-            ranges.append(str(start))
-        else:
-            ranges.append(f"{start}-{end}")
-        
-        return ", ".join(ranges)
-    
-    def extract_images_from_comic(self, file_path, temp_dir, issue_index):
-        """Extract images from a comic file"""
-        images = []
-        try:
-            file_path = Path(file_path)
-            
-            if file_path.suffix.lower() == '.cbz':
-                with zipfile.ZipFile(file_path, 'r') as cbz:
-                    for filename in sorted(cbz.namelist()):
-                        if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')):
-                            # Extract with unique name
-                            original_name = os.path.basename(filename)
-                            name, ext = os.path.splitext(original_name)
-                            unique_name = f"issue_{issue_index:03d}_{name}{ext}"
-                            
-                            cbz.extract(filename, path=temp_dir)
-                            old_path = os.path.join(temp_dir, filename)
-                            new_path = os.path.join(temp_dir, unique_name)
-                            
-                            os.rename(old_path, new_path)
-                            images.append(new_path)
-            
-            elif file_path.suffix.lower() == '.cbr':
-                with rarfile.RarFile(file_path, 'r') as cbr:
-                    for filename in sorted(cbr.namelist()):
-                        if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')):
-                            original_name = os.path.basename(filename)
-                            name, ext = os.path.splitext(original_name)
-                            unique_name = f"issue_{issue_index:03d}_{name}{ext}"
-                            
-                            cbr.extract(filename, path=temp_dir)
-                            old_path = os.path.join(temp_dir, filename)
-                            new_path = os.path.join(temp_dir, unique_name)
-                            
-                            os.rename(old_path, new_path)
-                            images.append(new_path)
-        
-        except Exception as e:
-            print(f"Error extracting from {file_path}: {e}")
-        
-        return images
+    def run(self):
+        self.processor.run()
     
     def stop(self):
-        self.should_stop = True
+        self.processor.stop()
 
-class ImageProcessor:
-    """Handles image processing with parallel execution and GPU acceleration"""
-    
-    @staticmethod
-    def process_image_gpu(image_data, target_size=2500, quality=85):
-        """GPU-accelerated image processing using OpenCV"""
-        if not GPU_AVAILABLE:
-            return ImageProcessor.process_image(image_data, target_size, quality)
-        
-        try:
-            if isinstance(image_data, tuple):
-                image_path, temp_dir = image_data
-                try:
-                    # Use OpenCV for faster loading and processing
-                    img_bgr = cv2.imread(image_path, cv2.IMREAD_COLOR)
-                    if img_bgr is None:
-                        # Fallback to PIL if OpenCV can't read
-                        return ImageProcessor.process_image(image_data, target_size, quality)
-                    
-                    # Convert BGR to RGB
-                    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-                    
-                    # Calculate new size maintaining aspect ratio
-                    height, width = img_rgb.shape[:2]
-                    if max(width, height) > target_size:
-                        if width > height:
-                            new_width = target_size
-                            new_height = int((height * target_size) / width)
-                        else:
-                            new_height = target_size
-                            new_width = int((width * target_size) / height)
-                        
-                        # GPU-accelerated resize using OpenCV
-                        img_rgb = cv2.resize(img_rgb, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-                    
-                    # Convert back to PIL for WebP saving
-                    pil_image = Image.fromarray(img_rgb)
-                    
-                    # Save as WebP
-                    output_name = Path(image_path).stem + '.webp'
-                    output_path = os.path.join(temp_dir, output_name)
-                    pil_image.save(output_path, 'WEBP', quality=quality, optimize=True)
-                    return output_path
-                finally:
-                    # Clean up source file after processing
-                    try:
-                        os.remove(image_path)
-                    except (OSError, PermissionError):
-                        pass
-            else:
-                # Direct PIL Image object - convert to numpy for GPU processing
-                img_array = np.array(image_data)
-                
-                # Calculate new size maintaining aspect ratio
-                height, width = img_array.shape[:2]
-                if max(width, height) > target_size:
-                    if width > height:
-                        new_width = target_size
-                        new_height = int((height * target_size) / width)
-                    else:
-                        new_height = target_size
-                        new_width = int((width * target_size) / height)
-                    
-                    # GPU-accelerated resize
-                    img_array = cv2.resize(img_array, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-                
-                return Image.fromarray(img_array)
-        except Exception as e:
-            print(f"GPU processing failed, falling back to CPU: {e}")
-            return ImageProcessor.process_image(image_data, target_size, quality)
-    
-    @staticmethod
-    def process_image(image_data, target_size=2500, quality=85):
-        """Process a single image: resize and convert to WebP"""
-        try:
-            if isinstance(image_data, tuple):
-                image_path, temp_dir = image_data
-                try:
-                    with Image.open(image_path) as img:
-                        # Convert to RGB if necessary
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            img = img.convert('RGB')
-                        
-                        # Calculate new size maintaining aspect ratio
-                        width, height = img.size
-                        if max(width, height) > target_size:
-                            if width > height:
-                                new_width = target_size
-                                new_height = int((height * target_size) / width)
-                            else:
-                                new_height = target_size
-                                new_width = int((width * target_size) / height)
-                            
-                            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        
-                        # Save as WebP
-                        output_name = Path(image_path).stem + '.webp'
-                        output_path = os.path.join(temp_dir, output_name)
-                        img.save(output_path, 'WEBP', quality=quality, optimize=True)
-                        return output_path
-                finally:
-                    # Clean up source file after processing
-                    try:
-                        os.remove(image_path)
-                    except (OSError, PermissionError):
-                        pass  # File might already be gone or locked
-            else:
-                # Direct PIL Image object
-                img = image_data
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                
-                width, height = img.size
-                if max(width, height) > target_size:
-                    if width > height:
-                        new_width = target_size
-                        new_height = int((height * target_size) / width)
-                    else:
-                        new_height = target_size
-                        new_width = int((width * target_size) / height)
-                    
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                return img
-        except Exception as e:
-            print(f"Error processing image: {e}")
-            return None
+class ActivityFeedModel(QAbstractListModel):
+    """Bounded ring buffer of activity feed entries for a QListView"""
 
-class BatchProcessor(QThread):
-    """Background thread for processing multiple comic files"""
-    
-    progress_update = pyqtSignal(str, int)  # stage, percentage
-    file_info_update = pyqtSignal(str)  # current file info
-    batch_progress = pyqtSignal(int, int)  # current file, total files
-    finished = pyqtSignal(bool, str)  # success, message
-    
-    def __init__(self, file_paths):
+    def __init__(self, max_entries=FEED_MAX_ENTRIES):
         super().__init__()
-        self.file_paths = file_paths
-        self.should_stop = False
-        self.processed_count = 0
-        self.skipped_count = 0
-        self.error_count = 0
-        self.total_space_saved = 0
-    
-    def run(self):
-        try:
-            total_files = len(self.file_paths)
-            self.file_info_update.emit(f"Starting batch: {total_files} files found")
-            
-            for i, file_path in enumerate(self.file_paths):
-                if self.should_stop:
-                    break
-                
-                self.batch_progress.emit(i + 1, total_files)
-                
-                # Update with current file being processed
-                file_name = Path(file_path).name
-                self.file_info_update.emit(f"Processing: {file_name}")
-                
-                # Process single file
-                result = self.process_single_file(file_path)
-                
-                # Update with result
-                if result == "success":
-                    self.processed_count += 1
-                    self.file_info_update.emit(f"Completed: {file_name}")
-                elif result == "skipped":
-                    self.skipped_count += 1
-                    self.file_info_update.emit(f"Skipped: {file_name} (already crunched)")
-                elif isinstance(result, tuple) and result[0] == "error":
-                    self.error_count += 1
-                    error_detail = result[1]
-                    self.file_info_update.emit(f"Error: {file_name} - {error_detail}")
-                elif isinstance(result, tuple) and len(result) == 3:
-                    # Result with file size info (success, original_size, new_size)
-                    self.processed_count += 1
-                    original_size, new_size = result[1], result[2]
-                    space_saved = original_size - new_size
-                    self.total_space_saved += space_saved
-                    
-                    if original_size > 0:
-                        percent_saved = int((space_saved / original_size) * 100)
-                        size_info = f"({format_file_size(original_size)} → {format_file_size(new_size)}, {percent_saved}% saved)"
-                    else:
-                        size_info = ""
-                    
-                    self.file_info_update.emit(f"Completed: {file_name} {size_info}")
-                else:
-                    self.error_count += 1
-                    self.file_info_update.emit(f"Error: {file_name} (unknown error)")
-            
-            # Generate summary message
-            summary = f"Batch complete! Processed: {self.processed_count}, Skipped: {self.skipped_count}"
-            if self.error_count > 0:
-                summary += f", Errors: {self.error_count}"
-            if self.total_space_saved > 0:
-                summary += f" | Space saved: {format_file_size(self.total_space_saved)}"
-            
-            self.finished.emit(True, summary)
-            
-        except Exception as e:
-            self.finished.emit(False, f"Batch error: {str(e)}")
-    
-    def process_single_file(self, file_path):
-        """Process a single file and return result status"""
-        try:
-            file_path = Path(file_path)
-            
-            # Get original file size
-            original_size = file_path.stat().st_size
-            
-            # Check if already crunched
-            if self.is_already_crunched(file_path):
-                return "skipped"
-            
-            # Create backup
-            backup_path = file_path.with_suffix(file_path.suffix + '.backup')
-            shutil.copy2(file_path, backup_path)
-            
-            # Extract images
-            if file_path.suffix.lower() == '.pdf':
-                images = self.extract_from_pdf(file_path)
-            elif file_path.suffix.lower() == '.cbz':
-                images = self.extract_from_cbz(file_path)
-            elif file_path.suffix.lower() == '.cbr':
-                images = self.extract_from_cbr(file_path)
-            else:
-                return ("error", "Unsupported file format")
-            
-            if not images:
-                return ("error", "No images found in file")
-            
-            # Process images
-            with tempfile.TemporaryDirectory() as temp_dir:
-                processed_images = []
-                
-                if file_path.suffix.lower() == '.pdf':
-                    for i, img in enumerate(images):
-                        processed_img = ImageProcessor.process_image(img)
-                        if processed_img:
-                            output_path = os.path.join(temp_dir, f"page_{i:04d}.webp")
-                            processed_img.save(output_path, 'WEBP', quality=85, optimize=True)
-                            processed_images.append(output_path)
-                else:
-                    image_tasks = [(img_path, temp_dir) for img_path in images]
-                    with ProcessPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-                        # Use GPU acceleration if available
-                        process_func = ImageProcessor.process_image_gpu if GPU_AVAILABLE else ImageProcessor.process_image
-                        futures = [executor.submit(process_func, task) for task in image_tasks]
-                        for future in futures:
-                            result = future.result()
-                            if result:
-                                processed_images.append(result)
-                
-                if not processed_images:
-                    return ("error", "Failed to process any images")
-                
-                # Create CBZ with optimized compression
-                temp_cbz_path = file_path.parent / f"temp_{file_path.stem}.cbz"
-                with zipfile.ZipFile(temp_cbz_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as cbz:
-                    for img_path in sorted(processed_images):
-                        if os.path.exists(img_path):
-                            # Use minimal compression for WebP files (already compressed)
-                            cbz.write(img_path, os.path.basename(img_path))
-                
-                # Clean up temp directories created during extraction
-                self.cleanup_temp_directories(images)
-                
-                # Replace original
-                final_path = file_path.with_suffix('.cbz') if file_path.suffix.lower() != '.cbz' else file_path
-                if final_path.exists():
-                    os.remove(final_path)
-                os.rename(temp_cbz_path, final_path)
-                
-                if file_path.suffix.lower() != '.cbz' and file_path.exists():
-                    os.remove(file_path)
-                
-                # Clean up backup
-                if backup_path.exists():
-                    os.remove(backup_path)
-                
-                # Get new file size
-                new_size = final_path.stat().st_size
-                
-                return ("success", original_size, new_size)
-                
-        except PermissionError as e:
-            # Clean up temp directories on error
-            if 'images' in locals():
-                self.cleanup_temp_directories(images)
-            return ("error", f"Permission denied: {str(e)}")
-        except FileNotFoundError as e:
-            return ("error", f"File not found: {str(e)}")
-        except zipfile.BadZipFile as e:
-            return ("error", f"Corrupted archive: {str(e)}")
-        except Exception as e:
-            # Clean up temp directories on error
-            if 'images' in locals():
-                self.cleanup_temp_directories(images)
-            return ("error", f"Processing failed: {str(e)}")
-    
-    def stop(self):
-        self.should_stop = True
-    
-    def cleanup_temp_directories(self, image_paths):
-        """Clean up temporary directories created during extraction"""
-        temp_dirs = set()
-        for img_path in image_paths:
-            # Get the parent directory of each image
-            parent_dir = os.path.dirname(img_path)
-            # Check if it's a temp directory we created
-            if "comic_cruncher_" in parent_dir:
-                temp_dirs.add(parent_dir)
-        
-        # Remove all temp directories
-        for temp_dir in temp_dirs:
-            try:
-                shutil.rmtree(temp_dir, ignore_errors=True)
-            except Exception as e:
-                print(f"Warning: Could not clean up temp directory {temp_dir}: {e}")
-    
-    # Copy utility methods from ComicProcessor
-    def is_already_crunched(self, file_path):
-        """Check if file already contains WebP images"""
-        try:
-            if file_path.suffix.lower() == '.pdf':
-                return False
-            elif file_path.suffix.lower() == '.cbz':
-                with zipfile.ZipFile(file_path, 'r') as cbz:
-                    image_files = [f for f in cbz.namelist() 
-                                 if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'))]
-                    if not image_files:
-                        return False
-                    webp_count = sum(1 for f in image_files if f.lower().endswith('.webp'))
-                    return (webp_count / len(image_files)) > 0.8
-            elif file_path.suffix.lower() == '.cbr':
-                with rarfile.RarFile(file_path, 'r') as cbr:
-                    image_files = [f for f in cbr.namelist() 
-                                 if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'))]
-                    if not image_files:
-                        return False
-                    webp_count = sum(1 for f in image_files if f.lower().endswith('.webp'))
-                    return (webp_count / len(image_files)) > 0.8
-            return False
-        except Exception:
-            return False
-    
-    def extract_from_pdf(self, pdf_path):
-        """Extract images from PDF with batch processing to prevent memory issues"""
-        try:
-            # Get total pages first
-            info = pdf2image.pdfinfo_from_path(pdf_path)
-            max_pages = info["Pages"]
-            batch_size = 5  # Process 5 pages at a time
-            images = []
-            
-            for i in range(0, max_pages, batch_size):
-                if self.should_stop:
-                    return images
-                    
-                # Process batch
-                batch = pdf2image.convert_from_path(
-                    pdf_path, dpi=300,
-                    first_page=i+1, 
-                    last_page=min(i+batch_size, max_pages)
-                )
-                images.extend(batch)
-                del batch  # Free memory immediately
-            
-            return images
-        except (pdf2image.exceptions.PDFInfoNotInstalledError, pdf2image.exceptions.PDFPageCountError) as e:
-            print(f"PDF processing error: {e}")
-            return []
-        except Exception as e:
-            print(f"Unexpected error extracting from PDF: {e}")
-            return []
-    
-    def extract_from_cbz(self, cbz_path):
-        images = []
-        try:
-            # Create persistent temp directory
-            temp_dir = tempfile.mkdtemp(prefix="comic_cruncher_")
-            with zipfile.ZipFile(cbz_path, 'r') as cbz:
-                for filename in sorted(cbz.namelist()):
-                    if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')):
-                        cbz.extract(filename, path=temp_dir)
-                        images.append(os.path.join(temp_dir, filename))
-            return images
-        except Exception as e:
-            print(f"Error extracting from CBZ {cbz_path}: {e}")
-            return []
-    
-    def extract_from_cbr(self, cbr_path):
-        images = []
-        try:
-            # Create persistent temp directory
-            temp_dir = tempfile.mkdtemp(prefix="comic_cruncher_")
-            with rarfile.RarFile(cbr_path, 'r') as cbr:
-                for filename in sorted(cbr.namelist()):
-                    if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')):
-                        cbr.extract(filename, path=temp_dir)
-                        images.append(os.path.join(temp_dir, filename))
-            return images
-        except Exception as e:
-            print(f"Error extracting from CBR {cbr_path}: {e}")
-            return []
+        self.entries = deque(maxlen=max_entries)  # (message, is_current) tuples
+        self.placeholder_active = False
 
-class ComicProcessor(QThread):
-    """Background thread for processing comic files"""
-    
-    progress_update = pyqtSignal(str, int)  # stage, percentage
-    file_info_update = pyqtSignal(str)  # file path
-    finished = pyqtSignal(bool, str)  # success, message
-    
-    def __init__(self, file_path):
-        super().__init__()
-        self.file_path = file_path
-        self.should_stop = False
-    
-    def run(self):
-        try:
-            file_path = Path(self.file_path)
-            self.file_info_update.emit(str(file_path))
-            
-            # Check if file is already crunched (contains WebP images)
-            if self.is_already_crunched(file_path):
-                self.finished.emit(True, "File already crunched with WebP images!")
-                return
-            
-            # Create backup
-            backup_path = file_path.with_suffix(file_path.suffix + '.backup')
-            shutil.copy2(file_path, backup_path)
-            
-            # Determine file type and extract images
-            if file_path.suffix.lower() == '.pdf':
-                images = self.extract_from_pdf(file_path)
-            elif file_path.suffix.lower() == '.cbz':
-                images = self.extract_from_cbz(file_path)
-            elif file_path.suffix.lower() == '.cbr':
-                images = self.extract_from_cbr(file_path)
-            else:
-                self.finished.emit(False, "Unsupported file format")
-                return
-            
-            if not images:
-                self.finished.emit(False, "No images found in file")
-                return
-            
-            # Process images in parallel
-            with tempfile.TemporaryDirectory() as temp_dir:
-                self.progress_update.emit("RESIZING", 10)
-                
-                # Prepare image processing tasks
-                if file_path.suffix.lower() == '.pdf':
-                    # For PDF, images are PIL objects
-                    processed_images = []
-                    total_images = len(images)
-                    
-                    with ThreadPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-                        futures = []
-                        for i, img in enumerate(images):
-                            future = executor.submit(self.process_pdf_image, img, temp_dir, i)
-                            futures.append(future)
-                        
-                        for i, future in enumerate(futures):
-                            if self.should_stop:
-                                return
-                            result = future.result()
-                            if result:
-                                processed_images.append(result)
-                            
-                            progress = 10 + int((i + 1) / total_images * 50)
-                            self.progress_update.emit("RESIZING", progress)
-                else:
-                    # For CBZ/CBR, images are file paths
-                    image_tasks = [(img_path, temp_dir) for img_path in images]
-                    
-                    with ProcessPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-                        # Use GPU acceleration if available
-                        process_func = ImageProcessor.process_image_gpu if GPU_AVAILABLE else ImageProcessor.process_image
-                        futures = [executor.submit(process_func, task) for task in image_tasks]
-                        
-                        processed_images = []
-                        for i, future in enumerate(futures):
-                            if self.should_stop:
-                                return
-                            result = future.result()
-                            if result:
-                                processed_images.append(result)
-                            
-                            progress = 10 + int((i + 1) / len(futures) * 50)
-                            self.progress_update.emit("RESIZING", progress)
-                
-                self.progress_update.emit("RESIZING", 60)
-                self.progress_update.emit("COMPRESSING", 70)
-                
-                # Create new CBZ file
-                self.progress_update.emit("REPACKAGING", 85)
-                
-                # Create temporary CBZ file first
-                temp_cbz_path = file_path.parent / f"temp_{file_path.stem}.cbz"
-                
-                with zipfile.ZipFile(temp_cbz_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as cbz:
-                    for img_path in sorted(processed_images):
-                        if self.should_stop:
-                            return
-                        if os.path.exists(img_path):
-                            arcname = os.path.basename(img_path)
-                            # Use minimal compression for WebP files (already compressed)
-                            cbz.write(img_path, arcname)
-                
-                self.progress_update.emit("REPACKAGING", 95)
-                
-                # Determine final file path
-                if file_path.suffix.lower() != '.cbz':
-                    # Convert PDF/CBR to CBZ - replace with .cbz extension
-                    final_path = file_path.with_suffix('.cbz')
-                else:
-                    # Keep original CBZ path
-                    final_path = file_path
-                
-                # Remove existing final file if it exists
-                if final_path.exists():
-                    os.remove(final_path)
-                
-                # Move temp file to final location
-                os.rename(temp_cbz_path, final_path)
-                
-                # Remove original file if it was a different format
-                if file_path.suffix.lower() != '.cbz' and file_path.exists():
-                    os.remove(file_path)
-                
-                # Clean up backup file after successful processing
-                if backup_path.exists():
-                    os.remove(backup_path)
-                
-                # Clean up temporary extraction directories
-                self.cleanup_temp_directories(images)
-                
-                self.progress_update.emit("REPACKAGING", 100)
-                self.finished.emit(True, "Comic processed successfully!")
-                
-        except MemoryError as e:
-            self.finished.emit(False, f"Memory Error: File too large. Try reducing batch size or closing other applications.")
-        except PermissionError as e:
-            self.finished.emit(False, f"Permission Error: Cannot access file. Check file permissions and try again.")
-        except FileNotFoundError as e:
-            self.finished.emit(False, f"File Error: File not found or moved during processing.")
-        except Exception as e:
-            # Clean up temp directories on error
-            if 'images' in locals():
-                self.cleanup_temp_directories(images)
-            self.finished.emit(False, f"Error: {str(e)}")
-        finally:
-            # Cleanup any remaining temp files
-            try:
-                if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
-                    shutil.rmtree(self.temp_dir, ignore_errors=True)
-            except:
-                pass
-    
-    def process_pdf_image(self, pil_image, temp_dir, index):
-        """Process a single PDF image with GPU acceleration"""
-        try:
-            # Use GPU acceleration if available
-            if GPU_AVAILABLE:
-                processed_img = ImageProcessor.process_image_gpu(pil_image)
-            else:
-                processed_img = ImageProcessor.process_image(pil_image)
-            
-            if processed_img:
-                output_path = os.path.join(temp_dir, f"page_{index:04d}.webp")
-                processed_img.save(output_path, 'WEBP', quality=85, optimize=True)
-                return output_path
-        except Exception as e:
-            print(f"Error processing PDF image {index}: {e}")
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.entries):
+            return None
+
+        message, is_current = self.entries[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if is_current is None:
+                return message
+            return f"🔄 {message}" if is_current else f"✓ {message}"
+        if role == Qt.ItemDataRole.ForegroundRole:
+            # Current item in yellow, completed items in red
+            return QColor("#fc6467") if is_current is False else QColor("#ffd483")
         return None
-    
-    def extract_from_pdf(self, pdf_path):
-        """Extract images from PDF with batch processing to prevent memory issues"""
-        self.progress_update.emit("RESIZING", 5)
-        try:
-            # Get total pages first
-            info = pdf2image.pdfinfo_from_path(pdf_path)
-            max_pages = info["Pages"]
-            batch_size = 5  # Process 5 pages at a time
-            images = []
-            
-            for i in range(0, max_pages, batch_size):
-                if self.should_stop:
-                    return images
-                    
-                # Process batch
-                batch = pdf2image.convert_from_path(
-                    pdf_path, dpi=300,
-                    first_page=i+1, 
-                    last_page=min(i+batch_size, max_pages)
-                )
-                images.extend(batch)
-                
-                # Update progress
-                progress = 5 + int(((i + batch_size) / max_pages) * 10)
-                self.progress_update.emit("RESIZING", min(progress, 15))
-                
-                del batch  # Free memory immediately
-            
-            return images
-        except Exception as e:
-            print(f"Error extracting from PDF: {e}")
-            return []
-    
-    def extract_from_cbz(self, cbz_path):
-        """Extract images from CBZ"""
-        self.progress_update.emit("RESIZING", 5)
-        images = []
-        try:
-            # Create a persistent temp directory
-            temp_dir = tempfile.mkdtemp(prefix="comic_processor_")
-            with zipfile.ZipFile(cbz_path, 'r') as cbz:
-                for filename in sorted(cbz.namelist()):
-                    if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')):
-                        cbz.extract(filename, path=temp_dir)
-                        images.append(os.path.join(temp_dir, filename))
-            return images
-        except Exception as e:
-            print(f"Error extracting from CBZ: {e}")
-            return []
-    
-    def extract_from_cbr(self, cbr_path):
-        """Extract images from CBR"""
-        self.progress_update.emit("RESIZING", 5)
-        images = []
-        try:
-            # Create a persistent temp directory
-            temp_dir = tempfile.mkdtemp(prefix="comic_processor_")
-            with rarfile.RarFile(cbr_path, 'r') as cbr:
-                for filename in sorted(cbr.namelist()):
-                    if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')):
-                        cbr.extract(filename, path=temp_dir)
-                        images.append(os.path.join(temp_dir, filename))
-            return images
-        except Exception as e:
-            print(f"Error extracting from CBR: {e}")
-            return []
-    
-    def stop(self):
-        self.should_stop = True
-    
-    def cleanup_temp_directories(self, image_paths):
-        """Clean up temporary directories created during extraction"""
-        temp_dirs = set()
-        for img_path in image_paths:
-            # Get the parent directory of each image
-            parent_dir = os.path.dirname(img_path)
-            # Check if it's a temp directory we created
-            if "comic_processor_" in parent_dir:
-                temp_dirs.add(parent_dir)
-        
-        # Remove all temp directories
-        for temp_dir in temp_dirs:
-            try:
-                shutil.rmtree(temp_dir, ignore_errors=True)
-            except Exception as e:
-                print(f"Warning: Could not clean up temp directory {temp_dir}: {e}")
-    
-    def is_already_crunched(self, file_path):
-        """Check if file already contains WebP images"""
-        try:
-            if file_path.suffix.lower() == '.pdf':
-                # PDFs are never pre-crunched
-                return False
-            elif file_path.suffix.lower() == '.cbz':
-                # Check CBZ contents
-                with zipfile.ZipFile(file_path, 'r') as cbz:
-                    image_files = [f for f in cbz.namelist() 
-                                 if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'))]
-                    if not image_files:
-                        return False
-                    # If more than 80% are WebP, consider it already crunched
-                    webp_count = sum(1 for f in image_files if f.lower().endswith('.webp'))
-                    return (webp_count / len(image_files)) > 0.8
-            elif file_path.suffix.lower() == '.cbr':
-                # Check CBR contents
-                with rarfile.RarFile(file_path, 'r') as cbr:
-                    image_files = [f for f in cbr.namelist() 
-                                 if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'))]
-                    if not image_files:
-                        return False
-                    # If more than 80% are WebP, consider it already crunched
-                    webp_count = sum(1 for f in image_files if f.lower().endswith('.webp'))
-                    return (webp_count / len(image_files)) > 0.8
-            return False
-        except Exception as e:
-            print(f"Error checking if file is crunched: {e}")
-            return False
+
+    def append_entries(self, entries):
+        """Append a batch of (message, is_current) entries in one model update"""
+        added = []
+        replace_all = False
+        for message, is_current in entries:
+            if self.placeholder_active:
+                # First message after the placeholder replaces the whole feed
+                replace_all = True
+                added = []
+                self.placeholder_active = False
+            added.append((message, is_current))
+            if message == FEED_PLACEHOLDER:
+                self.placeholder_active = True
+
+        added = added[-self.entries.maxlen:]
+        if replace_all:
+            self.beginResetModel()
+            self.entries.clear()
+            self.entries.extend(added)
+            self.endResetModel()
+            return
+        if not added:
+            return
+
+        # Drop the oldest rows so the buffer never grows past its limit
+        overflow = len(self.entries) + len(added) - self.entries.maxlen
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.entries.popleft()
+            self.endRemoveRows()
+
+        start = len(self.entries)
+        self.beginInsertRows(QModelIndex(), start, start + len(added) - 1)
+        self.entries.extend(added)
+        self.endInsertRows()
+
+    def show_placeholder(self):
+        """Reset the feed to the placeholder message"""
+        self.beginResetModel()
+        self.entries.clear()
+        self.entries.append((FEED_PLACEHOLDER, None))
+        self.placeholder_active = True
+        self.endResetModel()
 
 class DragDropFrame(QFrame):
     """Custom frame for drag and drop functionality"""
@@ -1024,7 +139,7 @@ class DragDropFrame(QFrame):
                     if os.path.isdir(path):
                         event.acceptProposedAction()
                         return
-                    elif path.lower().endswith(('.pdf', '.cbz', '.cbr')):
+                    elif path.lower().endswith(COMIC_EXTENSIONS):
                         event.acceptProposedAction()
                         return
         event.ignore()
@@ -1041,9 +156,9 @@ class DragDropFrame(QFrame):
                     for root, dirs, files in os.walk(path):
                         for file in files:
                             file_path = os.path.join(root, file)
-                            if file_path.lower().endswith(('.pdf', '.cbz', '.cbr')):
+                            if file_path.lower().endswith(COMIC_EXTENSIONS):
                                 file_paths.append(file_path)
-                elif path.lower().endswith(('.pdf', '.cbz', '.cbr')):
+                elif path.lower().endswith(COMIC_EXTENSIONS):
                     file_paths.append(path)
             
             if file_paths:
@@ -1055,6 +170,11 @@ class ComicCruncher(QMainWindow):
         self.processor = None
         self.current_mode = "cruncher"  # "cruncher" or "combiner"
         
+        # Worker signals are buffered here and applied by a fixed-rate timer
+        self.pending_feed = deque(maxlen=FEED_MAX_ENTRIES)
+        self.pending_progress = {}
+        self.pending_batch_progress = None
+        
         self.init_ui()
         self.setup_fonts()
         
@@ -1063,12 +183,18 @@ class ComicCruncher(QMainWindow):
         self.update_progress_labels()
         
         # Show GPU status in activity feed
-        if GPU_AVAILABLE:
+        if GPU_AVAILABLE and load_settings()['image_backend'] == 'pillow':
+            self.add_to_feed("💻 Using CPU processing (Pillow was faster when this machine was calibrated)", is_current=False)
+        elif GPU_AVAILABLE:
             self.add_to_feed("🚀 GPU acceleration enabled (OpenCV)", is_current=False)
         else:
             self.add_to_feed("💻 Using CPU processing (install opencv-python for GPU acceleration)", is_current=False)
         
-        self.add_to_feed("Drop files to begin...", is_current=False)
+        self.add_to_feed(FEED_PLACEHOLDER, is_current=False)
+        
+        self.ui_refresh_timer = QTimer(self)
+        self.ui_refresh_timer.timeout.connect(self.flush_ui_updates)
+        self.ui_refresh_timer.start(FEED_REFRESH_MS)
     
     def init_ui(self):
         self.setWindowTitle("Comic Cruncher")
@@ -1166,9 +292,11 @@ class ComicCruncher(QMainWindow):
         info_layout.addWidget(feed_title)
         
         # Activity feed area (scrollable but no visible scrollbar)
-        self.activity_feed = QTextEdit()
+        self.feed_model = ActivityFeedModel()
+        self.activity_feed = QListView()
+        self.activity_feed.setModel(self.feed_model)
         self.activity_feed.setStyleSheet("""
-            QTextEdit {
+            QListView {
                 background-color: transparent;
                 border: none;
                 color: #ffd483;
@@ -1181,11 +309,12 @@ class ComicCruncher(QMainWindow):
                 background: transparent;
             }
         """)
-        self.activity_feed.setReadOnly(True)
+        self.activity_feed.setWordWrap(True)
+        self.activity_feed.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.activity_feed.setFocusPolicy(Qt.FocusPolicy.NoFocus)
         self.activity_feed.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.activity_feed.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         # Initial status will be set in __init__ after GPU detection
-        self.activity_feed.setText("")
         info_layout.addWidget(self.activity_feed)
         content_layout.addWidget(info_frame)
         layout.addLayout(content_layout)
@@ -1308,12 +437,12 @@ class ComicCruncher(QMainWindow):
         """Update drag area text based on current mode"""
         if self.current_mode == "cruncher":
             self.drag_text.setText("DRAG YOUR COMIC\nFILES OR FOLDER HERE.")
-            self.types_text.setText("ACCEPTING .PDFS,\n.CBZS, & .CBRS.")
+            self.types_text.setText("ACCEPTING .PDFS, .CBZS,\n.CBRS, .CB7S & .CBTS.")
             self.details_text.setText("COMPRESSES TO\n2500 X 2500\n(RETAINING RATIO\nAND .WEBP -85%.")
             self.subtitle_label.setText("Compress • Optimize • Batch Process")
         else:
             self.drag_text.setText("DRAG COMIC ISSUES\nTO COMBINE HERE.")
-            self.types_text.setText("ACCEPTING SEQUENTIAL\n.CBZS & .CBRS.")
+            self.types_text.setText("ACCEPTING SEQUENTIAL\n.CBZS, .CBRS, .CB7S & .CBTS.")
             self.details_text.setText("COMBINES INTO TPB\nREMOVES ORIGINALS\nAUTO-NAMES COLLECTION")
             self.subtitle_label.setText("Combine • Organize • Collection")
     
@@ -1336,30 +465,32 @@ class ComicCruncher(QMainWindow):
         self.current_stages = stages
     
     def add_to_feed(self, message, is_current=False):
-        """Add a message to the activity feed"""
-        if is_current:
-            # Current item in yellow
-            color_message = f'<span style="color: #ffd483;">🔄 {message}</span>'
-        else:
-            # Completed items in red
-            color_message = f'<span style="color: #fc6467;">✓ {message}</span>'
-        
-        current_text = self.activity_feed.toHtml()
-        if "Drop files to begin..." in current_text:
-            # First message, replace placeholder
-            self.activity_feed.setHtml(color_message)
-        else:
-            # Append new message
-            self.activity_feed.append(color_message)
-        
-        # Auto-scroll to bottom - fixed for PyQt6
-        cursor = self.activity_feed.textCursor()
-        cursor.movePosition(cursor.MoveOperation.End)
-        self.activity_feed.setTextCursor(cursor)
+        """Queue a message for the activity feed (shown on the next refresh)"""
+        self.pending_feed.append((message, is_current))
     
     def clear_feed(self):
         """Clear the activity feed"""
-        self.activity_feed.setText("Drop files to begin...")
+        self.pending_feed.clear()
+        self.feed_model.show_placeholder()
+    
+    def flush_ui_updates(self):
+        """Apply buffered feed messages and progress values in one pass"""
+        if self.pending_feed:
+            self.feed_model.append_entries(self.pending_feed)
+            self.pending_feed.clear()
+            self.activity_feed.scrollToBottom()
+        
+        for stage, percentage in self.pending_progress.items():
+            self.apply_progress(stage, percentage)
+        self.pending_progress.clear()
+        
+        if self.pending_batch_progress:
+            current, total = self.pending_batch_progress
+            self.pending_batch_progress = None
+            # Update the first progress bar to show batch progress
+            bar, label = self.progress_bars["RESIZING"]
+            bar.setValue(int((current / total) * 100))
+            label.setText(f"{current}/{total}")
     
     def handle_file_drop(self, file_paths):
         """Handle dropped files (single or multiple)"""
@@ -1367,6 +498,8 @@ class ComicCruncher(QMainWindow):
             return  # Already processing
         
         # Reset progress bars
+        self.pending_progress.clear()
+        self.pending_batch_progress = None
         for stage, (bar, label) in self.progress_bars.items():
             bar.setValue(0)
             label.setText("0%")
@@ -1375,14 +508,14 @@ class ComicCruncher(QMainWindow):
             # Comic Cruncher mode
             if len(file_paths) == 1:
                 # Single file processing
-                self.processor = ComicProcessor(file_paths[0])
+                self.processor = ProcessorThread(ComicProcessor(file_paths[0]))
                 self.processor.progress_update.connect(self.update_progress)
                 self.processor.file_info_update.connect(self.update_file_info)
                 self.processor.finished.connect(self.processing_finished)
                 self.processor.start()
             else:
                 # Batch processing
-                self.processor = BatchProcessor(file_paths)
+                self.processor = ProcessorThread(BatchProcessor(file_paths))
                 self.processor.progress_update.connect(self.update_progress)
                 self.processor.file_info_update.connect(self.update_file_info)
                 self.processor.batch_progress.connect(self.update_batch_progress)
@@ -1390,23 +523,25 @@ class ComicCruncher(QMainWindow):
                 self.processor.start()
         else:
             # Comic Combiner mode
-            # Filter to only CBZ/CBR files
-            comic_files = [f for f in file_paths if f.lower().endswith(('.cbz', '.cbr'))]
+            # Filter to only archive files
+            comic_files = [f for f in file_paths if f.lower().endswith(ARCHIVE_EXTENSIONS)]
             
             if len(comic_files) < 2:
                 self.add_to_feed("Error: Need at least 2 comic files to combine", is_current=False)
                 return
             
-            self.processor = ComicCombiner(comic_files)
+            self.processor = ProcessorThread(ComicCombiner(comic_files))
             self.processor.progress_update.connect(self.update_progress)
             self.processor.file_info_update.connect(self.update_file_info)
             self.processor.finished.connect(self.processing_finished)
             self.processor.start()
     
     def update_progress(self, stage, percentage):
+        """Record the latest progress for a stage (applied on the next refresh)"""
+        self.pending_progress[stage] = percentage
+    
+    def apply_progress(self, stage, percentage):
         """Update progress bar for specific stage"""
-        print(f"Progress update: {stage} {percentage}%")  # Debug print
-        
         # Map stage to current mode if needed
         if hasattr(self, 'current_stages'):
             stage_list = list(self.progress_bars.keys())
@@ -1421,7 +556,6 @@ class ComicCruncher(QMainWindow):
                         bar, label = self.progress_bars[actual_stage]
                         bar.setValue(percentage)
                         label.setText(f"{percentage}%")
-                        print(f"Updated {actual_stage} bar to {percentage}%")  # Debug
                         return
         
         # Fallback: try direct stage match
@@ -1429,15 +563,10 @@ class ComicCruncher(QMainWindow):
             bar, label = self.progress_bars[stage]
             bar.setValue(percentage)
             label.setText(f"{percentage}%")
-            print(f"Direct update {stage} to {percentage}%")  # Debug
     
     def update_batch_progress(self, current, total):
-        """Update batch progress display"""
-        batch_percentage = int((current / total) * 100)
-        # Update the first progress bar to show batch progress
-        bar, label = self.progress_bars["RESIZING"]
-        bar.setValue(batch_percentage)
-        label.setText(f"{current}/{total}")
+        """Record batch progress (applied on the next refresh)"""
+        self.pending_batch_progress = (current, total)
     
     def update_file_info(self, file_path):
         """Update file info display"""
@@ -1448,7 +577,7 @@ class ComicCruncher(QMainWindow):
             elif "Processing:" in file_path:
                 # Currently processing file
                 self.add_to_feed(file_path, is_current=True)
-            elif "Completed:" in file_path or "Skipped:" in file_path or "Error:" in file_path:
+            elif "Completed:" in file_path or "Skipped:" in file_path or "Error:" in file_path or "Stats:" in file_path:
                 # File completed
                 self.add_to_feed(file_path, is_current=False)
             else:
@@ -1462,6 +591,9 @@ class ComicCruncher(QMainWindow):
     
     def processing_finished(self, success, message):
         """Handle processing completion"""
+        # Apply anything still buffered so late progress can't overwrite the final state
+        self.flush_ui_updates()
+        
         if success:
             if "already crunched" in message.lower():
                 # Special handling for already crunched files
@@ -1479,13 +611,38 @@ class ComicCruncher(QMainWindow):
                 
                 # Reset after delay
                 QTimer.singleShot(3000, self.reset_ui)
+        elif message.startswith("Cancelled"):
+            self.add_to_feed(message, is_current=False)
+            QTimer.singleShot(3000, self.reset_ui)
         else:
             self.add_to_feed(f"Error: {message}", is_current=False)
             QTimer.singleShot(5000, self.reset_ui)
     
+    def cancel_processing(self):
+        """Stop the running job; the processor rolls back and reports how long it took"""
+        if self.processor and self.processor.isRunning() and not self.processor.should_stop:
+            self.add_to_feed("Cancelling...", is_current=True)
+            self.processor.stop()
+    
+    def keyPressEvent(self, event):
+        """Esc cancels the running job"""
+        if event.key() == Qt.Key.Key_Escape:
+            self.cancel_processing()
+        else:
+            super().keyPressEvent(event)
+    
+    def closeEvent(self, event):
+        """Cancel and wait for the running job so no half-written files or backups are left behind"""
+        if self.processor and self.processor.isRunning():
+            self.cancel_processing()
+            self.processor.wait()
+        super().closeEvent(event)
+    
     def reset_ui(self):
         """Reset UI to initial state"""
         # Reset all progress bars
+        self.pending_progress.clear()
+        self.pending_batch_progress = None
         for stage, (bar, label) in self.progress_bars.items():
             bar.setValue(0)
             label.setText("0%")
@@ -1493,6 +650,10 @@ class ComicCruncher(QMainWindow):
         # Don't clear the feed - keep the history of completed files
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS + ("-h", "--help"):
+        run_command(sys.argv[1:])
+        return
+    
     app = QApplication(sys.argv)
     
     # Set application properties
@@ -0,0 +1,36 @@
+"""ComicInfo.xml page index written into crunched and combined CBZs"""
+import xml.etree.ElementTree as ET
+
+import comic_core as cc
+
+EXISTING = b"""<?xml version="1.0"?>
+<ComicInfo>
+  <Title>Night</Title>
+  <Summary>Old summary</Summary>
+  <PageCount>99</PageCount>
+  <Writer>Someone</Writer>
+  <LanguageISO>en</LanguageISO>
+  <AgeRating>Teen</AgeRating>
+  <CommunityRating>4</CommunityRating>
+</ComicInfo>"""
+
+
+def tags(xml):
+    return [element.tag for element in ET.fromstring(xml)]
+
+
+def test_elements_follow_schema_order():
+    xml = cc.comic_info_xml([(100, 10, 20), (200, None, None)], EXISTING, fields={'Series': 'Saga', 'Volume': 2})
+    assert tags(xml) == ['Title', 'Series', 'Volume', 'Summary', 'Writer', 'PageCount', 'LanguageISO',
+                         'AgeRating', 'Pages', 'CommunityRating']
+    root = ET.fromstring(xml)
+    assert root.find('PageCount').text == '2'
+    pages = root.find('Pages').findall('Page')
+    assert pages[0].attrib == {'Image': '0', 'ImageSize': '100', 'ImageWidth': '10', 'ImageHeight': '20',
+                               'Type': 'FrontCover'}
+    assert pages[1].attrib == {'Image': '1', 'ImageSize': '200'}
+
+
+def test_new_document():
+    assert tags(cc.comic_info_xml([(1, 1, 1)], fields={'Volume': 1, 'Series': 'Saga'})) == [
+        'Series', 'Volume', 'PageCount', 'Pages']
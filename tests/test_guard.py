@@ -0,0 +1,69 @@
+"""PageGuard: oversized pages are quarantined from their header, before anything is decoded"""
+import io
+import struct
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import comic_core as cc
+
+
+def png(width, height):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), 'white').save(output, 'PNG')
+    return output.getvalue()
+
+
+def png_header(width, height):
+    """A PNG that claims a size in its IHDR chunk but holds no pixels"""
+    ihdr = b'IHDR' + struct.pack('!IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    iend = struct.pack('!I', 0) + b'IEND' + struct.pack('!I', zlib.crc32(b'IEND'))
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('!I', 13) + ihdr + struct.pack('!I', zlib.crc32(ihdr)) + iend
+
+
+def test_pages_over_the_pixel_budget_are_refused():
+    guard = cc.PageGuard(max_pixels=10_000)
+    assert guard.check(("small.png", png(100, 100))) is None
+    assert guard.check(("large.png", png(101, 100))) == "101x100 is over the 0.01 megapixel limit"
+
+
+def test_decompression_bombs_are_refused_from_the_header():
+    guard = cc.PageGuard(max_pixels=10 ** 12)
+    assert guard.check(("bomb.png", png_header(30000, 30000))) == "over Pillow's decompression bomb limit"
+
+
+def test_no_budget_checks_nothing():
+    assert cc.PageGuard().check(("bomb.png", png_header(30000, 30000))) is None
+
+
+def test_unreadable_headers_are_left_to_the_encoder():
+    assert cc.PageGuard(max_pixels=1).check(("junk.png", b"not an image")) is None
+
+
+def test_pdf_pages_are_not_checked():
+    assert cc.PageGuard(max_pixels=1).check(("doc.pdf", 3, "/tmp")) is None
+
+
+def run_guarded(tmp_path, guard):
+    pages = [("p0.png", png(50, 50)), ("p1.png", png(200, 200)), ("p2.png", png(50, 50))]
+    output = tmp_path / "out.cbz"
+    encode = cc.ImageProcessor.process_buffer
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pipeline = cc.PagePipeline(executor, 1024 * 1024 * 1024, guard=guard)
+        list(pipeline.run(encode, iter(pages), lambda task: 1, output))
+    with zipfile.ZipFile(output) as cbz:
+        return pipeline, cbz.namelist()
+
+
+def test_quarantined_pages_pass_through_unmodified(tmp_path):
+    pipeline, names = run_guarded(tmp_path, cc.PageGuard(max_pixels=10_000))
+    assert names == ["p0.webp", "p1.png", "p2.webp"]
+    assert pipeline.quarantined == [("p1.png", "200x200 is over the 0.01 megapixel limit")]
+
+
+def test_quarantined_pages_can_be_skipped(tmp_path):
+    pipeline, names = run_guarded(tmp_path, cc.PageGuard(max_pixels=10_000, keep_original=False))
+    assert names == ["p0.webp", "p2.webp"]
+    assert len(pipeline.quarantined) == 1
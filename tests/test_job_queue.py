@@ -0,0 +1,67 @@
+"""JobQueue: claim order, and which interrupted jobs run again after a restart"""
+import comic_core as cc
+
+
+def reopen(queue):
+    path = queue.path
+    queue.close()
+    return cc.JobQueue(path)
+
+
+def test_claims_by_priority_then_submission(tmp_path):
+    queue = cc.JobQueue(tmp_path / "jobs.sqlite3")
+    low = queue.submit("crunch", ["a.cbz"])
+    high = queue.submit("crunch", ["b.cbz"], priority=5)
+    later = queue.submit("crunch", ["c.cbz"])
+    assert [queue.claim()['id'] for _ in range(3)] == [high, low, later]
+    assert queue.claim() is None
+    queue.close()
+
+
+def test_interrupted_crunch_runs_again(tmp_path):
+    queue = cc.JobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.submit("crunch", [str(tmp_path / "gone.cbr")])
+    queue.claim()
+    queue = reopen(queue)
+    assert queue.get(job_id)['state'] == "queued"
+    assert queue.get(job_id)['started'] is None
+    queue.close()
+
+
+def test_interrupted_combine_with_its_issues_runs_again(tmp_path):
+    paths = [tmp_path / "X 001.cbz", tmp_path / "X 002.cbz"]
+    for path in paths:
+        path.write_bytes(b"")
+    queue = cc.JobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.submit("combine", [str(path) for path in paths])
+    queue.claim()
+    queue = reopen(queue)
+    assert queue.get(job_id)['state'] == "queued"
+    queue.close()
+
+
+def test_partly_combined_job_is_failed_not_rerun(tmp_path):
+    kept = tmp_path / "X 003.cbz"
+    kept.write_bytes(b"")
+    queue = cc.JobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.submit("combine", [str(tmp_path / "X 001.cbz"), str(tmp_path / "X 002.cbz"), str(kept)])
+    queue.claim()
+    queue = reopen(queue)
+    job = queue.get(job_id)
+    assert job['state'] == "failed"
+    assert "2 of 3 issues were already combined" in job['message']
+    assert queue.claim() is None
+    queue.close()
+
+
+def test_finished_and_cancelled_jobs_stay_put(tmp_path):
+    queue = cc.JobQueue(tmp_path / "jobs.sqlite3")
+    done = queue.submit("crunch", ["a.cbz"])
+    cancelled = queue.submit("crunch", ["b.cbz"])
+    queue.claim()
+    queue.finish(done, "done", "ok")
+    assert queue.cancel_queued(cancelled)
+    queue = reopen(queue)
+    assert queue.get(done)['state'] == "done"
+    assert queue.get(cancelled)['state'] == "cancelled"
+    queue.close()
@@ -0,0 +1,32 @@
+"""JobService: where it may listen, and QoS changes made before any job has run"""
+import pytest
+
+import comic_core as cc
+
+
+def test_other_addresses_need_a_token(tmp_path):
+    settings = dict(cc.load_settings(), service_token="")
+    with pytest.raises(ValueError, match="COMIC_CRUNCHER_SERVICE_TOKEN"):
+        cc.create_job_server("0.0.0.0:0", 1, tmp_path / "jobs.sqlite3", settings)
+    assert not (tmp_path / "jobs.sqlite3").exists()
+
+
+def test_loopback_or_token_may_listen(tmp_path):
+    for listen, token in (("127.0.0.1:0", ""), ("0.0.0.0:0", "secret")):
+        settings = dict(cc.load_settings(), service_token=token)
+        server = cc.create_job_server(listen, 1, tmp_path / f"{token or 'none'}.sqlite3", settings)
+        server.server_close()
+        server.service.queue.close()
+
+
+def test_low_priority_set_before_any_job_reaches_the_pool(tmp_path):
+    settings = dict(cc.load_settings(), low_priority=False)
+    service = cc.JobService(cc.JobQueue(tmp_path / "jobs.sqlite3"), 1, settings)
+    try:
+        assert service.set_qos({'low_priority': True})['low_priority'] is True
+        pool = service.process_pool()
+        assert pool.thread_budget.low_priority
+        assert pool.executor.executor_args['initargs'][1]
+    finally:
+        service.stop()
+        service.queue.close()
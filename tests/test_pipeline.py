@@ -0,0 +1,61 @@
+"""PagePipeline: pages land in the CBZ in source order however the pool finishes them"""
+import io
+import random
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import comic_core as cc
+
+
+def webp():
+    output = io.BytesIO()
+    Image.new('RGB', (8, 12), 'white').save(output, 'WEBP')
+    return output.getvalue()
+
+
+PAGE = webp()
+
+
+def encode(task):
+    name, delay = task
+    time.sleep(delay)
+    return cc.EncodedPage(name, PAGE)
+
+
+def run_pipeline(tmp_path, tasks, func=encode, **kwargs):
+    output = tmp_path / "out.cbz"
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pipeline = cc.PagePipeline(executor, 1024 * 1024 * 1024, **kwargs)
+        results = list(pipeline.run(func, iter(tasks), lambda task: 1, output))
+    with zipfile.ZipFile(output) as cbz:
+        return pipeline, results, cbz.namelist()
+
+
+def test_pages_are_written_in_source_order(tmp_path):
+    rng = random.Random(7)
+    tasks = [(f"page_{i:03d}.webp", rng.choice((0.0, 0.001, 0.02))) for i in range(40)]
+    pipeline, results, names = run_pipeline(tmp_path, tasks)
+    assert names == [name for name, _ in tasks]
+    assert len(results) == 40
+    assert pipeline.pages_written == 40
+    assert pipeline.page_index == [(len(PAGE), 8, 12)] * 40
+
+
+def test_reorder_window_bounds_the_buffer(tmp_path):
+    # The first page is slow; later pages may only run reorder_window ahead of it
+    tasks = [("page_000.webp", 0.2)] + [(f"page_{i:03d}.webp", 0.0) for i in range(1, 30)]
+    pipeline, _, names = run_pipeline(tmp_path, tasks, reorder_window=5)
+    assert names == [name for name, _ in tasks]
+    assert pipeline.peak_reorder <= 6
+
+
+def test_failed_pages_are_left_out(tmp_path):
+    def sometimes(task):
+        return None if task[0] == "page_001.webp" else encode(task)
+    tasks = [(f"page_{i:03d}.webp", 0.0) for i in range(3)]
+    _, results, names = run_pipeline(tmp_path, tasks, func=sometimes)
+    assert names == ["page_000.webp", "page_002.webp"]
+    assert results.count(None) == 1
@@ -0,0 +1,110 @@
+"""Filename parsing and TPB volume planning for the combiner"""
+import zipfile
+
+import comic_core as cc
+
+
+def test_parse_comic_name():
+    comic = cc.parse_comic_name("Spider-Man 2099 001 (1992) (Digital).cbz")
+    assert (comic.series, comic.issue, comic.annual, comic.year) == ("Spider-Man 2099", "1", False, 1992)
+    assert cc.parse_comic_name("Saga #12.1.cbz").issue == "12.1"
+    assert cc.parse_comic_name("Saga Annual 02.cbz").annual
+    assert cc.parse_comic_name("Batman Vol 1 (Issues 1-12).cbz") is None
+    assert cc.parse_comic_name("cover.cbz") is None
+
+
+def test_series_spelling_does_not_split():
+    plans, unmatched, conflicts = cc.plan_combines(["Amazing_Spider-Man 001.cbz", "amazing spider man #2.cbr"])
+    assert [plan.issues for plan in plans] == [["1", "2"]]
+    assert not unmatched and not conflicts
+
+
+def test_years_plan_separate_volumes():
+    files = ["Batman 001 (2016).cbz", "Batman 002 (2016).cbz", "Batman 001 (1940).cbz", "Batman 002 (1940).cbz"]
+    plans, unmatched, conflicts = cc.plan_combines(files)
+    assert not unmatched and not conflicts
+    assert sorted((plan.name, tuple(plan.files)) for plan in plans) == [
+        ("Batman (1940) Vol 1 (Issues 1-2).cbz", ("Batman 001 (1940).cbz", "Batman 002 (1940).cbz")),
+        ("Batman (2016) Vol 1 (Issues 1-2).cbz", ("Batman 001 (2016).cbz", "Batman 002 (2016).cbz")),
+    ]
+
+
+def test_cover_years_do_not_split_a_run():
+    files = ["Saga 006 (2012).cbz", "Saga 007 (2013).cbz", "Saga 008 (2013) (Digital).cbz"]
+    plans, unmatched, conflicts = cc.plan_combines(files)
+    assert not unmatched and not conflicts
+    assert [(plan.name, plan.issues) for plan in plans] == [("Saga (2012) Vol 1 (Issues 6-8).cbz", ["6", "7", "8"])]
+
+
+def test_relaunch_splits_on_repeated_issues_across_cover_years():
+    files = ["Batman 001 (1940).cbz", "Batman 002 (1941).cbz",
+             "Batman 001 (2016).cbz", "Batman 002 (2016).cbz", "Batman 003 (2017).cbz"]
+    plans, unmatched, conflicts = cc.plan_combines(files)
+    assert not unmatched and not conflicts
+    assert [(plan.name, plan.files) for plan in plans] == [
+        ("Batman (1940) Vol 1 (Issues 1-2).cbz", ["Batman 001 (1940).cbz", "Batman 002 (1941).cbz"]),
+        ("Batman (2016) Vol 1 (Issues 1-3).cbz",
+         ["Batman 001 (2016).cbz", "Batman 002 (2016).cbz", "Batman 003 (2017).cbz"]),
+    ]
+
+
+def test_year_in_the_series_name_is_the_same_series():
+    first, second = cc.parse_comic_name("Batman (2016) 012.cbz"), cc.parse_comic_name("Batman 001 (2016).cbz")
+    assert (first.series, first.year, first.key) == (second.series, second.year, second.key) == (
+        "Batman", 2016, ("batman", False))
+    plans, _, _ = cc.plan_combines(["Batman (2016) 012.cbz", "Batman 001 (2016).cbz"])
+    assert [plan.name for plan in plans] == ["Batman (2016) Vol 1 (Issues 1, 12).cbz"]
+
+
+def test_duplicate_issues_are_left_out():
+    files = ["Age 024.cbz", "Age 025.cbz", "Age_025.cbz", "Age 026.cbz", "Saga 001.cbz", "Saga 002.cbz"]
+    plans, unmatched, conflicts = cc.plan_combines(files)
+    assert [(plan.series, plan.files) for plan in plans] == [
+        ("Age", ["Age 024.cbz", "Age 026.cbz"]), ("Saga", ["Saga 001.cbz", "Saga 002.cbz"])]
+    assert conflicts == [("Age", "25", ["Age 025.cbz", "Age_025.cbz"])]
+    assert not unmatched
+
+
+def test_run_left_with_one_issue_is_unmatched():
+    plans, unmatched, conflicts = cc.plan_combines(["Batman 001.cbz", "Batman #1.cbz", "Batman 002.cbz"])
+    assert not plans
+    assert unmatched == ["Batman 002.cbz"]
+    assert conflicts == [("Batman", "1", ["Batman #1.cbz", "Batman 001.cbz"])]
+
+
+def test_batches_split_into_volumes():
+    plans, _, _ = cc.plan_combines([f"Saga {n:03d}.cbz" for n in range(1, 15)], batch_size=12)
+    assert [(plan.volume, len(plan.files)) for plan in plans] == [(1, 12), (2, 2)]
+
+
+def test_combiner_keeps_originals_with_duplicate_issues(tmp_path, monkeypatch):
+    monkeypatch.setattr(cc, "CONFIG_DIR", tmp_path / "config")
+    paths = []
+    for name in ("Batman 001.cbz", "Batman #1.cbz", "Batman 002.cbz"):
+        path = tmp_path / name
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("page.jpg", b"")
+        paths.append(str(path))
+    combiner = cc.ComicCombiner(paths, settings=dict(cc.DEFAULT_SETTINGS))
+    results = []
+    combiner.finished.connect(lambda ok, message: results.append((ok, message)))
+    combiner.run()
+    assert results == [(False, "Duplicate issue numbers: nothing was combined")]
+    assert sorted(p.name for p in tmp_path.glob("*.cbz")) == ["Batman #1.cbz", "Batman 001.cbz", "Batman 002.cbz"]
+
+
+def test_combiner_combines_around_duplicate_issues(tmp_path, monkeypatch):
+    monkeypatch.setattr(cc, "CONFIG_DIR", tmp_path / "config")
+    paths = []
+    for name in ("Age 024.cbz", "Age 025.cbz", "Age_025.cbz", "Age 026.cbz"):
+        path = tmp_path / name
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("page.jpg", b"")
+        paths.append(str(path))
+    combiner = cc.ComicCombiner(paths, settings=dict(cc.DEFAULT_SETTINGS))
+    messages = []
+    combiner.file_info_update.connect(messages.append)
+    combiner.run()
+    assert "Skipped Age issue 25: appears more than once (Age 025.cbz, Age_025.cbz)" in messages
+    assert sorted(p.name for p in tmp_path.glob("*.cbz")) == [
+        "Age 025.cbz", "Age Vol 1 (Issues 24, 26).cbz", "Age_025.cbz"]
@@ -0,0 +1,24 @@
+"""ThreadBudget: library thread limits stay in the worker processes they are meant for"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import comic_core as cc
+
+
+def thread_env():
+    return {name: os.environ.get(name) for name in cc.THREAD_ENV_VARS}
+
+
+def test_thread_pool_leaves_library_limits_alone():
+    before = thread_env()
+    with ThreadPoolExecutor(**cc.ThreadBudget(2, 1).thread_executor_args()) as executor:
+        list(executor.map(abs, range(4)))
+    assert thread_env() == before
+
+
+def test_library_limits_can_be_restored():
+    before = thread_env()
+    previous = cc.limit_library_threads(1)
+    assert all(os.environ[name] == "1" for name in cc.THREAD_ENV_VARS)
+    cc.restore_library_threads(previous)
+    assert thread_env() == before
@@ -0,0 +1,30 @@
+"""Remote worker server: where it may listen, and what it leaves alone"""
+import socketserver
+
+import pytest
+
+import comic_core as cc
+
+
+def test_loopback_and_unix_addresses():
+    assert cc.is_loopback_address("127.0.0.1:7878")
+    assert cc.is_loopback_address("localhost:7878")
+    assert cc.is_loopback_address(":7878")
+    assert cc.is_loopback_address("unix:/tmp/cc.sock")
+    assert not cc.is_loopback_address("0.0.0.0:7878")
+    assert not cc.is_loopback_address("192.168.1.5:7878")
+
+
+def test_other_addresses_need_a_token():
+    with pytest.raises(ValueError, match="COMIC_CRUNCHER_WORKER_TOKEN"):
+        cc.create_worker_server("0.0.0.0:0", 1, dict(cc.load_settings(), worker_token=""))
+
+
+def test_port_reuse_is_set_on_the_worker_server_only():
+    server = cc.create_worker_server("127.0.0.1:0", 1, cc.load_settings())
+    try:
+        assert server.allow_reuse_address
+        assert not socketserver.ThreadingTCPServer.allow_reuse_address
+    finally:
+        server.server_close()
+        server.executor.shutdown()